@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import glm
+import numpy as np
+
+# Os módulos do jogo ficam em src/ (importados sem pacote, como no main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from animation import Animator, prepare_channel, sample_channel
+from skeleton import Skeleton
+
+
+def clip_sintetico(keys, channels, rng):
+    """ Canais de rotação e translação com `keys` chaves a 30 fps (formato cru do glTF). """
+    times = np.arange(keys, dtype=np.float32) / 30.0
+    raw = []
+    for c in range(channels):
+        if c % 2 == 0:
+            q = rng.normal(size=(keys, 4)).astype(np.float32)
+            q /= np.linalg.norm(q, axis=1, keepdims=True)
+            raw.append((c, 'rotation', times, q.ravel()))
+        else:
+            raw.append((c, 'translation', times, rng.normal(size=keys * 3).astype(np.float32)))
+    return raw
+
+
+def amostra_linear(path, times, values, t):
+    """ Como o Model.update_animation fazia antes: varredura linear e glm novo a cada leitura. """
+    k = 0
+    for i in range(len(times) - 1):
+        if t >= times[i] and t <= times[i + 1]:
+            k = i
+            break
+    dt = times[k + 1] - times[k]
+    factor = (t - times[k]) / dt if dt > 0 else 0.0
+    if path == 'rotation':
+        idx = k * 4
+        q0 = glm.quat(values[idx + 3], values[idx], values[idx + 1], values[idx + 2])
+        idx = (k + 1) * 4
+        q1 = glm.quat(values[idx + 3], values[idx], values[idx + 1], values[idx + 2])
+        return glm.slerp(q0, q1, factor)
+    idx = k * 3
+    v0 = glm.vec3(values[idx], values[idx + 1], values[idx + 2])
+    idx = (k + 1) * 3
+    v1 = glm.vec3(values[idx], values[idx + 1], values[idx + 2])
+    return glm.mix(v0, v1, factor)
+
+
+def rig_sintetico(nodes, clips, keys, rng):
+    """ Árvore de `nodes` nós (pais aleatórios, todos ossos) com `clips` clipes animando cada nó. """
+    parents = [-1] + [int(rng.integers(0, i)) for i in range(1, nodes)]
+    skeleton = Skeleton(parents, np.zeros((nodes, 3)), np.tile([1.0, 0.0, 0.0, 0.0], (nodes, 1)),
+                        np.ones((nodes, 3)), joints=list(range(nodes)))
+    animations = []
+    for _ in range(clips):
+        channels = [prepare_channel(*ch) for ch in clip_sintetico(keys, nodes, rng)]
+        for ch in channels:
+            ch['slot'] = skeleton.slot[ch['node_idx']]
+        animations.append({'channels': channels, 'duration': (keys - 1) / 30.0})
+    # Mesmos campos que o Animator usa de um Model carregado
+    return SimpleNamespace(skeleton=skeleton, animations=animations)
+
+
+def pose_uma(rig, clip, t):
+    """ Uma instância por vez, como o Model.pose_clip: amostra os canais e avalia o esqueleto. """
+    skeleton = rig.skeleton
+    skeleton.reset_pose()
+    for ch in rig.animations[clip]['channels']:
+        value = sample_channel(ch, t)
+        if ch['path'] == 'rotation':
+            skeleton.rotations[ch['slot']] = value
+        else:
+            skeleton.translations[ch['slot']] = value
+    return skeleton.update().copy()
+
+
+def medir(func, frames):
+    start = time.perf_counter()
+    for t in frames:
+        func(t)
+    return (time.perf_counter() - start) * 1000.0 / len(frames)
+
+
+def main():
+    rng = np.random.default_rng(3)
+    channels = 60
+    print(f"{channels} canais, reprodução para frente a 60 fps")
+    for keys in (100, 1000, 10000, 100000):
+        raw = clip_sintetico(keys, channels, rng)
+        prepared = [prepare_channel(*ch) for ch in raw]
+        duration = (keys - 1) / 30.0
+
+        # 300 frames seguidos a partir do meio do clipe (a varredura linear custa proporcional ao tempo)
+        frames = duration * 0.5 + np.arange(300) / 60.0
+
+        def novo(t):
+            for ch in prepared:
+                sample_channel(ch, t)
+
+        def antigo(t):
+            for _, path, times, values in raw:
+                amostra_linear(path, times, values, t)
+
+        # Conferência: os dois caminhos dão o mesmo valor
+        t_check = duration * 0.37
+        err = max(float(np.max(np.abs(np.array(sample_channel(ch, t_check)) -
+                                      np.array(amostra_linear(r[1], r[2], r[3], t_check)))))
+                  for ch, r in zip(prepared, raw))
+
+        novo_ms = medir(novo, frames)
+        # O caminho antigo fica lento demais nos clipes longos: amostra menos frames
+        antigo_ms = medir(antigo, frames[::max(1, keys // 1000)])
+        print(f"{keys:6d} chaves: cursor {novo_ms:7.3f} ms/frame | varredura linear {antigo_ms:9.3f} ms/frame | "
+              f"{antigo_ms / novo_ms:7.1f}x | diferença máx. {err:.2e}")
+
+    rig = rig_sintetico(60, 8, 120, rng)
+    print("\nAnimator: rig de 60 ossos, 8 clipes de 120 chaves")
+    for count in (1, 100, 1000):
+        animator = Animator(rig, count)
+        clips = rng.integers(0, len(rig.animations), count)
+        animator.play(clips)
+        animator.set_time(rng.uniform(0.0, 3.0, count))
+
+        # Conferência: a paleta em lote bate com a avaliação de uma instância
+        err = max(float(np.max(np.abs(pose_uma(rig, clips[i], animator._local_times(
+            clips[i:i + 1], animator.time[i:i + 1], animator.loop[i:i + 1])[0]) - animator.palettes[i])))
+            for i in range(0, count, max(1, count // 10)))
+
+        lote_ms = medir(lambda t: animator.update(1.0 / 60.0), range(30))
+        um_a_um_ms = medir(lambda t: [pose_uma(rig, c, t) for c in clips], np.arange(3) / 60.0)
+        print(f"{count:5d} instâncias: lote {lote_ms:8.3f} ms/frame | uma a uma {um_a_um_ms:9.3f} ms/frame | "
+              f"{um_a_um_ms / lote_ms:6.1f}x | diferença máx. {err:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+import glm
+
+# Os módulos do jogo ficam em src/ (importados sem pacote, como no main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from headless import prepare_headless
+
+# Sem janela: a plataforma do PyOpenGL precisa ser escolhida antes de importar o motor
+prepare_headless()
+
+import settings
+from camera import Camera
+from crowd import Crowd
+from main import Engine
+from model import Model
+from shader import Shader
+
+
+def main():
+    engine = Engine(1280, 720, headless=True)
+    engine.profiler.enabled = True
+
+    start = time.perf_counter()
+    shader = Shader("shaders/animated_model_crowd.vert", "shaders/animated_model.frag")
+    crowd = Crowd(Model(settings.CROWD_MODEL, shader), shader)
+    print(f"Modelo + bake da multidão em {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"(raio de culling {crowd.radius * settings.CROWD_SCALE:.2f} m)")
+    engine.crowd, engine.crowd_shader = crowd, shader
+
+    # Câmera alta olhando o terreno de cima, para a maior parte da multidão ficar visível
+    height = engine.terrain.get_height(0.0, 120.0)
+    camera = Camera(position=glm.vec3(0.0, height + 60.0, 120.0))
+    camera.process_mouse_movement(0.0, -300.0)
+
+    frames = 20
+    print(f"{frames} frames a 1280x720, meio-dia")
+    for count in (0, 100, 250, 500, 1000):
+        crowd.scatter(engine.terrain, count, seed=1, area=160.0)
+        # Aquecimento (compilação de shader, alocação do buffer)
+        engine.render_frame(camera, 12 * 60.0)
+
+        start = time.perf_counter()
+        for i in range(frames):
+            engine.render_frame(camera, 12 * 60.0 + i / 30.0)
+        frame_ms = (time.perf_counter() - start) * 1000.0 / frames
+
+        cpu = engine.profiler.percentiles("multidao", (50,))
+        gpu = engine.profiler.percentiles("multidao", (50,), gpu=True)
+        cpu_text = f"{cpu[0]:6.2f}" if cpu is not None and count else "     -"
+        gpu_text = f"{gpu[0]:7.2f}" if gpu is not None and count else "      -"
+        print(f"{count:5d} instâncias ({crowd.visible_count:4d} visíveis): frame {frame_ms:7.1f} ms | "
+              f"multidão cpu p50 {cpu_text} ms, gpu p50 {gpu_text} ms")
+
+    engine.release()
+
+
+if __name__ == "__main__":
+    main()
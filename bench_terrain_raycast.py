@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Os módulos do jogo ficam em src/ (importados sem pacote, como no main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import settings
+from terrain import load_heightmap, build_terrain_vertices
+from terrain_raycast import HeightPyramid, ray_triangle
+
+# Raios conferidos contra a força bruta (cada um testa dezenas de milhares de triângulos)
+AMOSTRA_REFERENCIA = 200
+
+
+def raios_aleatorios(count, rng):
+    """ Raios saindo de ~2-30m acima do terreno, olhando para baixo em ângulos rasos. """
+    half = settings.TERRAIN_SIZE / 2.0
+    origins = np.stack([rng.uniform(-half, half, count),
+                        rng.uniform(settings.MAX_TERRAIN_HEIGHT + 2.0, settings.MAX_TERRAIN_HEIGHT + 30.0, count),
+                        rng.uniform(-half, half, count)], axis=1)
+    yaw = rng.uniform(0.0, 2.0 * np.pi, count)
+    pitch = rng.uniform(-0.6, -0.05, count)
+    directions = np.stack([np.cos(yaw) * np.cos(pitch), np.sin(pitch), np.sin(yaw) * np.cos(pitch)], axis=1)
+    return origins, directions
+
+
+def ray_march_ingenuo(pyramid, origins, directions, max_distance, step):
+    """ Marcha com passo fixo (vetorizada nos raios) até o raio ficar abaixo da altura bilinear. """
+    h = pyramid.heights
+    n = len(origins)
+    distances = np.full(n, np.inf)
+    active = np.ones(n, dtype=bool)
+    for t in np.arange(step, max_distance, step):
+        idx = np.nonzero(active)[0]
+        if len(idx) == 0:
+            break
+        p = origins[idx] + directions[idx] * t
+        gx = (p[:, 0] - pyramid.start_x) / pyramid.step_x
+        gz = (p[:, 2] - pyramid.start_z) / pyramid.step_z
+        inside = (gx >= 0) & (gx <= pyramid.width - 1) & (gz >= 0) & (gz <= pyramid.depth - 1)
+        gx = np.clip(gx, 0, pyramid.width - 1)
+        gz = np.clip(gz, 0, pyramid.depth - 1)
+        j = np.minimum(gx.astype(np.intp), pyramid.width - 2)
+        i = np.minimum(gz.astype(np.intp), pyramid.depth - 2)
+        fx, fz = gx - j, gz - i
+        top = h[i, j] + (h[i, j + 1] - h[i, j]) * fx
+        bottom = h[i + 1, j] + (h[i + 1, j + 1] - h[i + 1, j]) * fx
+        below = inside & (p[:, 1] <= top + (bottom - top) * fz)
+        distances[idx[below]] = t - step * 0.5
+        active[idx[below]] = False
+    return np.isfinite(distances), distances
+
+
+def raycast_forca_bruta(pyramid, origin, direction, max_distance):
+    """
+    Referência exata: testa os dois triângulos de todas as células sob a projeção XZ
+    do raio (amostrada a cada 1/4 de célula, mais as vizinhas), sem a pirâmide.
+    Retorna a distância do acerto mais próximo ou inf.
+    """
+    length = max_distance * np.hypot(direction[0], direction[2]) / min(pyramid.step_x, pyramid.step_z)
+    t = np.linspace(0.0, max_distance, max(2, int(length * 4) + 2))
+    p = origin + direction * t[:, None]
+    gx = np.floor((p[:, 0] - pyramid.start_x) / pyramid.step_x).astype(np.intp)
+    gz = np.floor((p[:, 2] - pyramid.start_z) / pyramid.step_z).astype(np.intp)
+    offsets = np.array([-1, 0, 1])
+    cols = (gx[:, None, None] + offsets[None, None, :]).ravel()
+    rows = (gz[:, None, None] + offsets[None, :, None]).ravel()
+    keep = (cols >= 0) & (cols < pyramid.width - 1) & (rows >= 0) & (rows < pyramid.depth - 1)
+    cells = np.unique(rows[keep] * pyramid.width + cols[keep])
+    if len(cells) == 0:
+        return np.inf
+    rows, cols = np.divmod(cells, pyramid.width)
+
+    # Cantos no mundo, com a mesma diagonal da malha
+    h = pyramid.heights
+    x0 = pyramid.start_x + cols * pyramid.step_x
+    z0 = pyramid.start_z + rows * pyramid.step_z
+    top_left = np.stack([x0, h[rows, cols], z0], axis=1)
+    top_right = np.stack([x0 + pyramid.step_x, h[rows, cols + 1], z0], axis=1)
+    bottom_left = np.stack([x0, h[rows + 1, cols], z0 + pyramid.step_z], axis=1)
+    bottom_right = np.stack([x0 + pyramid.step_x, h[rows + 1, cols + 1], z0 + pyramid.step_z], axis=1)
+    o = np.broadcast_to(np.asarray(origin, dtype=np.float64), top_left.shape)
+    d = np.broadcast_to(np.asarray(direction, dtype=np.float64), top_left.shape)
+    t = np.minimum(ray_triangle(o, d, top_left, bottom_left, top_right),
+                   ray_triangle(o, d, top_right, bottom_left, bottom_right))
+    best = t.min()
+    return best if best <= max_distance else np.inf
+
+
+def main():
+    pixels = load_heightmap("assets/textures/heightmap.jpg")
+    heights, _ = build_terrain_vertices(pixels, settings.TERRAIN_SIZE, settings.MAX_TERRAIN_HEIGHT)
+    depth, width = heights.shape
+    step_x = settings.TERRAIN_SIZE / float(width - 1)
+    step_z = settings.TERRAIN_SIZE / float(depth - 1)
+
+    start = time.perf_counter()
+    pyramid = HeightPyramid(heights, -settings.TERRAIN_SIZE / 2.0, -settings.TERRAIN_SIZE / 2.0, step_x, step_z)
+    print(f"Pirâmide ({pyramid.top_level + 1} níveis) construída em {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(7)
+    max_distance = 200.0
+    for count in (1000, 10000, 50000):
+        origins, directions = raios_aleatorios(count, rng)
+
+        start = time.perf_counter()
+        hit, _, distances, _ = pyramid.raycast_batch(origins, directions, max_distance)
+        pyramid_ms = (time.perf_counter() - start) * 1000.0
+
+        # Passo de meia célula: o mínimo para a marcha não atravessar morros finos
+        march_step = 0.5 * min(step_x, step_z)
+        start = time.perf_counter()
+        march_hit, march_distances = ray_march_ingenuo(pyramid, origins, directions, max_distance, march_step)
+        march_ms = (time.perf_counter() - start) * 1000.0
+
+        # Precisão contra a malha de verdade (a marcha usa a superfície bilinear, que
+        # fica até alguns metros longe dos triângulos em encostas: só serve de tempo)
+        sample = rng.choice(count, min(count, AMOSTRA_REFERENCIA), replace=False)
+        reference = np.array([raycast_forca_bruta(pyramid, origins[i], directions[i], max_distance) for i in sample])
+        ref_hit = np.isfinite(reference)
+        both = hit[sample] & ref_hit
+        err = np.abs(distances[sample][both] - reference[both]).max() if both.any() else 0.0
+        agree = np.mean(hit[sample] == ref_hit) * 100.0
+        print(f"{count:6d} raios: pirâmide {pyramid_ms:8.1f} ms | marcha {march_ms:9.1f} ms | "
+              f"{march_ms / pyramid_ms:5.1f}x | acertos {hit.sum()} (marcha {march_hit.sum()}) | "
+              f"vs. força bruta ({len(sample)} raios): concordância {agree:.2f}%, erro máx. {err:.2e} m")
+
+
+if __name__ == "__main__":
+    main()
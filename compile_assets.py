@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Os módulos do jogo ficam em src/ (importados sem pacote, como no main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import settings
+from model_cache import compile_model, model_cache_is_current, model_cache_key, model_cache_path
+
+
+def encontrar_modelos(raizes):
+    """ Todos os .glb dentro das pastas (ou arquivos) dados, em ordem estável. """
+    modelos = []
+    for raiz in raizes:
+        if os.path.isfile(raiz):
+            modelos.append(raiz)
+            continue
+        for pasta, _, arquivos in os.walk(raiz):
+            modelos.extend(os.path.join(pasta, nome) for nome in arquivos if nome.lower().endswith(".glb"))
+    return sorted(modelos)
+
+
+def converter(origem, cache_dir):
+    """ Roda num processo separado: decodifica, gera mipmaps e grava o modelo compilado. """
+    inicio = time.perf_counter()
+    destino = compile_model(origem, cache_dir)
+    return origem, destino, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila os GLB para o formato de carregamento rápido (mmap).")
+    parser.add_argument("raizes", nargs="*", default=["assets"], help="pastas ou arquivos .glb (padrão: assets)")
+    parser.add_argument("--cache-dir", default=settings.MODEL_CACHE_DIR)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="processos em paralelo")
+    parser.add_argument("-f", "--force", action="store_true", help="recompila mesmo o que não mudou")
+    args = parser.parse_args()
+
+    modelos = encontrar_modelos(args.raizes)
+    pendentes = [m for m in modelos
+                 if args.force or not model_cache_is_current(model_cache_path(args.cache_dir, m), model_cache_key(m))]
+    print(f"{len(modelos)} modelos, {len(modelos) - len(pendentes)} em dia, {len(pendentes)} para compilar "
+          f"({args.jobs} processos)")
+
+    inicio = time.perf_counter()
+    falhas = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        tarefas = {pool.submit(converter, m, args.cache_dir): m for m in pendentes}
+        for tarefa in as_completed(tarefas):
+            try:
+                origem, destino, segundos = tarefa.result()
+                print(f"  {origem} -> {destino} ({segundos * 1000:.0f} ms)")
+            except Exception as e:
+                falhas += 1
+                print(f"  ERRO em {tarefas[tarefa]}: {e}")
+    print(f"Pronto em {time.perf_counter() - inicio:.2f} s ({falhas} falhas)")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
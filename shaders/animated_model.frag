@@ -7,9 +7,16 @@ in vec3 v_normal;
 in vec2 v_tex_coords;
 in vec4 v_frag_pos_light_space;
 
-uniform vec3 u_sun_direction;
-uniform vec3 u_sun_color;
-uniform vec3 u_ambient_color;
+// Constantes do frame (FrameConstants em frame_constants.py): UBO escrito uma vez por frame
+layout (std140) uniform FrameConstants {
+    mat4 view;
+    mat4 projection;
+    mat4 u_light_space_matrix;
+    vec3 u_sun_direction;
+    vec3 u_sun_color;
+    vec3 u_ambient_color;
+};
+
 uniform sampler2D u_shadow_map;
 
 // Textura enviada pelo Python
@@ -1,56 +1,67 @@
 #version 410 core
 
+// Vértice compacto (vertex_format.py): normal octaédrica em unorm16, uv em half,
+// ossos em uint8 inteiros e pesos em unorm8
 layout (location = 0) in vec3 aPos;
-layout (location = 1) in vec3 aNormal;
+layout (location = 1) in vec2 aNormalOct;
 layout (location = 2) in vec2 aTexCoords;
-
-// MUDANÇA: Agora recebemos como vec4 (floats), não ivec4
-layout (location = 3) in vec4 aBoneIDs; 
+layout (location = 3) in uvec4 aBoneIDs;
 layout (location = 4) in vec4 aWeights;
 
 uniform mat4 model;
-uniform mat4 view;
-uniform mat4 projection;
-uniform mat4 u_light_space_matrix;
 
-const int MAX_BONES = 100;
-uniform mat4 u_finalBones[MAX_BONES];
+// Constantes do frame (FrameConstants em frame_constants.py): UBO escrito uma vez por frame
+layout (std140) uniform FrameConstants {
+    mat4 view;
+    mat4 projection;
+    mat4 u_light_space_matrix;
+    vec3 u_sun_direction;
+    vec3 u_sun_color;
+    vec3 u_ambient_color;
+};
+
+// Paleta de ossos (BonePalette): 3 texels por osso com as linhas da matriz (mat3x4)
+uniform samplerBuffer u_bone_palette;
+uniform int u_bone_count;
 
 out vec3 v_frag_pos;
 out vec3 v_normal;
 out vec2 v_tex_coords;
 out vec4 v_frag_pos_light_space;
 
+mat4 fetchBone(int bone)
+{
+    vec4 r0 = texelFetch(u_bone_palette, bone * 3 + 0);
+    vec4 r1 = texelFetch(u_bone_palette, bone * 3 + 1);
+    vec4 r2 = texelFetch(u_bone_palette, bone * 3 + 2);
+    // Os texels são linhas; o construtor do GLSL recebe colunas
+    return transpose(mat4(r0, r1, r2, vec4(0.0, 0.0, 0.0, 1.0)));
+}
+
+// Normal octaédrica: [0, 1]² -> [-1, 1]² -> esfera (inverso de octahedral_encode)
+vec3 decodeNormal(vec2 oct)
+{
+    vec2 e = oct * 2.0 - 1.0;
+    vec3 n = vec3(e, 1.0 - abs(e.x) - abs(e.y));
+    if (n.z < 0.0) {
+        n.xy = (1.0 - abs(n.yx)) * vec2(n.x >= 0.0 ? 1.0 : -1.0, n.y >= 0.0 ? 1.0 : -1.0);
+    }
+    return normalize(n);
+}
+
 void main()
 {
     mat4 BoneTransform = mat4(0.0);
     float totalWeight = 0.0;
 
-    // Convertemos float para int manualmente aqui
-    int id0 = int(aBoneIDs.x);
-    int id1 = int(aBoneIDs.y);
-    int id2 = int(aBoneIDs.z);
-    int id3 = int(aBoneIDs.w);
-
-    // Osso 1
-    if (id0 >= 0 && id0 < MAX_BONES) { 
-        BoneTransform += u_finalBones[id0] * aWeights.x; 
-        totalWeight += aWeights.x; 
-    }
-    // Osso 2
-    if (id1 >= 0 && id1 < MAX_BONES) { 
-        BoneTransform += u_finalBones[id1] * aWeights.y; 
-        totalWeight += aWeights.y; 
-    }
-    // Osso 3
-    if (id2 >= 0 && id2 < MAX_BONES) { 
-        BoneTransform += u_finalBones[id2] * aWeights.z; 
-        totalWeight += aWeights.z; 
-    }
-    // Osso 4
-    if (id3 >= 0 && id3 < MAX_BONES) { 
-        BoneTransform += u_finalBones[id3] * aWeights.w; 
-        totalWeight += aWeights.w; 
+    // Sem limite fixo: qualquer id dentro da paleta enviada vale
+    for (int i = 0; i < 4; ++i) {
+        int id = int(aBoneIDs[i]);
+        float w = aWeights[i];
+        if (id < u_bone_count && w > 0.0) {
+            BoneTransform += fetchBone(id) * w;
+            totalWeight += w;
+        }
     }
 
     // Se for estático ou erro de peso, usa identidade
@@ -59,7 +70,7 @@ void main()
     }
 
     vec4 animatedPos = BoneTransform * vec4(aPos, 1.0);
-    vec4 animatedNormal = BoneTransform * vec4(aNormal, 0.0);
+    vec4 animatedNormal = BoneTransform * vec4(decodeNormal(aNormalOct), 0.0);
 
     v_frag_pos = vec3(model * animatedPos);
     v_normal = normalize(mat3(transpose(inverse(model))) * vec3(animatedNormal));
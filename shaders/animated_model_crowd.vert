@@ -0,0 +1,114 @@
+#version 410 core
+
+// Variante instanciada do animated_model_baked.vert (Crowd): matriz, clipe e
+// fase de cada cópia chegam como atributos por instância.
+
+// Vértice compacto (vertex_format.py), igual ao animated_model.vert
+layout (location = 0) in vec3 aPos;
+layout (location = 1) in vec2 aNormalOct;
+layout (location = 2) in vec2 aTexCoords;
+layout (location = 3) in uvec4 aBoneIDs;
+layout (location = 4) in vec4 aWeights;
+
+// Por instância
+layout (location = 5) in mat4 iModel;        // ocupa 5..8
+layout (location = 9) in vec4 iClip;         // primeira linha, frames, fps, duração
+layout (location = 10) in vec2 iTimeParams;  // deslocamento de tempo, velocidade
+
+// Constantes do frame (FrameConstants em frame_constants.py): UBO escrito uma vez por frame
+layout (std140) uniform FrameConstants {
+    mat4 view;
+    mat4 projection;
+    mat4 u_light_space_matrix;
+    vec3 u_sun_direction;
+    vec3 u_sun_color;
+    vec3 u_ambient_color;
+};
+
+uniform sampler2D u_bake_texture;
+uniform int u_bone_count;
+uniform int u_bake_rows; // frames por bloco de colunas (os seguintes continuam no bloco ao lado)
+uniform float u_time;
+
+out vec3 v_frag_pos;
+out vec3 v_normal;
+out vec2 v_tex_coords;
+out vec4 v_frag_pos_light_space;
+
+// Frame global -> texel: a textura é dividida em blocos de colunas de u_bake_rows linhas
+ivec2 frameTexel(int texel, int frame)
+{
+    int block = frame / u_bake_rows;
+    return ivec2(block * u_bone_count * 3 + texel, frame - block * u_bake_rows);
+}
+
+vec4 fetchRow(int texel, int row0, int row1, float a)
+{
+    return mix(texelFetch(u_bake_texture, frameTexel(texel, row0), 0),
+               texelFetch(u_bake_texture, frameTexel(texel, row1), 0), a);
+}
+
+// Matriz do osso interpolada entre dois frames (linha a linha)
+mat4 fetchBone(int bone, int row0, int row1, float a)
+{
+    vec4 r0 = fetchRow(bone * 3 + 0, row0, row1, a);
+    vec4 r1 = fetchRow(bone * 3 + 1, row0, row1, a);
+    vec4 r2 = fetchRow(bone * 3 + 2, row0, row1, a);
+    // Os texels são linhas; o construtor do GLSL recebe colunas
+    return transpose(mat4(r0, r1, r2, vec4(0.0, 0.0, 0.0, 1.0)));
+}
+
+// Normal octaédrica: [0, 1]² -> [-1, 1]² -> esfera (inverso de octahedral_encode)
+vec3 decodeNormal(vec2 oct)
+{
+    vec2 e = oct * 2.0 - 1.0;
+    vec3 n = vec3(e, 1.0 - abs(e.x) - abs(e.y));
+    if (n.z < 0.0) {
+        n.xy = (1.0 - abs(n.yx)) * vec2(n.x >= 0.0 ? 1.0 : -1.0, n.y >= 0.0 ? 1.0 : -1.0);
+    }
+    return normalize(n);
+}
+
+void main()
+{
+    // Frame do clipe (em loop) e fração para interpolar com o seguinte
+    int first_row = int(iClip.x);
+    int frames = int(iClip.y);
+    float duration = iClip.w;
+    float local_time = u_time * iTimeParams.y + iTimeParams.x;
+    float t = duration > 0.0 ? mod(local_time, duration) : 0.0;
+    float f = clamp(t * iClip.z, 0.0, float(frames - 1));
+    int f0 = int(floor(f));
+    int f1 = min(f0 + 1, frames - 1);
+    float a = f - float(f0);
+    int row0 = first_row + f0;
+    int row1 = first_row + f1;
+
+    mat4 BoneTransform = mat4(0.0);
+    float totalWeight = 0.0;
+
+    for (int i = 0; i < 4; ++i) {
+        int id = int(aBoneIDs[i]);
+        float w = aWeights[i];
+        if (id < u_bone_count && w > 0.0) {
+            BoneTransform += fetchBone(id, row0, row1, a) * w;
+            totalWeight += w;
+        }
+    }
+
+    // Se for estático ou erro de peso, usa identidade
+    if (totalWeight < 0.001) {
+        BoneTransform = mat4(1.0);
+    }
+
+    vec4 animatedPos = BoneTransform * vec4(aPos, 1.0);
+    vec4 animatedNormal = BoneTransform * vec4(decodeNormal(aNormalOct), 0.0);
+
+    v_frag_pos = vec3(iModel * animatedPos);
+    // Só translação, giro em Y e escala uniforme: dispensa a inversa por vértice
+    v_normal = normalize(mat3(iModel) * vec3(animatedNormal));
+    v_tex_coords = aTexCoords;
+    v_frag_pos_light_space = u_light_space_matrix * vec4(v_frag_pos, 1.0);
+
+    gl_Position = projection * view * vec4(v_frag_pos, 1.0);
+}
@@ -1,10 +1,20 @@
 #version 410 core
 layout (location = 0) in vec3 in_position;
 
-uniform mat4 lightSpaceMatrix; // Matriz da "Câmera do Sol"
+// Constantes do frame (FrameConstants em frame_constants.py): UBO escrito uma vez por frame
+layout (std140) uniform FrameConstants {
+    mat4 view;
+    mat4 projection;
+    mat4 u_light_space_matrix;
+    vec3 u_sun_direction;
+    vec3 u_sun_color;
+    vec3 u_ambient_color;
+};
+
 uniform mat4 model;
 
 void main()
 {
-    gl_Position = lightSpaceMatrix * model * vec4(in_position, 1.0);
+    // u_light_space_matrix é a matriz da "câmera do sol"
+    gl_Position = u_light_space_matrix * model * vec4(in_position, 1.0);
 }
\ No newline at end of file
@@ -2,8 +2,16 @@
 
 layout (location = 0) in vec3 aPos;
 
-uniform mat4 projection;
-uniform mat4 view;
+// Constantes do frame (FrameConstants em frame_constants.py): UBO escrito uma vez por frame
+layout (std140) uniform FrameConstants {
+    mat4 view;
+    mat4 projection;
+    mat4 u_light_space_matrix;
+    vec3 u_sun_direction;
+    vec3 u_sun_color;
+    vec3 u_ambient_color;
+};
+
 uniform mat4 model;
 
 void main()
@@ -7,10 +7,17 @@ in vec3 v_normal;
 in vec3 v_world_pos;
 in vec4 v_frag_pos_light_space; // Recebido do Vertex Shader
 
-// Uniforms de Iluminação
-uniform vec3 u_sun_direction;
-uniform vec3 u_sun_color;
-uniform vec3 u_ambient_color;
+// Iluminação (sol e ambiente)
+// Constantes do frame (FrameConstants em frame_constants.py): UBO escrito uma vez por frame
+layout (std140) uniform FrameConstants {
+    mat4 view;
+    mat4 projection;
+    mat4 u_light_space_matrix;
+    vec3 u_sun_direction;
+    vec3 u_sun_color;
+    vec3 u_ambient_color;
+};
+
 uniform sampler2D u_shadow_map; // O Mapa de Sombr
 
 // Cor base do terreno (verde)
@@ -5,9 +5,16 @@ layout (location = 1) in vec3 in_normal;
 
 // Matrizes para transformar o 3D em 2D na tela
 uniform mat4 model;
-uniform mat4 view;
-uniform mat4 projection;
-uniform mat4 u_light_space_matrix; // Matriz da luz
+
+// Constantes do frame (FrameConstants em frame_constants.py): UBO escrito uma vez por frame
+layout (std140) uniform FrameConstants {
+    mat4 view;
+    mat4 projection;
+    mat4 u_light_space_matrix;
+    vec3 u_sun_direction;
+    vec3 u_sun_color;
+    vec3 u_ambient_color;
+};
 
 // Saída para o Fragment Shader
 out vec3 v_normal;
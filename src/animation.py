@@ -0,0 +1,316 @@
+from bisect import bisect_right
+
+import glm
+import numpy as np
+
+# Quantos componentes cada caminho animável do glTF tem
+PATH_COMPONENTS = {'translation': 3, 'rotation': 4, 'scale': 3}
+
+
+def _to_glm(path, row):
+    if path == 'rotation':
+        # glTF guarda (x, y, z, w); o glm.quat recebe (w, x, y, z)
+        return glm.quat(float(row[3]), float(row[0]), float(row[1]), float(row[2]))
+    return glm.vec3(float(row[0]), float(row[1]), float(row[2]))
+
+
+def prepare_channel(node_idx, path, times, values, interpolation='LINEAR'):
+    """
+    Converte um canal do glTF uma vez só, no carregamento: tempos viram lista (para bisect)
+    e cada chave vira glm.vec3/glm.quat. No CUBICSPLINE cada chave é (tangente de entrada,
+    valor, tangente de saída). O cursor guarda a última chave usada.
+    """
+    comp = PATH_COMPONENTS[path]
+    rows = np.asarray(values, dtype=np.float32).reshape(-1, comp)
+    keys = [_to_glm(path, row) for row in rows]
+    if interpolation == 'CUBICSPLINE':
+        keys = [tuple(keys[i:i + 3]) for i in range(0, len(keys), 3)]
+    return {'node_idx': node_idx, 'path': path, 'interpolation': interpolation,
+            'times': [float(t) for t in np.asarray(times).ravel()], 'keys': keys, 'cursor': 0}
+
+
+def find_key(times, t, cursor):
+    """
+    Índice k da chave com times[k] <= t < times[k+1] (limitado a [0, len-2]).
+    Testa primeiro o cursor e a chave seguinte (reprodução para frente é O(1));
+    fora disso, busca binária.
+    """
+    last = len(times) - 2
+    if cursor <= last and times[cursor] <= t:
+        if t < times[cursor + 1]:
+            return cursor
+        if cursor + 1 <= last and t < times[cursor + 2]:
+            return cursor + 1
+    return min(max(bisect_right(times, t) - 1, 0), last)
+
+
+def sample_channel(channel, t):
+    """ Valor do canal no instante t (glm.vec3 ou glm.quat), respeitando a interpolação do glTF. """
+    times = channel['times']
+    keys = channel['keys']
+    interpolation = channel['interpolation']
+    cubic = interpolation == 'CUBICSPLINE'
+
+    # Antes da primeira/depois da última chave, o valor fica parado na ponta
+    if len(times) == 1 or t <= times[0]:
+        return keys[0][1] if cubic else keys[0]
+    if t >= times[-1]:
+        return keys[-1][1] if cubic else keys[-1]
+
+    k = find_key(times, t, channel['cursor'])
+    channel['cursor'] = k
+
+    if interpolation == 'STEP':
+        return keys[k]
+
+    dt = times[k + 1] - times[k]
+    s = (t - times[k]) / dt if dt > 0 else 0.0
+
+    if cubic:
+        # Hermite com as tangentes do glTF (escaladas pela duração do intervalo)
+        _, v0, b0 = keys[k]
+        a1, v1, _ = keys[k + 1]
+        s2 = s * s
+        s3 = s2 * s
+        value = v0 * (2 * s3 - 3 * s2 + 1) + b0 * ((s3 - 2 * s2 + s) * dt) \
+            + v1 * (-2 * s3 + 3 * s2) + a1 * ((s3 - s2) * dt)
+        return glm.normalize(value) if channel['path'] == 'rotation' else value
+
+    if channel['path'] == 'rotation':
+        return glm.slerp(keys[k], keys[k + 1], s)
+    return glm.mix(keys[k], keys[k + 1], s)
+
+
+# --- Animação em lote (muitas instâncias do mesmo rig) ---
+
+def _slerp(q0, q1, s):
+    """ glm.slerp vetorizado: quaternions (..., 4) em (w, x, y, z), caminho mais curto. """
+    d = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(d < 0.0, -q1, q1)
+    d = np.abs(d)
+    theta = np.arccos(np.clip(d, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Quase paralelos: o glm cai no lerp para não dividir por ~0
+    near = d > 1.0 - np.finfo(np.float32).eps
+    safe = np.where(near, 1.0, sin_theta)
+    a = np.where(near, 1.0 - s, np.sin((1.0 - s) * theta) / safe)
+    b = np.where(near, s, np.sin(s * theta) / safe)
+    return a * q0 + b * q1
+
+
+def _nlerp(q0, q1, w):
+    """ Mistura de rotações do cross-fade: lerp no hemisfério de q0 e normaliza. """
+    d = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q = q0 + (np.where(d < 0.0, -q1, q1) - q0) * w
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def pack_clip(anim):
+    """
+    Empacota os canais já preparados de um clipe em arrays por caminho, para amostrar
+    muitos instantes de uma vez. Os tempos de todos os canais ficam num array só, o
+    canal c deslocado por c * span, então uma searchsorted acha as chaves de todos os
+    canais para todas as instâncias.
+    """
+    packed = {'duration': anim['duration']}
+    for path, comp in PATH_COMPONENTS.items():
+        channels = [ch for ch in anim['channels'] if ch['path'] == path]
+        if not channels:
+            packed[path] = None
+            continue
+        t_min = min(ch['times'][0] for ch in channels)
+        t_max = max(ch['times'][-1] for ch in channels)
+        span = t_max - t_min + 1.0
+
+        times, values, in_tangents, out_tangents, first = [], [], [], [], []
+        for c, ch in enumerate(channels):
+            first.append(sum(len(t) for t in times))
+            times.append(np.asarray(ch['times'], dtype=np.float64) + c * span)
+            if ch['interpolation'] == 'CUBICSPLINE':
+                keys = np.array([[np.array(k) for k in key] for key in ch['keys']], dtype=np.float64)
+                in_tangents.append(keys[:, 0])
+                values.append(keys[:, 1])
+                out_tangents.append(keys[:, 2])
+            else:
+                keys = np.array([np.array(k) for k in ch['keys']], dtype=np.float64).reshape(-1, comp)
+                values.append(keys)
+                in_tangents.append(np.zeros_like(keys))
+                out_tangents.append(np.zeros_like(keys))
+        first = np.array(first, dtype=np.intp)
+        last = first + np.array([len(t) for t in times], dtype=np.intp) - 1
+
+        packed[path] = {
+            'slots': np.array([ch['slot'] for ch in channels], dtype=np.intp),
+            'times': np.concatenate(times),
+            'values': np.concatenate(values),
+            'in': np.concatenate(in_tangents),
+            'out': np.concatenate(out_tangents),
+            'first': first, 'last': last,
+            'base': np.arange(len(channels)) * span,
+            't_min': t_min, 't_max': t_max,
+            'step': np.array([ch['interpolation'] == 'STEP' for ch in channels]),
+            'cubic': np.array([ch['interpolation'] == 'CUBICSPLINE' for ch in channels]),
+        }
+    return packed
+
+
+def sample_track(track, path, t):
+    """ Valores de todos os canais de um caminho em M instantes: (M, canais, componentes). """
+    times = track['times']
+    q = np.clip(np.asarray(t, dtype=np.float64)[:, None], track['t_min'], track['t_max']) + track['base']
+    k = np.clip(np.searchsorted(times, q, side='right') - 1, track['first'], track['last'])
+    k1 = np.minimum(k + 1, track['last'])
+    t0 = times[k]
+    dt = times[k1] - t0
+    s = np.where(dt > 0.0, (q - t0) / np.where(dt > 0.0, dt, 1.0), 0.0)
+    s = np.where(track['step'], 0.0, np.clip(s, 0.0, 1.0))[..., None]
+
+    v0 = track['values'][k]
+    v1 = track['values'][k1]
+    if path == 'rotation':
+        value = _slerp(v0, v1, s)
+    else:
+        value = v0 + (v1 - v0) * s
+
+    if track['cubic'].any():
+        # Hermite com as tangentes do glTF (escaladas pela duração do intervalo)
+        s2 = s * s
+        s3 = s2 * s
+        h = dt[..., None]
+        hermite = v0 * (2 * s3 - 3 * s2 + 1) + track['out'][k] * ((s3 - 2 * s2 + s) * h) \
+            + v1 * (-2 * s3 + 3 * s2) + track['in'][k1] * ((s3 - s2) * h)
+        if path == 'rotation':
+            hermite /= np.linalg.norm(hermite, axis=-1, keepdims=True)
+        value = np.where(track['cubic'][:, None], hermite, value)
+    return value
+
+
+class Animator:
+    """
+    Estado de reprodução de N instâncias de um rig carregado uma vez só (Model): clipe,
+    tempo, velocidade, loop e cross-fade de cada instância ficam em arrays, e o update
+    avalia todas de uma vez (um passe vetorizado por clipe em uso, não por instância).
+    `palettes` guarda a paleta de ossos de cada instância (N, ossos, 3, 4).
+    """
+
+    def __init__(self, model, count=1):
+        self.model = model
+        self.skeleton = model.skeleton
+        self.clips = [pack_clip(anim) for anim in model.animations]
+
+        # Só os nós animados por algum clipe mudam; os outros usam a matriz local de repouso
+        self.slots = np.unique(np.concatenate([track['slots'] for clip in self.clips
+                                               for path, track in clip.items()
+                                               if path != 'duration' and track is not None] or
+                                              [np.zeros(0, np.intp)])).astype(np.intp)
+        for clip in self.clips:
+            for path, track in clip.items():
+                if path != 'duration' and track is not None:
+                    track['columns'] = np.searchsorted(self.slots, track['slots'])
+        self.durations = np.array([clip['duration'] for clip in self.clips] or [0.0])
+        self.count = count
+
+        self.clip = np.zeros(count, dtype=np.intp)
+        self.time = np.zeros(count)
+        self.speed = np.ones(count)
+        self.loop = np.ones(count, dtype=bool)
+
+        # Clipe anterior enquanto o cross-fade não termina (-1 = sem fade)
+        self.prev_clip = np.full(count, -1, dtype=np.intp)
+        self.prev_time = np.zeros(count)
+        self.prev_loop = np.ones(count, dtype=bool)
+        self.fade_time = np.zeros(count)
+        self.fade_duration = np.zeros(count)
+
+        # Modelo que não carregou (ou sem ossos): nada a avaliar, o Model desenha em repouso
+        self.bone_count = len(self.skeleton.joint_slots) if self.skeleton is not None else 0
+        self.palettes = np.zeros((count, self.bone_count, 3, 4), dtype=np.float32)
+        self.version = 0  # muda a cada avaliação (para a BonePalette pular envios repetidos)
+        self.evaluate()
+
+    def play(self, clip, instances=None, fade=0.0, time=0.0, speed=None, loop=None):
+        """ Troca o clipe das instâncias (todas se None), misturando com o atual por `fade` segundos. """
+        idx = slice(None) if instances is None else np.asarray(instances)
+        if fade > 0.0:
+            self.prev_clip[idx] = self.clip[idx]
+            self.prev_time[idx] = self.time[idx]
+            self.prev_loop[idx] = self.loop[idx]
+            self.fade_time[idx] = 0.0
+            self.fade_duration[idx] = fade
+        else:
+            self.prev_clip[idx] = -1
+        self.clip[idx] = clip
+        self.time[idx] = time
+        if speed is not None:
+            self.speed[idx] = speed
+        if loop is not None:
+            self.loop[idx] = loop
+
+    def fade_weights(self):
+        """ Peso do clipe atual em cada instância (1 = sem fade). """
+        w = self.fade_time / np.where(self.fade_duration > 0.0, self.fade_duration, 1.0)
+        return np.where(self.prev_clip >= 0, np.clip(w, 0.0, 1.0), 1.0)
+
+    def update(self, delta_time):
+        """ Avança todas as instâncias e recalcula as paletas. """
+        step = delta_time * self.speed
+        self.time += step
+        self.prev_time += step
+        self.fade_time += delta_time
+        self.prev_clip[self.fade_time >= self.fade_duration] = -1
+        return self.evaluate()
+
+    def set_time(self, t, instances=None):
+        """ Posiciona instâncias num instante fixo, sem fade (frames determinísticos). """
+        idx = slice(None) if instances is None else np.asarray(instances)
+        self.time[idx] = t
+        self.prev_clip[idx] = -1
+        return self.evaluate()
+
+    def _local_times(self, clips, times, loops):
+        """ Tempo dentro do clipe: em loop dá a volta, senão para no último frame. """
+        duration = self.durations[clips]
+        wrapped = np.where(duration > 0.0, np.mod(times, np.where(duration > 0.0, duration, 1.0)), 0.0)
+        return np.where(loops, wrapped, np.clip(times, 0.0, duration))
+
+    def _pose(self, clips, times, loops):
+        """ TRS locais dos nós animados (N, len(slots), ...): repouso mais os canais de cada clipe. """
+        skeleton = self.skeleton
+        n = len(clips)
+        translations = np.repeat(skeleton.rest_translations[None, self.slots], n, axis=0)
+        rotations = np.repeat(skeleton.rest_rotations[None, self.slots], n, axis=0)
+        scales = np.repeat(skeleton.rest_scales[None, self.slots], n, axis=0)
+        targets = {'translation': translations, 'rotation': rotations, 'scale': scales}
+
+        local = self._local_times(np.minimum(clips, len(self.durations) - 1), times, loops)
+        for c in np.unique(clips):
+            if c < 0 or c >= len(self.clips):
+                continue
+            idx = np.nonzero(clips == c)[0]
+            for path, track in self.clips[c].items():
+                if path == 'duration' or track is None:
+                    continue
+                targets[path][idx[:, None], track['columns']] = sample_track(track, path, local[idx])
+        return translations, rotations, scales
+
+    def evaluate(self):
+        """ Recalcula as paletas de todas as instâncias (com cross-fade onde houver). """
+        if self.bone_count == 0:
+            return self.palettes
+        translations, rotations, scales = self._pose(self.clip, self.time, self.loop)
+
+        fading = np.nonzero(self.prev_clip >= 0)[0]
+        if len(fading):
+            w = self.fade_weights()[fading][:, None, None]
+            t0, r0, s0 = self._pose(self.prev_clip[fading], self.prev_time[fading], self.prev_loop[fading])
+            translations[fading] = t0 + (translations[fading] - t0) * w
+            rotations[fading] = _nlerp(r0, rotations[fading], w)
+            scales[fading] = s0 + (scales[fading] - s0) * w
+
+        self.skeleton.pose_batch(translations, rotations, scales, self.slots, out=self.palettes)
+        self.version += 1
+        return self.palettes
+
+    def draw(self, shader, instance=0):
+        """ Desenha o modelo com a pose de uma instância. """
+        self.model.draw(shader, self.palettes[instance], (id(self), instance, self.version))
@@ -0,0 +1,138 @@
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from model import Model
+
+# Estados de um AssetHandle
+PENDING = "pendente"     # parte de CPU rodando (ou na fila) numa thread
+UPLOADING = "enviando"   # esperando/rodando os passos de GPU na thread do OpenGL
+READY = "pronto"
+FAILED = "falhou"
+
+
+class AssetHandle:
+    """ Um asset pedido ao AssetLoader: `asset` só pode ser usado quando `ready`. """
+
+    def __init__(self, name, asset):
+        self.name = name
+        self.asset = asset
+        self.status = PENDING
+        self.error = None
+
+    @property
+    def ready(self):
+        return self.status == READY
+
+    @property
+    def done(self):
+        return self.status in (READY, FAILED)
+
+
+class AssetLoader:
+    """
+    Carregamento em duas metades: `prepare` (leitura, decodificação, montagem dos
+    arrays) roda num pool de threads; o que chama o OpenGL vira um gerador de passos
+    curtos que pump() executa na thread do contexto, a cada frame, até gastar o
+    orçamento em ms. Assim um modelo novo entra no meio da sessão sem travar o frame.
+    """
+
+    def __init__(self, threads=None, budget_ms=None):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, threads or settings.ASSET_LOADER_THREADS),
+                                       thread_name_prefix="assets")
+        self.budget_ms = settings.ASSET_UPLOAD_BUDGET_MS if budget_ms is None else budget_ms
+        self.preparing = [] # (handle, future, gerador de envio)
+        self.uploads = deque() # (handle, passos) na ordem em que ficaram prontos na CPU
+        self.handles = [] # só os que ainda não terminaram (pump() tira os prontos e os que falharam)
+        self.last_pump_ms = 0.0
+
+    def submit(self, name, asset, prepare, upload):
+        """
+        `prepare()` roda numa thread e não pode chamar o OpenGL; seu retorno vai para
+        `upload(dados)`, um gerador que roda na thread do contexto (cada yield é um passo).
+        """
+        handle = AssetHandle(name, asset)
+        self.preparing.append((handle, self.pool.submit(prepare), upload))
+        self.handles.append(handle)
+        return handle
+
+    def load_model(self, path, shader, arena=None):
+        """ Model vazio na hora; malhas, texturas e esqueleto chegam quando o handle fica pronto. """
+        print(f"Carregando em segundo plano: {path}...")
+        model = Model(path, shader, load=False, arena=arena)
+        return self.submit(path, model, lambda: model.prepare(path), model.upload_steps)
+
+    @property
+    def pending(self):
+        """ Quantos assets ainda não terminaram (nem com falha). """
+        return len(self.handles)
+
+    def _fail(self, handle, error):
+        handle.status = FAILED
+        handle.error = error
+        print(f"Erro ao carregar {handle.name}: {error}")
+        traceback.print_exception(type(error), error, error.__traceback__)
+
+    def _collect(self, finished, wait=False):
+        """
+        Passa para a fila de envio o que a CPU já terminou (ou espera tudo, com wait);
+        os que falharam no preparo vão direto para `finished`.
+        """
+        still_preparing = []
+        for handle, future, upload in self.preparing:
+            if not wait and not future.done():
+                still_preparing.append((handle, future, upload))
+                continue
+            try:
+                data = future.result()
+            except Exception as e:
+                self._fail(handle, e)
+                finished.append(handle)
+                continue
+            handle.status = UPLOADING
+            self.uploads.append((handle, upload(data)))
+        self.preparing = still_preparing
+
+    def pump(self, budget_ms=None):
+        """
+        Roda passos de envio até estourar o orçamento (sempre pelo menos um, para não
+        estagnar com um passo maior que o orçamento). Retorna os handles que terminaram,
+        com sucesso ou falha (no preparo ou no envio).
+        """
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        start = time.perf_counter()
+        finished = []
+        self._collect(finished)
+
+        while self.uploads:
+            handle, steps = self.uploads[0]
+            try:
+                next(steps)
+            except StopIteration:
+                self.uploads.popleft()
+                handle.status = READY
+                finished.append(handle)
+            except Exception as e:
+                self.uploads.popleft()
+                self._fail(handle, e)
+                finished.append(handle)
+            if (time.perf_counter() - start) * 1000.0 >= budget_ms:
+                break
+
+        # Só os que ainda estão em andamento (inclui falhas recolhidas pelo finish())
+        self.handles = [handle for handle in self.handles if not handle.done]
+        self.last_pump_ms = (time.perf_counter() - start) * 1000.0
+        return finished
+
+    def finish(self):
+        """ Espera e envia tudo o que está pendente (headless, testes, tela de carregamento). """
+        finished = []
+        while self.preparing or self.uploads:
+            self._collect(finished, wait=True)
+            finished.extend(self.pump(float("inf")))
+        return finished
+
+    def release(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
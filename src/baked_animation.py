@@ -0,0 +1,123 @@
+import numpy as np
+from OpenGL.GL import *
+
+import settings
+from gl_state import gl_state
+
+# Unidade de textura da animação assada (0 = textura difusa, 1 = mapa de sombra)
+BAKE_TEXTURE_UNIT = 2
+
+
+def bake_clips(model, fps=None):
+    """
+    Parte de CPU do bake (não chama o OpenGL): amostra os clipes e retorna
+    (clipes, dados) com dados em float32 (frames, ossos * 3, 4).
+    """
+    if not model.joints:
+        raise ValueError("O modelo não tem esqueleto para assar")
+    fps = fps or settings.BAKE_FPS
+
+    # clipes: {'first_row', 'frames', 'fps', 'duration'} na ordem de model.animations
+    clips = []
+    rows = []
+    skeleton = model.skeleton
+    for i, anim in enumerate(model.animations):
+        duration = anim['duration']
+        # Passo uniforme que cai exatamente no fim do clipe (o loop fecha sem salto)
+        frames = max(2, int(np.ceil(duration * fps)) + 1) if duration > 0 else 1
+        skeleton.reset_pose()
+        for t in np.linspace(0.0, duration, frames):
+            palette = model.pose_clip(i, float(t))
+            # Paleta já vem em linhas (mat3x4); copia porque o esqueleto a reaproveita
+            rows.append(palette.reshape(-1, 4).copy())
+        clips.append({'first_row': len(rows) - frames, 'frames': frames,
+                      'fps': (frames - 1) / duration if duration > 0 else 0.0,
+                      'duration': duration})
+
+    # O modelo volta para a pose de repouso (o bake não deixa rastro)
+    skeleton.reset_pose()
+    skeleton.update()
+    return clips, np.ascontiguousarray(np.stack(rows), dtype=np.float32)
+
+
+def wrap_frames(data, max_rows):
+    """
+    (frames, largura, 4) -> textura (linhas, blocos * largura, 4) com no máximo
+    `max_rows` linhas: o frame g fica no bloco g // linhas, linha g % linhas.
+    Retorna (textura, linhas por bloco).
+    """
+    frames, width, _ = data.shape
+    blocks = -(-frames // max_rows)
+    rows = -(-frames // blocks)
+    padded = np.zeros((blocks * rows, width, 4), dtype=np.float32)
+    padded[:frames] = data
+    texture = padded.reshape(blocks, rows, width, 4).transpose(1, 0, 2, 3).reshape(rows, blocks * width, 4)
+    return np.ascontiguousarray(texture), rows
+
+
+class BakedAnimation:
+    """
+    Amostra todos os clipes de um Model numa taxa fixa e guarda as paletas de ossos
+    numa textura RGBA32F: cada linha é um frame, cada osso ocupa 3 texels com as
+    3 primeiras linhas da matriz (a última é sempre 0, 0, 0, 1). Frames que não cabem
+    na altura máxima da GPU continuam em blocos de colunas ao lado (u_bake_rows).
+    O shader animated_model_baked.vert busca e interpola os frames, então tocar um
+    clipe assado só custa definir o uniform de tempo.
+    """
+
+    def __init__(self, model, fps=None, baked=None, max_rows=None):
+        """
+        `baked` = (clipes, dados) de bake_clips() já calculados (ex.: numa thread).
+        `max_rows` limita a altura da textura (padrão: GL_MAX_TEXTURE_SIZE).
+        """
+        if not model.joints:
+            raise ValueError("O modelo não tem esqueleto para assar")
+        self.model = model
+        self.bone_count = len(model.joints)
+        self.clips, self.data = baked or bake_clips(model, fps)
+
+        max_size = glGetIntegerv(GL_MAX_TEXTURE_SIZE)
+        texture_data, self.block_rows = wrap_frames(self.data, min(max_rows or max_size, max_size))
+        height, width, _ = texture_data.shape
+        if width > max_size:
+            raise ValueError(f"Textura de animação {width}x{height} passa do limite da GPU ({max_size})")
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        # Lida com texelFetch: sem filtro nem mipmap
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F, width, height, 0, GL_RGBA, GL_FLOAT, texture_data)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        print(f"Animação assada: {len(self.clips)} clipes, {len(self.data)} frames "
+              f"({width // (self.bone_count * 3)} bloco(s) de {height} linhas), "
+              f"{texture_data.nbytes / (1024 * 1024):.1f} MB")
+
+    def bind_texture(self, shader):
+        """ Liga só a textura e o número de ossos (o clipe pode vir de atributos por instância). """
+        gl_state.bind_texture(BAKE_TEXTURE_UNIT, self.texture)
+        shader.set_uniform_int("u_bake_texture", BAKE_TEXTURE_UNIT)
+        shader.set_uniform_int("u_bone_count", self.bone_count)
+        shader.set_uniform_int("u_bake_rows", self.block_rows)
+
+    def bind(self, shader, clip_index, time):
+        """ Liga a textura e define os uniforms do clipe (o shader já deve estar em uso). """
+        clip = self.clips[clip_index]
+        self.bind_texture(shader)
+        shader.set_uniform_int("u_clip_first_row", clip['first_row'])
+        shader.set_uniform_int("u_clip_frames", clip['frames'])
+        shader.set_uniform_float("u_clip_fps", clip['fps'])
+        shader.set_uniform_float("u_clip_duration", clip['duration'])
+        shader.set_uniform_float("u_time", time)
+
+    def draw(self, shader, clip_index, time):
+        """ Desenha o modelo tocando o clipe assado no instante `time` (em loop). """
+        self.bind(shader, clip_index, time)
+        for mesh in self.model.meshes:
+            mesh.draw(shader)
+
+    def release(self):
+        glDeleteTextures(1, [self.texture])
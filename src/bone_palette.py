@@ -0,0 +1,57 @@
+import numpy as np
+from OpenGL.GL import *
+
+from gl_state import gl_state
+
+# Unidade de textura da paleta (0 = textura difusa, 1 = mapa de sombra, 2 = animação assada)
+BONE_PALETTE_TEXTURE_UNIT = 3
+
+
+class BonePalette:
+    """
+    Paleta de ossos persistente num texture buffer (GL_TEXTURE_BUFFER, RGBA32F):
+    cada osso ocupa 3 texels com as linhas da matriz no layout mat3x4, então não há
+    limite fixo de ossos como num array de uniforms. O buffer é alocado uma vez e só
+    é reenviado quando a pose muda (comparando a versão do Skeleton).
+    """
+
+    def __init__(self, bone_count):
+        self.bone_count = bone_count
+        self.uploaded_version = None
+
+        max_texels = glGetIntegerv(GL_MAX_TEXTURE_BUFFER_SIZE)
+        if bone_count * 3 > max_texels:
+            raise ValueError(f"Paleta de {bone_count} ossos passa do limite do texture buffer ({max_texels} texels)")
+
+        # 3 vec4 por osso; pelo menos um osso para o buffer nunca ficar vazio
+        self.nbytes = max(bone_count, 1) * 3 * 4 * 4
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_TEXTURE_BUFFER, self.buffer)
+        glBufferData(GL_TEXTURE_BUFFER, self.nbytes, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_BUFFER, self.texture)
+        glTexBuffer(GL_TEXTURE_BUFFER, GL_RGBA32F, self.buffer)
+        glBindTexture(GL_TEXTURE_BUFFER, 0)
+
+    def upload(self, palette, version=None):
+        """ Envia a paleta (ossos, 3, 4) no lugar; pula o envio se `version` já foi enviada. """
+        if version is not None and version == self.uploaded_version:
+            return False
+        data = np.ascontiguousarray(palette, dtype=np.float32)
+        glBindBuffer(GL_TEXTURE_BUFFER, self.buffer)
+        glBufferSubData(GL_TEXTURE_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+        self.uploaded_version = version
+        return True
+
+    def bind(self, shader):
+        """ Liga o texture buffer e o número de ossos (o shader já deve estar em uso). """
+        gl_state.bind_texture(BONE_PALETTE_TEXTURE_UNIT, self.texture, GL_TEXTURE_BUFFER)
+        shader.set_uniform_int("u_bone_palette", BONE_PALETTE_TEXTURE_UNIT)
+        shader.set_uniform_int("u_bone_count", self.bone_count)
+
+    def release(self):
+        glDeleteTextures(1, [self.texture])
+        glDeleteBuffers(1, [self.buffer])
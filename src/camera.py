@@ -4,6 +4,9 @@ import settings
 class Camera:
     def __init__(self, position=glm.vec3(0,0,3)):
 
+        # matriz view calculada só quando a posição ou a direção mudam
+        self._view = None
+
         # posição e direção da câmera
         self.pos = position
         self.front = glm.vec3(0,0,-1) # olhando para -Z
@@ -17,9 +20,35 @@ class Camera:
         self.y_velocity = 0.0
         self.on_ground = False
 
+    # pos e front marcam a view como suja ao serem trocados (inclusive `camera.pos += d`);
+    # quem muda um componente direto (pos.y = ...) tem que chamar invalidate()
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, value):
+        self._pos = value
+        self._view = None
+
+    @property
+    def front(self):
+        return self._front
+
+    @front.setter
+    def front(self, value):
+        self._front = value
+        self._view = None
+
+    def invalidate(self):
+        """Força recalcular a matriz view no próximo get_view_matrix."""
+        self._view = None
+
     def get_view_matrix(self):
-        """Calcula e Retorna a matriz 'view' da câmera (LookAt)."""
-        return glm.lookAt(self.pos, self.pos + self.front, self.up)
+        """Retorna a matriz 'view' da câmera (LookAt), recalculada só se a câmera mudou."""
+        if self._view is None:
+            self._view = glm.lookAt(self.pos, self.pos + self.front, self.up)
+        return self._view
     
     def process_mouse_movement(self, x_offset, y_offset):
         """Processa o movimento do mouse para atualizar yaw e pitch."""
@@ -51,11 +80,15 @@ class Camera:
             self.y_velocity += settings.GRAVITY * delta_time
         
         # Atualizar posição vertical
-        self.pos.y += self.y_velocity * delta_time
+        if self.y_velocity != 0.0:
+            self.pos.y += self.y_velocity * delta_time
+            self.invalidate()
 
         # verificar colisão com o chão
         if self.pos.y <= ground_height:
-            self.pos.y = ground_height
+            if self.pos.y != ground_height:
+                self.pos.y = ground_height
+                self.invalidate()
             self.y_velocity = 0.0
             self.on_ground = True
         else:
@@ -0,0 +1,191 @@
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+
+import settings
+from baked_animation import BakedAnimation
+from geometry_arena import setup_vertex_attributes
+from gl_state import gl_state
+from model import bind_material
+from vertex_format import unpack_vertices
+from terrain_chunks import aabbs_in_frustum, frustum_planes
+
+# Atributos por instância (depois dos 5 atributos por vértice do Mesh)
+#   5..8  matriz model (4 colunas)
+#   9     clipe: (primeira linha, frames, fps, duração) na textura assada
+#   10    (deslocamento de tempo, velocidade)
+_INSTANCE_FLOATS = 16 + 4 + 2
+_INSTANCE_STRIDE = _INSTANCE_FLOATS * 4
+
+
+def instance_matrices(positions, yaws, scales):
+    """ Matrizes T * Ry * S de N instâncias, já em column-major (N, 4, 4) para o OpenGL. """
+    c = np.cos(yaws).astype(np.float32)
+    s = np.sin(yaws).astype(np.float32)
+    scales = np.broadcast_to(np.asarray(scales, dtype=np.float32), c.shape)
+    m = np.zeros((len(c), 4, 4), dtype=np.float32)
+    # m[i] é a coluna i (layout do OpenGL)
+    m[:, 0, 0] = c * scales
+    m[:, 0, 2] = -s * scales
+    m[:, 1, 1] = scales
+    m[:, 2, 0] = s * scales
+    m[:, 2, 2] = c * scales
+    m[:, 3, :3] = positions
+    m[:, 3, 3] = 1.0
+    return m
+
+
+class Crowd:
+    """
+    Muitas cópias do mesmo GLB animado em um draw instanciado por malha.
+
+    Cada instância tem matriz, clipe e deslocamento de tempo próprios num buffer de
+    atributos por instância; as paletas vêm da textura assada (BakedAnimation),
+    indexada no shader pelo clipe e pelo tempo de cada instância. A cada frame só
+    as instâncias dentro do frustum são copiadas para o buffer.
+    """
+
+    def __init__(self, model, shader, baked=None):
+        self.model = model
+        self.shader = shader
+        self.baked = baked or BakedAnimation(model)
+        self.time = 0.0
+        self.count = 0
+        self.visible_count = 0
+
+        self.instance_data = np.zeros((0, _INSTANCE_FLOATS), dtype=np.float32)
+        self.positions = np.zeros((0, 3), dtype=np.float32)
+        self.radius = self._skinned_radius()
+
+        self.instance_vbo = glGenBuffers(1)
+        self._capacity = 0
+
+        # VAO próprio: vértices e índices da arena do modelo + o buffer de instâncias
+        self.vao = glGenVertexArrays(1)
+        self._arena_generation = None
+        self._setup_vao()
+
+    def _setup_vao(self):
+        """ (Re)liga os buffers da arena e os atributos por instância (a arena pode ter crescido). """
+        arena = self.model.arena
+        gl_state.bind_vertex_array(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, arena.vbo)
+        setup_vertex_attributes()
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, arena.ebo)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        for col in range(4):
+            glEnableVertexAttribArray(5 + col)
+            glVertexAttribPointer(5 + col, 4, GL_FLOAT, GL_FALSE, _INSTANCE_STRIDE, ctypes.c_void_p(col * 16))
+            glVertexAttribDivisor(5 + col, 1)
+        glEnableVertexAttribArray(9)
+        glVertexAttribPointer(9, 4, GL_FLOAT, GL_FALSE, _INSTANCE_STRIDE, ctypes.c_void_p(64))
+        glVertexAttribDivisor(9, 1)
+        glEnableVertexAttribArray(10)
+        glVertexAttribPointer(10, 2, GL_FLOAT, GL_FALSE, _INSTANCE_STRIDE, ctypes.c_void_p(80))
+        glVertexAttribDivisor(10, 1)
+        gl_state.bind_vertex_array(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self._arena_generation = arena.generation
+
+    def _skinned_radius(self):
+        """ Raio que envolve o modelo no primeiro frame assado (com folga para a animação). """
+        rows = self.baked.data[0].reshape(-1, 3, 4)  # (ossos, 3, 4)
+        radius = 0.0
+        for mesh in self.model.meshes:
+            if len(mesh.vertices) == 0:
+                continue
+            v = unpack_vertices(mesh.vertices)
+            pos = np.concatenate([v[:, 0:3], np.ones((len(v), 1), np.float32)], axis=1)
+            joints = np.clip(v[:, 8:12].astype(np.intp), 0, len(rows) - 1)
+            weights = v[:, 12:16]
+            skinned = np.einsum('vk,vkij,vj->vi', weights, rows[joints], pos)
+            # Vértices sem peso não são deformados (igual ao shader)
+            skinned = np.where(weights.sum(axis=1, keepdims=True) < 0.001, pos[:, :3], skinned)
+            radius = max(radius, float(np.linalg.norm(skinned, axis=1).max()))
+        return radius * settings.CROWD_RADIUS_MARGIN
+
+    def set_instances(self, positions, yaws, scales, clips, time_offsets, speeds=1.0):
+        """ Define todas as instâncias (arrays de tamanho N; scales/speeds podem ser escalares). """
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        n = len(positions)
+        clips = np.broadcast_to(np.asarray(clips, dtype=np.intp), (n,))
+        table = np.array([[c['first_row'], c['frames'], c['fps'], c['duration']] for c in self.baked.clips],
+                         dtype=np.float32)
+
+        data = np.empty((n, _INSTANCE_FLOATS), dtype=np.float32)
+        data[:, 0:16] = instance_matrices(positions, np.broadcast_to(yaws, (n,)), scales).reshape(n, 16)
+        data[:, 16:20] = table[clips]
+        data[:, 20] = np.broadcast_to(time_offsets, (n,))
+        data[:, 21] = np.broadcast_to(speeds, (n,))
+
+        self.instance_data = data
+        self.positions = positions
+        self.scales = np.broadcast_to(np.asarray(scales, dtype=np.float32), (n,)).copy()
+        self.count = n
+
+        # Buffer do tamanho da multidão inteira; cada frame sobrescreve só o início
+        if n > self._capacity:
+            glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+            glBufferData(GL_ARRAY_BUFFER, data.nbytes, None, GL_STREAM_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self._capacity = n
+
+    def scatter(self, terrain, count, seed=0, area=None, scale=None):
+        """ Espalha `count` instâncias sobre o terreno com clipe, rotação e fase aleatórios. """
+        rng = np.random.default_rng(seed)
+        half = (area or settings.TERRAIN_SIZE * 0.9) / 2.0
+        xs = rng.uniform(-half, half, count)
+        zs = rng.uniform(-half, half, count)
+        heights, _, _ = terrain.get_heights(xs, zs)
+        positions = np.stack([xs, heights, zs], axis=1)
+        clips = rng.integers(0, len(self.baked.clips), count)
+        durations = np.array([c['duration'] for c in self.baked.clips])[clips]
+        self.set_instances(positions, rng.uniform(0.0, 2.0 * np.pi, count),
+                           scale or settings.CROWD_SCALE, clips,
+                           rng.uniform(0.0, 1.0, count) * durations, rng.uniform(0.8, 1.2, count))
+
+    def update(self, delta_time):
+        self.time += delta_time
+
+    def select_visible(self, view_projection):
+        """ Índices das instâncias cuja esfera envolvente toca o frustum. """
+        r = (self.radius * self.scales)[:, None]
+        return np.nonzero(aabbs_in_frustum(frustum_planes(view_projection),
+                                           self.positions - r, self.positions + r))[0]
+
+    def draw(self, view_projection, shadow_map_texture):
+        """ Um draw instanciado por malha (câmera, sol e luz vêm do bloco FrameConstants). """
+        if self.count == 0:
+            return
+        visible = self.select_visible(view_projection)
+        self.visible_count = len(visible)
+        if self.visible_count == 0:
+            return
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        data = np.ascontiguousarray(self.instance_data[visible])
+        glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        shader = self.shader
+        shader.use()
+        shader.set_uniform_int("u_shadow_map", 1)
+        shader.set_uniform_float("u_time", self.time)
+
+        gl_state.bind_texture(1, shadow_map_texture)
+        self.baked.bind_texture(shader)
+
+        if self._arena_generation != self.model.arena.generation:
+            self._setup_vao()
+        gl_state.bind_vertex_array(self.vao)
+        for mesh in self.model.meshes:
+            if mesh.index_count == 0:
+                continue
+            bind_material(shader, mesh.texture_id)
+            mesh.draw_elements(instance_count=self.visible_count)
+
+    def release(self):
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteBuffers(1, [self.instance_vbo])
@@ -0,0 +1,55 @@
+import numpy as np
+from OpenGL.GL import *
+
+# Ponto de ligação do bloco `FrameConstants` (o Shader liga o bloco de cada programa aqui)
+FRAME_CONSTANTS_BINDING = 0
+FRAME_CONSTANTS_BLOCK = "FrameConstants"
+
+# Layout std140 do bloco (mesma ordem dos shaders):
+#   mat4 view, mat4 projection, mat4 u_light_space_matrix   3 x 64 bytes
+#   vec3 u_sun_direction, u_sun_color, u_ambient_color      3 x 16 (vec3 ocupa 16 no std140)
+_FLOATS = 3 * 16 + 3 * 4
+
+
+def _column_major(matrix):
+    # np.array(glm.mat4) sai linha-major: transpõe para o column-major do std140
+    return np.array(matrix, dtype=np.float32).T.reshape(-1)
+
+
+class FrameConstants:
+    """
+    Câmera, sol e matriz da luz num uniform buffer só, escrito uma vez por frame e
+    ligado num ponto fixo: todos os programas que declaram o bloco leem dali, sem um
+    glUniform por shader. Se nada mudou desde o último frame, nem o envio acontece.
+    """
+
+    def __init__(self):
+        self.data = np.zeros(_FLOATS, dtype=np.float32)
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferData(GL_UNIFORM_BUFFER, self.data.nbytes, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        # Fica ligado para sempre: o buffer não muda, só o conteúdo
+        glBindBufferBase(GL_UNIFORM_BUFFER, FRAME_CONSTANTS_BINDING, self.buffer)
+        self._uploaded = None
+
+    def update(self, view, projection, light_space_matrix, sun_direction, sun_color, ambient_color):
+        """ Monta o bloco e envia num glBufferSubData (retorna False se era igual ao anterior). """
+        data = self.data
+        data[0:16] = _column_major(view)
+        data[16:32] = _column_major(projection)
+        data[32:48] = _column_major(light_space_matrix)
+        for i, vector in enumerate((sun_direction, sun_color, ambient_color)):
+            data[48 + i * 4:51 + i * 4] = tuple(vector)
+
+        raw = data.tobytes()
+        if raw == self._uploaded:
+            return False
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self._uploaded = raw
+        return True
+
+    def release(self):
+        glDeleteBuffers(1, [self.buffer])
@@ -0,0 +1,127 @@
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+
+from vertex_format import VERTEX_STRIDE, as_vertex_records, vertex_offset
+
+_INDEX_SIZE = 4 # Índices uint32, relativos ao base vertex de cada malha
+
+
+def setup_vertex_attributes():
+    """ Atributos 0..4 do vértice compacto no VAO ligado, lendo do GL_ARRAY_BUFFER ligado. """
+    stride = VERTEX_STRIDE
+    # 0:Pos, 1:Norm (octaédrica), 2:UV, 3:BoneIDs, 4:Weights (layout em vertex_format)
+    glEnableVertexAttribArray(0)
+    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(vertex_offset('position')))
+    glEnableVertexAttribArray(1)
+    glVertexAttribPointer(1, 2, GL_UNSIGNED_SHORT, GL_TRUE, stride, ctypes.c_void_p(vertex_offset('normal')))
+    glEnableVertexAttribArray(2)
+    glVertexAttribPointer(2, 2, GL_HALF_FLOAT, GL_FALSE, stride, ctypes.c_void_p(vertex_offset('uv')))
+
+    # Ossos como inteiros de verdade (uvec4 no shader), sem passar por float
+    glEnableVertexAttribArray(3)
+    glVertexAttribIPointer(3, 4, GL_UNSIGNED_BYTE, stride, ctypes.c_void_p(vertex_offset('joints')))
+    # Pesos unorm8: o OpenGL normaliza para [0, 1]
+    glEnableVertexAttribArray(4)
+    glVertexAttribPointer(4, 4, GL_UNSIGNED_BYTE, GL_TRUE, stride, ctypes.c_void_p(vertex_offset('weights')))
+
+
+class GeometryArena:
+    """
+    Um VBO e um EBO compartilhados por várias malhas (de um ou de vários modelos), com
+    um VAO só. Cada malha ocupa uma faixa: os índices ficam relativos ao próprio
+    primeiro vértice e o draw passa esse base vertex, então malhas diferentes saem
+    juntas num glMultiDrawElementsBaseVertex. Os buffers crescem dobrando (cópia na
+    GPU); `generation` muda quando isso acontece, para quem montou VAOs próprios
+    sobre eles (ex.: o Crowd) refazê-los.
+    """
+
+    def __init__(self, vertex_capacity=0, index_capacity=0):
+        self.vao = glGenVertexArrays(1)
+        self.vbo = None
+        self.ebo = None
+        self.vertex_capacity = 0
+        self.index_capacity = 0
+        self.vertex_count = 0
+        self.index_count = 0
+        self.generation = 0
+        self.reserve(vertex_capacity, index_capacity)
+
+    def _grow_buffer(self, old_buffer, old_bytes, new_bytes):
+        """ Novo buffer com o conteúdo do antigo (glCopyBufferSubData, sem passar pela CPU). """
+        new_buffer = glGenBuffers(1)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, new_buffer)
+        glBufferData(GL_COPY_WRITE_BUFFER, new_bytes, None, GL_STATIC_DRAW)
+        if old_buffer is not None:
+            if old_bytes:
+                glBindBuffer(GL_COPY_READ_BUFFER, old_buffer)
+                glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, old_bytes)
+                glBindBuffer(GL_COPY_READ_BUFFER, 0)
+            glDeleteBuffers(1, [old_buffer])
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        return new_buffer
+
+    def reserve(self, vertices, indices):
+        """ Garante espaço para mais `vertices` e `indices` sem realocar no meio (ex.: um modelo inteiro). """
+        need_vertices = self.vertex_count + vertices
+        need_indices = self.index_count + indices
+        grown = False
+        if need_vertices > self.vertex_capacity or self.vbo is None:
+            capacity = max(need_vertices, self.vertex_capacity * 2, 1)
+            self.vbo = self._grow_buffer(self.vbo, self.vertex_count * VERTEX_STRIDE,
+                                         capacity * VERTEX_STRIDE)
+            self.vertex_capacity = capacity
+            grown = True
+        if need_indices > self.index_capacity or self.ebo is None:
+            capacity = max(need_indices, self.index_capacity * 2, 1)
+            self.ebo = self._grow_buffer(self.ebo, self.index_count * _INDEX_SIZE,
+                                         capacity * _INDEX_SIZE)
+            self.index_capacity = capacity
+            grown = True
+        if grown:
+            # O VAO guarda o buffer de cada atributo e o EBO: religa os novos
+            glBindVertexArray(self.vao)
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            setup_vertex_attributes()
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+            glBindVertexArray(0)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.generation += 1
+
+    def allocate(self, vertices, indices=None):
+        """
+        Copia uma malha para o fim da arena. Sem índices gera 0..n-1 (lista de triângulos).
+        Retorna (base vertex, primeiro índice, número de índices).
+        """
+        vertices = as_vertex_records(vertices)
+        if indices is None or len(indices) == 0:
+            indices = np.arange(len(vertices), dtype=np.uint32)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        self.reserve(len(vertices), len(indices))
+
+        base_vertex, first_index = self.vertex_count, self.index_count
+        # Pelo alvo de cópia: não mexe no GL_ARRAY_BUFFER nem no EBO preso a algum VAO
+        if len(vertices):
+            glBindBuffer(GL_COPY_WRITE_BUFFER, self.vbo)
+            glBufferSubData(GL_COPY_WRITE_BUFFER, base_vertex * VERTEX_STRIDE, vertices.nbytes, vertices)
+        if len(indices):
+            glBindBuffer(GL_COPY_WRITE_BUFFER, self.ebo)
+            glBufferSubData(GL_COPY_WRITE_BUFFER, first_index * _INDEX_SIZE, indices.nbytes, indices)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        self.vertex_count += len(vertices)
+        self.index_count += len(indices)
+        return base_vertex, first_index, len(indices)
+
+    def draw_batch(self, counts, offsets, base_vertices):
+        """ Várias faixas num glMultiDrawElementsBaseVertex (o VAO da arena já deve estar ligado). """
+        glMultiDrawElementsBaseVertex(GL_TRIANGLES, counts, GL_UNSIGNED_INT, offsets, len(counts), base_vertices)
+
+    def release(self):
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteBuffers(2, [self.vbo, self.ebo])
+
+    @property
+    def nbytes(self):
+        """ Memória de GPU reservada (vértices + índices). """
+        return self.vertex_capacity * VERTEX_STRIDE + self.index_capacity * _INDEX_SIZE
@@ -0,0 +1,85 @@
+from OpenGL.GL import *
+
+# Tipos de mudança de estado contados por frame
+STATE_KINDS = ("programa", "textura", "vao", "uniform")
+
+
+class GLState:
+    """
+    Espelho do estado de ligação do contexto (programa, textura por unidade, VAO):
+    uma ligação igual à atual não chega ao PyOpenGL (cada chamada custa bem mais em
+    Python do que no driver). Os valores de uniform ficam no próprio Shader, que usa
+    count() para entrar nos contadores. Código que liga essas coisas direto no GL
+    (carregamento, setup de VAO) tem que rodar fora do frame ou chamar invalidate().
+    """
+
+    def __init__(self):
+        self.submitted = dict.fromkeys(STATE_KINDS, 0)
+        self.filtered = dict.fromkeys(STATE_KINDS, 0)
+        self.last_frame = None # (enviados, filtrados) do último frame completo
+        self.invalidate()
+
+    def invalidate(self):
+        """ Esquece o estado conhecido: a próxima ligação de cada tipo vai para o GL. """
+        self.program = None
+        self.active_unit = None
+        self.textures = {} # unidade -> (alvo, id)
+        self.vao = None
+
+    def count(self, kind, filtered):
+        """ Registra um pedido de mudança de estado (filtered=True se não foi ao GL). """
+        self.submitted[kind] += 1
+        if filtered:
+            self.filtered[kind] += 1
+
+    def begin_frame(self):
+        # Entre frames o carregamento e o streaming ligam buffers e VAOs direto no GL
+        self.invalidate()
+        for kind in STATE_KINDS:
+            self.submitted[kind] = 0
+            self.filtered[kind] = 0
+
+    def end_frame(self):
+        # Nenhum VAO fica ligado fora do frame: um GL_ELEMENT_ARRAY_BUFFER ligado
+        # por um upload iria parar dentro dele
+        self.bind_vertex_array(0)
+        self.last_frame = (dict(self.submitted), dict(self.filtered))
+
+    def use_program(self, program):
+        same = program == self.program
+        self.count("programa", same)
+        if not same:
+            glUseProgram(program)
+            self.program = program
+
+    def bind_texture(self, unit, texture, target=GL_TEXTURE_2D):
+        """ Liga `texture` na unidade `unit` (índice, não GL_TEXTUREi). """
+        same = self.textures.get(unit) == (target, texture)
+        self.count("textura", same)
+        if same:
+            return
+        if unit != self.active_unit:
+            glActiveTexture(GL_TEXTURE0 + unit)
+            self.active_unit = unit
+        glBindTexture(target, texture)
+        self.textures[unit] = (target, texture)
+
+    def bind_vertex_array(self, vao):
+        same = vao == self.vao
+        self.count("vao", same)
+        if not same:
+            glBindVertexArray(vao)
+            self.vao = vao
+
+    def frame_summary(self):
+        """ Linha curta com enviados/filtrados do último frame (para o HUD). """
+        if self.last_frame is None:
+            return ""
+        submitted, filtered = self.last_frame
+        total = sum(submitted.values())
+        parts = " ".join(f"{kind} {filtered[kind]}/{submitted[kind]}" for kind in STATE_KINDS)
+        return f"estado GL: {sum(filtered.values())}/{total} filtrados ({parts})"
+
+
+# Um contexto por processo: todos os módulos de desenho compartilham o mesmo espelho
+gl_state = GLState()
@@ -0,0 +1,160 @@
+import base64
+import mmap
+import os
+import struct
+
+import numpy as np
+from pygltflib import GLTF2
+
+# Cabeçalho e chunks do contêiner binário do glTF 2.0
+_GLB_MAGIC = b'glTF'
+_CHUNK_JSON = 0x4E4F534A
+_CHUNK_BIN = 0x004E4942
+
+# componentType do glTF -> dtype (sempre little-endian)
+COMPONENT_DTYPES = {
+    5120: np.dtype('<i1'),  # BYTE
+    5121: np.dtype('<u1'),  # UNSIGNED_BYTE
+    5122: np.dtype('<i2'),  # SHORT
+    5123: np.dtype('<u2'),  # UNSIGNED_SHORT
+    5125: np.dtype('<u4'),  # UNSIGNED_INT
+    5126: np.dtype('<f4'),  # FLOAT
+}
+
+# type do accessor -> (colunas, linhas); escalares e vetores têm uma coluna
+TYPE_SHAPES = {
+    'SCALAR': (1, 1), 'VEC2': (1, 2), 'VEC3': (1, 3), 'VEC4': (1, 4),
+    'MAT2': (2, 2), 'MAT3': (3, 3), 'MAT4': (4, 4),
+}
+
+
+def normalize_integers(data):
+    """ Converte inteiros `normalized` do glTF para float32 (regras da especificação). """
+    info = np.iinfo(data.dtype)
+    if info.min < 0:
+        return np.maximum(data.astype(np.float32) / info.max, -1.0)
+    return data.astype(np.float32) / info.max
+
+
+class GLBReader:
+    """
+    Lê um .glb mapeando o arquivo na memória uma vez só. O JSON vira um GLTF2 (pygltflib)
+    e cada accessor sai como uma view NumPy com passo direto sobre o mmap, sem cópia:
+    respeita byteOffset, byteStride e count. Só normalized, sparse e matrizes com
+    colunas alinhadas precisam materializar um array novo.
+
+    As views são somente leitura e mantêm o mmap vivo; close() só solta a referência do
+    leitor, o arquivo fecha quando a última view for coletada.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, length = struct.unpack_from('<4sII', self.mm, 0)
+        if magic != _GLB_MAGIC:
+            raise ValueError(f"{path} não é um GLB (magic {magic!r})")
+        if version != 2:
+            raise ValueError(f"{path}: versão de GLB {version} não suportada")
+
+        # Chunks: JSON obrigatório primeiro, BIN opcional em seguida
+        json_chunk = None
+        self.bin_offset, self.bin_length = None, 0
+        offset = 12
+        while offset + 8 <= min(length, len(self.mm)):
+            chunk_length, chunk_type = struct.unpack_from('<II', self.mm, offset)
+            if chunk_type == _CHUNK_JSON and json_chunk is None:
+                json_chunk = (offset + 8, chunk_length)
+            elif chunk_type == _CHUNK_BIN and self.bin_offset is None:
+                self.bin_offset, self.bin_length = offset + 8, chunk_length
+            offset += 8 + chunk_length
+        if json_chunk is None:
+            raise ValueError(f"{path}: GLB sem chunk JSON")
+
+        start, size = json_chunk
+        self.gltf = GLTF2.gltf_from_json(bytes(self.mm[start:start + size]).decode('utf-8'))
+        self._buffers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._buffers = {}
+        self.mm = None
+
+    def buffer(self, index):
+        """ Bytes do buffer `index`: o chunk BIN, um .bin externo (também em mmap) ou data URI. """
+        if index not in self._buffers:
+            uri = self.gltf.buffers[index].uri
+            if uri is None:
+                if self.bin_offset is None:
+                    raise ValueError(f"{self.path}: buffer {index} aponta para um chunk BIN inexistente")
+                data = memoryview(self.mm)[self.bin_offset:self.bin_offset + self.bin_length]
+            elif uri.startswith('data:'):
+                data = memoryview(base64.b64decode(uri.split(',', 1)[1]))
+            else:
+                external = os.path.join(os.path.dirname(self.path), uri)
+                with open(external, 'rb') as f:
+                    data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            self._buffers[index] = data
+        return self._buffers[index]
+
+    def buffer_view(self, index):
+        """ memoryview (sem cópia) dos bytes de um bufferView, ex.: imagens embutidas. """
+        bv = self.gltf.bufferViews[index]
+        start = bv.byteOffset or 0
+        return self.buffer(bv.buffer)[start:start + bv.byteLength]
+
+    def _strided(self, view_index, byte_offset, count, dtype, columns, rows):
+        """ View (count, colunas, linhas) sobre um bufferView respeitando o byteStride. """
+        bv = self.gltf.bufferViews[view_index]
+        # Colunas de matriz começam alinhadas a 4 bytes (MAT2/MAT3 de 1 e 2 bytes)
+        column_stride = (rows * dtype.itemsize + 3) & ~3 if columns > 1 else rows * dtype.itemsize
+        element_size = column_stride * columns
+        stride = bv.byteStride or element_size
+        start = (bv.byteOffset or 0) + (byte_offset or 0)
+        needed = start + (count - 1) * stride + element_size if count else start
+        data = self.buffer(bv.buffer)
+        if needed > (bv.byteOffset or 0) + bv.byteLength or needed > len(data):
+            raise ValueError(f"{self.path}: accessor passa do fim do bufferView {view_index}")
+        return np.ndarray((count, columns, rows), dtype=dtype, buffer=data, offset=start,
+                          strides=(stride, column_stride, dtype.itemsize))
+
+    def accessor(self, index):
+        """
+        Dados do accessor `index`: (count,) para SCALAR, (count, n) para vetores e
+        (count, n * n) para matrizes (column-major, como no arquivo). Sem cópia sempre
+        que dá; `normalized` sai em float32.
+        """
+        acc = self.gltf.accessors[index]
+        dtype = COMPONENT_DTYPES[acc.componentType]
+        columns, rows = TYPE_SHAPES[acc.type]
+
+        if acc.bufferView is not None:
+            data = self._strided(acc.bufferView, acc.byteOffset, acc.count, dtype, columns, rows)
+        else:
+            # Sem bufferView o accessor começa zerado (só faz sentido com sparse)
+            data = np.zeros((acc.count, columns, rows), dtype=dtype)
+
+        if acc.sparse is not None and acc.sparse.count:
+            sparse = acc.sparse
+            indices = self._strided(sparse.indices.bufferView, sparse.indices.byteOffset, sparse.count,
+                                    COMPONENT_DTYPES[sparse.indices.componentType], 1, 1).reshape(-1)
+            values = self._strided(sparse.values.bufferView, sparse.values.byteOffset, sparse.count,
+                                   dtype, columns, rows)
+            data = data.copy()
+            data[indices] = values
+
+        if columns == 1:
+            data = data.reshape(acc.count, rows) if rows > 1 else data.reshape(acc.count)
+        else:
+            # Matrizes com padding não viram view contígua: reshape copia só nesse caso
+            data = data.reshape(acc.count, columns * rows)
+
+        if acc.normalized and dtype.kind in 'iu':
+            data = normalize_integers(data)
+        return data
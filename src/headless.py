@@ -0,0 +1,128 @@
+import os
+import ctypes
+
+import numpy as np
+
+import settings
+
+
+def prepare_headless(backend=None):
+    """
+    Escolhe a plataforma do PyOpenGL para rodar sem janela. Precisa ser chamada
+    antes do primeiro `import OpenGL.GL` (o PyOpenGL fixa a plataforma no import).
+    """
+    backend = backend or settings.HEADLESS_BACKEND
+    if backend in ("egl", "osmesa"):
+        os.environ.setdefault("PYOPENGL_PLATFORM", backend)
+        if backend == "egl":
+            # Sem servidor gráfico: contexto EGL sem superfície (funciona com llvmpipe)
+            os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+    return backend
+
+
+class HeadlessContext:
+    """ Contexto OpenGL 4.1 core sem janela visível (EGL, OSMesa ou janela GLFW oculta). """
+
+    def __init__(self, width, height, backend=None):
+        self.backend = backend or os.environ.get("PYOPENGL_PLATFORM") or settings.HEADLESS_BACKEND
+        self.width = width
+        self.height = height
+        self._check_platform()
+        if self.backend == "egl":
+            self._create_egl()
+        elif self.backend == "osmesa":
+            self._create_osmesa()
+        elif self.backend == "glfw":
+            self._create_glfw()
+        else:
+            raise ValueError(f"Backend headless desconhecido: {self.backend}")
+
+    def _check_platform(self):
+        """ Falha com uma mensagem clara se o PyOpenGL já foi importado com outra plataforma. """
+        if self.backend not in ("egl", "osmesa"):
+            return
+        from OpenGL import platform
+        name = type(platform.PLATFORM).__name__
+        if self.backend not in name.lower():
+            raise RuntimeError(
+                f"O PyOpenGL está usando a plataforma {name}, não '{self.backend}': chame "
+                f"headless.prepare_headless() antes do primeiro import do OpenGL "
+                f"(ex.: antes de `import main`) ou defina PYOPENGL_PLATFORM={self.backend}.")
+
+    def _create_egl(self):
+        from OpenGL import EGL
+
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("EGL não pôde ser inicializado.")
+
+        config_attribs = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                          EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                          EGL.EGL_NONE]
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        EGL.eglChooseConfig(self.display, (EGL.EGLint * len(config_attribs))(*config_attribs),
+                            ctypes.pointer(config), 1, ctypes.pointer(count))
+        if count.value == 0:
+            raise RuntimeError("Nenhuma configuração EGL com suporte a OpenGL.")
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attribs = [EGL.EGL_CONTEXT_MAJOR_VERSION, 4,
+                           EGL.EGL_CONTEXT_MINOR_VERSION, 1,
+                           EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+                           EGL.EGL_NONE]
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT,
+                                            (EGL.EGLint * len(context_attribs))(*context_attribs))
+        if not self.context:
+            raise RuntimeError("O contexto EGL não pôde ser criado.")
+
+        # Tudo é desenhado num FBO, então o contexto não precisa de superfície
+        if not EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise RuntimeError("O contexto EGL não pôde ser ativado.")
+
+    def _create_osmesa(self):
+        from OpenGL import osmesa
+        from OpenGL.GL import GL_UNSIGNED_BYTE
+
+        attribs = [osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+                   osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+                   osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 4,
+                   osmesa.OSMESA_CONTEXT_MINOR_VERSION, 1,
+                   0]
+        self.context = osmesa.OSMesaCreateContextAttribs(attribs, None)
+        if not self.context:
+            raise RuntimeError("O contexto OSMesa não pôde ser criado.")
+        # O OSMesa exige um buffer padrão, mesmo desenhando no FBO
+        self._buffer = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        if not osmesa.OSMesaMakeCurrent(self.context, self._buffer, GL_UNSIGNED_BYTE, self.width, self.height):
+            raise RuntimeError("O contexto OSMesa não pôde ser ativado.")
+
+    def _create_glfw(self):
+        import glfw
+
+        if not glfw.init():
+            raise RuntimeError("GLFW não pôde ser inicializado.")
+        glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
+        glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 4)
+        glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 1)
+        glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+        glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, True)
+        self.window = glfw.create_window(self.width, self.height, "Projeto A3 - offscreen", None, None)
+        if not self.window:
+            glfw.terminate()
+            raise RuntimeError("A janela oculta não pôde ser criada.")
+        glfw.make_context_current(self.window)
+
+    def release(self):
+        if self.backend == "egl":
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.display, self.context)
+            EGL.eglTerminate(self.display)
+        elif self.backend == "osmesa":
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self.context)
+        elif self.backend == "glfw":
+            import glfw
+            glfw.terminate()
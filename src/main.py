@@ -1,50 +1,72 @@
+import sys
+import time
+import settings # As constantes
+from headless import prepare_headless, HeadlessContext
+
+# No modo headless a plataforma do PyOpenGL precisa ser escolhida antes do import do OpenGL
+HEADLESS = "--headless" in sys.argv
+PROFILE = "--profile" in sys.argv
+if HEADLESS:
+    prepare_headless()
+
 import glfw
 from OpenGL.GL import *
-import settings # As constantes
 from shader import Shader # Importar a classe Shader
 import glm # Biblioteca para manipulação de vetores e matrizes
 from camera import Camera # Importar a classe Camera
 from terrain import Terrain # Importar a classe Terrain
+from terrain_streaming import RawHeightmapSource, StreamingTerrain
 from shadow_mapper import ShadowMapper # Importar a classe ShadowMapper
 from model import Model # Importar a classe Model
+from animation import Animator
+from crowd import Crowd
+from baked_animation import BakedAnimation, bake_clips
+from asset_loader import AssetLoader
+from geometry_arena import GeometryArena
 from text_renderer import TextRenderer
+from offscreen import OffscreenTarget
+from profiler import FrameProfiler
+from gl_state import gl_state
+from frame_constants import FrameConstants
+from render_queue import PASS_OPAQUE, PASS_SHADOW, PASS_SKY, RenderQueue
 
 import numpy as np
 
 
 
 class Engine:
-    def __init__(self, width, height):
+    def __init__(self, width, height, headless=False):
         self.width = width
         self.height = height
-        
-        # Inicializar o glfw
-        if not glfw.init():
-            raise Exception("GLFW não pôde ser inicializado.")
-        
-        # Configurar a Janela com OpenGl Moderno
-        glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 4)
-        glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 1) #OpenGL 4.1
-        glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
-        glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE) # macOS
-        
-        
-        # Criar a Janela
-        self.window = glfw.create_window(self.width, self.height, "Projeto A3 - OpenGL", None, None)
-        if not self.window:
-            glfw.terminate()
-            raise Exception("A janela não pôde ser criada")
-        
-        # Tornar o contexto da janela o principal
-        glfw.make_context_current(self.window)
+        self.headless = headless
+        self.window = None
+
+        # Sem janela: contexto EGL/OSMesa e tudo desenhado num FBO
+        if headless:
+            self.context = HeadlessContext(width, height)
+        else:
+            self.create_window()
 
         # Habilitar o Teste de Profundidade
         glEnable(GL_DEPTH_TEST)
 
         # Variaveis para o delta_time ( tempo entre frames )
-        self.last_time = glfw.get_time()
+        self.last_time = self.get_time()
         self.delta_time = 0.0
-        
+
+        # Tempos de CPU/GPU por estágio (desligado não custa quase nada)
+        self.profiler = FrameProfiler(enabled=settings.PROFILER_ENABLED or PROFILE)
+        self.f3_was_pressed = False
+
+        # Modelos carregam em threads; o envio para a GPU é repartido entre os frames
+        self.loader = AssetLoader()
+        # Vértices e índices de todos os modelos num VBO/EBO só (multi-draw por textura)
+        self.geometry = GeometryArena()
+        # Draws do frame ordenados por (passada, programa, textura, VAO)
+        self.render_queue = RenderQueue()
+        # Câmera, sol e luz num UBO compartilhado por todos os shaders
+        self.frame_constants = FrameConstants()
+
         self.sun_direction = glm.normalize(glm.vec3(0.3, 0.6, 0.2))
 
         # ----------- SHADER DO SOL -----------
@@ -87,9 +109,10 @@ class Engine:
         self.last_mouse_y = self.height / 2
         self.first_mouse = True
 
-        # Capturar o cursor e registrar o callback
-        glfw.set_input_mode(self.window, glfw.CURSOR, glfw.CURSOR_DISABLED) 
-        glfw.set_cursor_pos_callback(self.window, self.mouse_callback) 
+        # Capturar o cursor e registrar o callback (só com janela)
+        if self.window is not None:
+            glfw.set_input_mode(self.window, glfw.CURSOR, glfw.CURSOR_DISABLED) 
+            glfw.set_cursor_pos_callback(self.window, self.mouse_callback) 
 
         self.terrain_height_at_center = 0.0
         
@@ -116,145 +139,352 @@ class Engine:
             # NOVO SHADER DE PERSONAGEM
             self.model_shader = Shader("shaders/animated_model.vert", "shaders/animated_model.frag")
 
-            # Inicializar o terreno com o shader
-            self.terrain = Terrain(self.terrain_shader)
-
-            # NOVO PERSONAGEM
-            self.character = Model("assets/models/character.glb", self.model_shader)
+            # Inicializar o terreno com o shader (em streaming se houver um RAW grande configurado)
+            if settings.TERRAIN_STREAMING_SOURCE:
+                source = RawHeightmapSource(settings.TERRAIN_STREAMING_SOURCE)
+                self.terrain = StreamingTerrain(self.terrain_shader, source)
+                self.terrain.update(self.camera.pos)
+            else:
+                self.terrain = Terrain(self.terrain_shader)
+
+            # NOVO PERSONAGEM (vazio até o carregamento terminar; on_asset_ready cria o Animator)
+            self.character_handle = self.loader.load_model("assets/models/character.glb", self.model_shader,
+                                                          self.geometry)
+            self.character = self.character_handle.asset
+            # Estado de reprodução do personagem (o rig carregado pode ser compartilhado)
+            self.character_animator = Animator(self.character)
 
             self.shadow_mapper = ShadowMapper()
 
+            # Multidão instanciada espalhada pelo terreno (opcional)
+            self.crowd = None
+            self.crowd_handle = None
+            self.crowd_bake_handle = None
+            if settings.CROWD_SIZE > 0:
+                self.crowd_shader = Shader("shaders/animated_model_crowd.vert", "shaders/animated_model.frag")
+                self.crowd_handle = self.loader.load_model(settings.CROWD_MODEL, self.crowd_shader, self.geometry)
+
         except Exception as e:
             print(f"Falha ao inicializar o shader: {e}")
+            if self.headless:
+                # Em CI/render farm a falha precisa chegar a quem chamou
+                self.context.release()
+                raise
             glfw.terminate()
             exit() # Sair se os shaders não carregarem
 
-    def run(self):
-    # Loop principal
-     while not glfw.window_should_close(self.window):
-        # ---------- tempo ----------
-        current_time = glfw.get_time()
-        self.delta_time = current_time - self.last_time
-        self.last_time = current_time
+        # Destino do frame: 0 = janela; no headless, o FBO offscreen
+        self.target = OffscreenTarget(self.width, self.height) if headless else None
+        self.target_fbo = self.target.fbo if self.target else 0
 
-        # ---------- eventos e input ----------
-        glfw.poll_events()
-        self.process_keyboard_input()
+    def create_window(self):
+        """Cria a janela GLFW com o contexto OpenGL 4.1 core."""
+        # Inicializar o glfw
+        if not glfw.init():
+            raise Exception("GLFW não pôde ser inicializado.")
 
-        # ---------- física da câmera ----------
-        self.camera.update_physics(self.delta_time, self.terrain)
 
-        # ---------- atualizar ciclo dia/noite ----------
-        self.update_day_night_cycle()
+        # Configurar a Janela com OpenGl Moderno
+        glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 4)
+        glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 1) #OpenGL 4.1
+        glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+        glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, GL_TRUE) # macOS
+        
+        
+        # Criar a Janela
+        self.window = glfw.create_window(self.width, self.height, "Projeto A3 - OpenGL", None, None)
+        if not self.window:
+            glfw.terminate()
+            raise Exception("A janela não pôde ser criada")
+        
+        # Tornar o contexto da janela o principal
+        glfw.make_context_current(self.window)
 
-        # ---------- preparar dados para sombras ----------
-        # pegar altura do terreno para posicionamento
-        self.terrain_height_at_center = self.terrain.get_height(0, 0)
+    def get_time(self):
+        """Relógio em segundos (o do GLFW só existe com janela)."""
+        if self.window is None:
+            return time.perf_counter()
+        return glfw.get_time()
 
-        # matriz ortográfica para luz direcional (sol)
-        near_plane = 1.0
-        far_plane = 200.0
-        size = 80.0
-        light_projection = glm.ortho(-size, size, -size, size, near_plane, far_plane)
+    def run(self):
+        # Loop principal
+        while not glfw.window_should_close(self.window):
+            # ---------- tempo ----------
+            current_time = glfw.get_time()
+            self.delta_time = current_time - self.last_time
+            self.last_time = current_time
+            self.profiler.begin_frame()
+
+            # ---------- eventos e input ----------
+            glfw.poll_events()
+            self.process_keyboard_input()
+
+            self.update()
+            self.render()
+
+            # ---------- trocar buffers ----------
+            glfw.swap_buffers(self.window)
+            self.profiler.end_frame()
+
+        # finalizar
+        self.export_profile()
+        glfw.terminate()
+
+    def on_asset_ready(self, handle):
+        """Liga na cena um asset que acabou de carregar (chamado na thread do OpenGL)."""
+        if not handle.ready:
+            return
+        if handle is self.character_handle:
+            self.character_animator = Animator(self.character)
+        elif handle is self.crowd_handle:
+            # Assar os clipes é só CPU: vai para uma thread; a textura e o Crowd ficam para o envio
+            model = handle.asset
+            self.crowd_bake_handle = self.loader.submit(f"{settings.CROWD_MODEL} (assada)", model,
+                                                        lambda: bake_clips(model),
+                                                        lambda baked: self.build_crowd(model, baked))
+
+    def build_crowd(self, model, baked):
+        """Passos de GPU da multidão: textura assada e buffer de instâncias, depois o scatter."""
+        crowd = Crowd(model, self.crowd_shader, BakedAnimation(model, baked=baked))
+        yield
+        crowd.scatter(self.terrain, settings.CROWD_SIZE)
+        self.crowd = crowd
+
+    def finish_loading(self):
+        """Bloqueia até todos os assets pedidos estarem na GPU (frames determinísticos)."""
+        # Um asset pronto pode pedir outro (ex.: o bake da multidão), então repete até esvaziar
+        while self.loader.pending:
+            for handle in self.loader.finish():
+                self.on_asset_ready(handle)
+
+    def update(self):
+        """Avança a simulação em self.delta_time segundos."""
+        with self.profiler.stage("carregamento"):
+            # ---------- envios para a GPU dentro do orçamento do frame ----------
+            for handle in self.loader.pump():
+                self.on_asset_ready(handle)
+
+        with self.profiler.stage("fisica"):
+            # ---------- física da câmera ----------
+            self.camera.update_physics(self.delta_time, self.terrain)
+
+            # tiles do terreno em streaming seguem a câmera
+            if isinstance(self.terrain, StreamingTerrain):
+                self.terrain.update(self.camera.pos)
+
+        with self.profiler.stage("dia_noite"):
+            # ---------- atualizar ciclo dia/noite ----------
+            self.update_day_night_cycle()
+
+        with self.profiler.stage("animacao"):
+            # ---------- animação do personagem ----------
+            self.character_animator.update(self.delta_time)
+            if self.crowd is not None:
+                self.crowd.update(self.delta_time)
+
+    def render(self):
+        """Desenha a cena inteira em self.target_fbo (0 = janela)."""
+        # estatísticas de chunks/triângulos do terreno valem por frame
+        self.terrain.begin_frame()
+        gl_state.begin_frame()
+        queue = self.render_queue
+
+        with self.profiler.stage("sombras"):
+            # ---------- preparar dados para sombras ----------
+            # pegar altura do terreno para posicionamento
+            self.terrain_height_at_center = self.terrain.get_height(0, 0)
+
+            # matriz ortográfica para luz direcional (sol)
+            near_plane = 1.0
+            far_plane = 200.0
+            size = 80.0
+            light_projection = glm.ortho(-size, size, -size, size, near_plane, far_plane)
+
+            # posição "olho" do sol a certa distância na direção da luz
+            light_pos = self.camera.pos + (self.sun_direction * 100.0)
+            light_view = glm.lookAt(light_pos, self.camera.pos, glm.vec3(0, 1, 0))
+            light_space_matrix = light_projection * light_view
+
+            # ---------- projeção principal ----------
+            projection = glm.perspective(glm.radians(45.0), self.width / self.height, 0.1, 1000.0)
+            view = self.camera.get_view_matrix()
+
+            # ---------- câmera, sol e luz para todos os shaders: um envio só ----------
+            self.frame_constants.update(view, projection, light_space_matrix, self.sun_direction,
+                                        settings.COLOR_SUN, settings.COLOR_AMBIENT)
+
+            # ---------- gerar mapa de sombras (depth map) ----------
+            self.shadow_mapper.bind()
+            shadow_program = self.shadow_shader.program_id
+            queue.submit(PASS_SHADOW, shadow_program, 0, getattr(self.terrain, "vao", 0),
+                         lambda: self.draw_terrain_shadow(light_space_matrix))
+            queue.submit(PASS_SHADOW, shadow_program, 0, self.character.arena.vao, self.draw_character_shadow)
+            queue.flush()
+
+            self.shadow_mapper.unbind(self.width, self.height, self.target_fbo)
 
-        # posição "olho" do sol a certa distância na direção da luz
-        light_pos = self.camera.pos + (self.sun_direction * 100.0)
-        light_view = glm.lookAt(light_pos, self.camera.pos, glm.vec3(0, 1, 0))
-        light_space_matrix = light_projection * light_view
+        # ---------- limpar framebuffer principal e configurar céu ----------
+        glClearColor(self.sky_color.r, self.sky_color.g, self.sky_color.b, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        # ---------- gerar mapa de sombras (depth map) ----------
-        self.shadow_mapper.bind()
+        # ---------- cena: a fila ordena por programa/textura/VAO dentro de cada passada ----------
+        shadow_map = self.shadow_mapper.depth_map_texture
+        queue.submit(PASS_OPAQUE, self.terrain_shader.program_id, shadow_map, getattr(self.terrain, "vao", 0),
+                     lambda: self.draw_terrain(projection), stage="terreno")
+        queue.submit(PASS_OPAQUE, self.model_shader.program_id, self.character.sort_texture,
+                     self.character.arena.vao, self.draw_character, stage="personagem")
+        if self.crowd is not None:
+            # multidão: um draw instanciado por malha
+            queue.submit(PASS_OPAQUE, self.crowd_shader.program_id, self.crowd.model.sort_texture, self.crowd.vao,
+                         lambda: self.crowd.draw(projection * view, shadow_map), stage="multidao")
+        # sol (BILLBOARD), por cima do cenário
+        queue.submit(PASS_SKY, self.sun_shader.program_id, 0, self.sun_vao,
+                     lambda: self.render_sun(view), stage="sol")
+        queue.flush(self.profiler)
+
+        with self.profiler.stage("hud"):
+            # ---------- HUD (relógio) ----------
+            game_hour = (self.scene_time / 60.0) % 24.0
+            hour = int(game_hour)
+            minute = int((game_hour - hour) * 60)
+            time_str = f"{hour:02d}:{minute:02d}"
+
+            # HUD sempre por cima
+            glDisable(GL_DEPTH_TEST)
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+            self.text_shader.use()
+            self.text_shader.set_uniform_mat4("projection", self.hud_projection)
+            self.text_shader.set_uniform_int("text", 0)
+
+            self.text_renderer.render_text(
+                self.text_shader,
+                time_str,
+                20,
+                self.height - 40,
+                1.0,
+                (1.0, 1.0, 1.0)
+            )
+
+            # estado de carregamento enquanto houver assets a caminho
+            pending = self.loader.pending
+            if pending:
+                self.text_renderer.render_text(self.text_shader, f"Carregando... ({pending} pendentes)",
+                                               20, 20, 0.5, (1.0, 1.0, 1.0))
+
+            # tabela de tempos por estágio e mudanças de estado filtradas (F3)
+            self.profiler.draw_overlay(self.text_renderer, self.text_shader, 20, self.height - 80)
+            if self.profiler.enabled and self.profiler.show_overlay:
+                self.text_renderer.render_text(self.text_shader, gl_state.frame_summary(),
+                                               20, 45, 0.5, (1.0, 1.0, 0.6))
+
+            glDisable(GL_BLEND)
+            glEnable(GL_DEPTH_TEST)
+
+        gl_state.end_frame()
+
+    def draw_terrain_shadow(self, light_space_matrix):
+        """Terreno no mapa de sombra (o culling dos chunks usa o frustum da luz)."""
+        self.terrain.draw(self.camera, projection=None, override_shader=self.shadow_shader,
+                          view_projection=light_space_matrix)
+
+    def draw_character_shadow(self):
+        """Personagem no mapa de sombra."""
         self.shadow_shader.use()
-        self.shadow_shader.set_uniform_mat4("lightSpaceMatrix", light_space_matrix)
-
-        # desenhar apenas geometria para o depth map (override shader)
-        # supondo que terrain.draw aceita override_shader (como você comentou)
-        self.terrain.draw(self.camera, projection=None, sun_direction=None, override_shader=self.shadow_shader)
-
-        # desenhar o personagem no mapa de sombra
         model_matrix = glm.translate(glm.mat4(1.0), glm.vec3(0, self.terrain_height_at_center, 0))
         model_matrix = glm.scale(model_matrix, glm.vec3(0.01, 0.01, 0.01))
         self.shadow_shader.set_uniform_mat4("model", model_matrix)
-        self.character.draw(self.shadow_shader)
-
-        self.shadow_mapper.unbind(self.width, self.height)
+        self.character_animator.draw(self.shadow_shader)
 
-        # ---------- limpar framebuffer principal e configurar céu ----------
-        glClearColor(self.sky_color.r, self.sky_color.g, self.sky_color.b, 1.0)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-
-        # ---------- projeção principal ----------
-        projection = glm.perspective(glm.radians(45.0), self.width / self.height, 0.1, 1000.0)
-
-        # ---------- desenhar terreno (com sombras) ----------
+    def draw_terrain(self, projection):
+        """Terreno com sombras (mapa de sombra na unidade 1)."""
         self.terrain_shader.use()
-        self.terrain_shader.set_uniform_mat4("u_light_space_matrix", light_space_matrix)
         self.terrain_shader.set_uniform_int("u_shadow_map", 1)  # textura na unidade 1
+        gl_state.bind_texture(1, self.shadow_mapper.depth_map_texture)
+        self.terrain.draw(self.camera, projection)
 
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.shadow_mapper.depth_map_texture)
-
-        self.terrain.draw(self.camera, projection, self.sun_direction)
-
-        # ---------- desenhar personagem (com sombras e iluminação) ----------
+    def draw_character(self):
+        """Personagem com sombras e iluminação (câmera e sol no bloco FrameConstants)."""
         self.model_shader.use()
-        self.model_shader.set_uniform_mat4("view", self.camera.get_view_matrix())
-        self.model_shader.set_uniform_mat4("projection", projection)
-        self.model_shader.set_uniform_vec3("u_sun_direction", self.sun_direction)
-        self.model_shader.set_uniform_vec3("u_sun_color", settings.COLOR_SUN)
-        self.model_shader.set_uniform_vec3("u_ambient_color", settings.COLOR_AMBIENT)
-        self.model_shader.set_uniform_mat4("u_light_space_matrix", light_space_matrix)
         self.model_shader.set_uniform_int("u_shadow_map", 1)
 
         escala = 4.0
         model_matrix = glm.translate(glm.mat4(1.0), glm.vec3(0, self.terrain_height_at_center, 0))
         model_matrix = glm.scale(model_matrix, glm.vec3(escala, escala, escala))
-
-        self.character.update_animation(self.delta_time)
         self.model_shader.set_uniform_mat4("model", model_matrix)
 
-        # garantir que a textura de sombra está ativa
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, self.shadow_mapper.depth_map_texture)
-
-        self.character.draw(self.model_shader)
-
-        # ---------- desenhar o sol (BILLBOARD) -----------
-        # chama seu método render_sun, que espera a projection principal
-        self.render_sun(projection)
-
-        # ---------- HUD (relógio) ----------
-        game_hour = (self.scene_time / 60.0) % 24.0
-        hour = int(game_hour)
-        minute = int((game_hour - hour) * 60)
-        time_str = f"{hour:02d}:{minute:02d}"
-
-        # HUD sempre por cima
-        glDisable(GL_DEPTH_TEST)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
-        self.text_shader.use()
-        self.text_shader.set_uniform_mat4("projection", self.hud_projection)
-        self.text_shader.set_uniform_int("text", 0)
-
-        self.text_renderer.render_text(
-            self.text_shader,
-            time_str,
-            20,
-            self.height - 40,
-            1.0,
-            (1.0, 1.0, 1.0)
-        )
-
-        glDisable(GL_BLEND)
-        glEnable(GL_DEPTH_TEST)
-
-        # ---------- trocar buffers ----------
-        glfw.swap_buffers(self.window)
-
-    # finalizar
-    glfw.terminate()
+        # textura de sombra na unidade 1 (só religa se outro draw trocou)
+        gl_state.bind_texture(1, self.shadow_mapper.depth_map_texture)
+        self.character_animator.draw(self.model_shader)
+
+    def render_frame(self, camera, time, with_depth=False):
+        """
+        Desenha um frame determinístico (câmera e instante fixos, sem input nem física)
+        e retorna a cor como array uint8 (altura, largura, 4), topo primeiro.
+        Com with_depth=True retorna (cor, profundidade float32 em [0, 1]).
+        `time` é o tempo de cena em segundos (o mesmo de self.scene_time).
+        Fora do `main.py --headless` (testes, benchmarks), chame headless.prepare_headless()
+        antes de `import main`: a plataforma do PyOpenGL é fixada no import.
+        """
+        if self.target is None:
+            self.target = OffscreenTarget(self.width, self.height)
+
+        # Sem carregamento pela metade: o frame sai igual em qualquer máquina
+        self.finish_loading()
+
+        self.camera = camera
+        self.delta_time = 0.0
+        self.scene_time = time
+        self.update_day_night_cycle()
+        self.character_animator.set_time(time)
+        if self.crowd is not None:
+            self.crowd.time = time
+
+        # No streaming, carrega todos os tiles em volta da câmera antes de desenhar
+        if isinstance(self.terrain, StreamingTerrain):
+            while self.terrain.update(camera.pos):
+                pass
+
+        previous_fbo = self.target_fbo
+        self.target_fbo = self.target.fbo
+        self.profiler.begin_frame()
+        try:
+            self.render()
+        finally:
+            self.target_fbo = previous_fbo
+            self.profiler.end_frame()
+
+        color = self.target.read_color()
+        if with_depth:
+            return color, self.target.read_depth()
+        return color
+
+    def export_profile(self):
+        """Grava o trace do Chrome e o resumo em JSON, se o profiler estiver ligado."""
+        if not self.profiler.enabled:
+            return
+        self.profiler.export_chrome_trace(settings.PROFILER_TRACE_PATH)
+        self.profiler.export_json(settings.PROFILER_SUMMARY_PATH)
+        print(f"Profiler: trace em {settings.PROFILER_TRACE_PATH}, resumo em {settings.PROFILER_SUMMARY_PATH}")
+
+    def release(self):
+        """Libera o contexto (headless) ou a janela."""
+        self.export_profile()
+        self.profiler.release()
+        self.loader.release()
+        self.character.release()
+        if self.crowd is not None:
+            self.crowd.release()
+            self.crowd.model.release()
+        self.geometry.release()
+        self.frame_constants.release()
+        self.text_renderer.release()
+        if self.headless:
+            self.target.release()
+            self.context.release()
+        else:
+            glfw.terminate()
 
 
     def mouse_callback(self, window, xpos, ypos):
@@ -280,6 +510,12 @@ class Engine:
         if glfw.get_key(self.window, glfw.KEY_ESCAPE) == glfw.PRESS:
             glfw.set_window_should_close(self.window, True)
 
+        # F3 liga/desliga a tabela do profiler (só na borda de subida da tecla)
+        f3_pressed = glfw.get_key(self.window, glfw.KEY_F3) == glfw.PRESS
+        if f3_pressed and not self.f3_was_pressed:
+            self.profiler.show_overlay = not self.profiler.show_overlay
+        self.f3_was_pressed = f3_pressed
+
 
         # Lógica de Movimento
         
@@ -316,14 +552,12 @@ class Engine:
         
         
         
-    def render_sun(self, projection):
+    def render_sun(self, view):
         self.sun_shader.use()
 
         # posição do sol a 200 metros na direção dele
         sun_pos_world = self.camera.pos + self.sun_direction * 200.0
 
-        view = self.camera.get_view_matrix()
-
         # Billboard = remove rotação da view
         billboard_view = glm.mat4(glm.mat3(view))
 
@@ -332,15 +566,13 @@ class Engine:
         model = model * glm.inverse(billboard_view)   # faz o quad ficar sempre virado pra câmera
         model = glm.scale(model, glm.vec3(10.0, 10.0, 10.0))  # tamanho do sol
 
-        self.sun_shader.set_uniform_mat4("projection", projection)
-        self.sun_shader.set_uniform_mat4("view", view)
+        # projection e view vêm do bloco FrameConstants
         self.sun_shader.set_uniform_mat4("model", model)
 
         # desenhar quad
         glDisable(GL_DEPTH_TEST)   # evita o sol ficar "cortado" pelo terreno
-        glBindVertexArray(self.sun_vao)
+        gl_state.bind_vertex_array(self.sun_vao)
         glDrawElements(GL_TRIANGLES, 6, GL_UNSIGNED_INT, None)
-        glBindVertexArray(0)
         glEnable(GL_DEPTH_TEST)
         
         
@@ -380,8 +612,18 @@ class Engine:
             self.sky_color = settings.COLOR_NIGHT
 
 if __name__ == "__main__":
-    # Iniciar a aplicação
-    engine = Engine(settings.WIN_WIDTH, settings.WIN_HEIGHT)
-    print("Aplicação iniciada. Executando...")
-    engine.run()
-    print("Aplicação Finalizada.")
\ No newline at end of file
+    if HEADLESS:
+        # Um frame sem janela, salvo em PNG (smoke test para CI / render farm)
+        from PIL import Image
+        engine = Engine(settings.WIN_WIDTH, settings.WIN_HEIGHT, headless=True)
+        engine.camera.update_physics(0.0, engine.terrain) # apoia a câmera no chão
+        frame = engine.render_frame(engine.camera, engine.scene_time)
+        Image.fromarray(frame).save(settings.HEADLESS_OUTPUT)
+        print(f"Frame salvo em {settings.HEADLESS_OUTPUT}")
+        engine.release()
+    else:
+        # Iniciar a aplicação
+        engine = Engine(settings.WIN_WIDTH, settings.WIN_HEIGHT)
+        print("Aplicação iniciada. Executando...")
+        engine.run()
+        print("Aplicação Finalizada.")
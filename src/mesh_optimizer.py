@@ -0,0 +1,247 @@
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+import settings
+
+# Otimização de malhas antes do envio (roda na compilação, o resultado vai para o cache):
+#   1. deduplicate_vertices: vértices idênticos byte a byte viram um só
+#   2. optimize_vertex_cache: ordem dos triângulos para o cache pós-transformação (Tipsify)
+#   3. optimize_overdraw: clusters da etapa 2 ordenados de fora para dentro
+#   4. optimize_vertex_fetch: vértices renumerados na ordem de primeiro uso
+# O ACMR (vértices transformados por triângulo) mede o cache: 3.0 é o pior, ~0.5-0.7 é bom.
+
+
+def optimizer_settings_key():
+    """ Bytes com as configurações que mudam a malha otimizada (entram nas chaves de cache). """
+    return struct.pack("<?Id", bool(settings.MESH_OPTIMIZE), int(settings.MESH_VERTEX_CACHE_SIZE),
+                       float(settings.MESH_OVERDRAW_THRESHOLD))
+
+
+def cache_misses(indices, cache_size=None):
+    """ Vértices que caem fora de um cache FIFO de `cache_size` entradas, por triângulo. """
+    cache_size = cache_size or settings.MESH_VERTEX_CACHE_SIZE
+    tris = np.asarray(indices).reshape(-1, 3).tolist()
+    fifo = deque()
+    cached = set()
+    misses = np.zeros(len(tris), dtype=np.int32)
+    for t, tri in enumerate(tris):
+        for v in tri:
+            if v in cached:
+                continue
+            misses[t] += 1
+            fifo.append(v)
+            cached.add(v)
+            if len(fifo) > cache_size:
+                cached.discard(fifo.popleft())
+    return misses
+
+
+def acmr(indices, cache_size=None):
+    """ Average cache miss ratio: vértices transformados por triângulo num cache FIFO. """
+    triangles = len(indices) // 3
+    return float(cache_misses(indices, cache_size).sum()) / triangles if triangles else 0.0
+
+
+def deduplicate_vertices(vertices, indices=None):
+    """
+    Junta vértices iguais (comparando os bytes). Sem `indices` a malha é tratada como
+    lista de triângulos. Retorna (vértices, índices uint32, posição original de cada vértice
+    mantido), com os vértices na ordem da primeira ocorrência.
+    """
+    vertices = np.ascontiguousarray(vertices)
+    if indices is None:
+        indices = np.arange(len(vertices), dtype=np.uint32)
+    rows = vertices.reshape(len(vertices), -1).view(np.uint8).reshape(len(vertices), -1)
+    keys = rows.view(np.dtype((np.void, rows.shape[1]))).reshape(-1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # np.unique ordena pelos bytes; volta para a ordem de primeira ocorrência
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    kept = first[order]
+    remap = rank[inverse.reshape(-1)]
+    return vertices[kept], remap[np.asarray(indices, dtype=np.int64)].astype(np.uint32), kept
+
+
+def _tipsify(tris, vertex_count, cache_size):
+    """
+    Tipsify (Sander, Nehab e Barczak, 2007): abre leques em volta de um vértice e
+    escolhe o próximo entre os vizinhos que ainda estão no cache. Linear no número de
+    triângulos. Retorna (ordem dos triângulos, início de cada cluster rígido).
+    """
+    # Adjacência vértice -> triângulos em CSR
+    flat = tris.reshape(-1)
+    live = np.bincount(flat, minlength=vertex_count).astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(live)])
+    adjacency = np.argsort(flat, kind='stable') // 3
+    offsets, adjacency, live = offsets.tolist(), adjacency.tolist(), live.tolist()
+    tri_list = tris.tolist()
+
+    stamp = [0] * vertex_count
+    emitted = [False] * len(tri_list)
+    dead_end = []
+    order = []
+    clusters = [0]
+    time_now = cache_size + 1
+    cursor = 0
+
+    fan = 0
+    while fan < vertex_count and live[fan] == 0:
+        fan += 1
+    if fan == vertex_count:
+        return order, clusters
+
+    while fan >= 0:
+        candidates = []
+        for k in range(offsets[fan], offsets[fan + 1]):
+            t = adjacency[k]
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            order.append(t)
+            for v in tri_list[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time_now - stamp[v] > cache_size:
+                    stamp[v] = time_now
+                    time_now += 1
+
+        # Próximo leque: vizinho com triângulos vivos que ainda vai estar no cache
+        fan, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if time_now - stamp[v] + 2 * live[v] <= cache_size:
+                    priority = time_now - stamp[v]
+                if priority > best:
+                    fan, best = v, priority
+
+        if fan < 0:
+            # Beco sem saída: volta pela pilha de vértices recentes ou pula para o próximo vivo
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fan = v
+                    break
+            if fan < 0:
+                while cursor < vertex_count and live[cursor] == 0:
+                    cursor += 1
+                fan = cursor if cursor < vertex_count else -1
+            # Cache praticamente frio daqui em diante: fronteira rígida de cluster
+            if fan >= 0 and len(order) > clusters[-1]:
+                clusters.append(len(order))
+    return order, clusters
+
+
+def optimize_vertex_cache(indices, cache_size=None):
+    """
+    Reordena os triângulos para o cache pós-transformação. Os índices podem ser
+    esparsos (ex.: os locais dos chunks do terreno). Retorna (índices, clusters) com
+    o início de cada cluster rígido em triângulos.
+    """
+    cache_size = cache_size or settings.MESH_VERTEX_CACHE_SIZE
+    indices = np.asarray(indices)
+    if len(indices) < 3:
+        return indices.copy(), [0]
+    ids, compact = np.unique(indices, return_inverse=True)
+    tris = compact.reshape(-1, 3)
+    order, clusters = _tipsify(tris, len(ids), cache_size)
+    return indices.reshape(-1, 3)[np.asarray(order, dtype=np.int64)].reshape(-1), clusters
+
+
+def _soft_boundaries(indices, clusters, cache_size, threshold):
+    """ Divide os clusters rígidos onde o ACMR acumulado já está perto do ACMR do cluster. """
+    tris = np.asarray(indices).reshape(-1, 3).tolist()
+    bounds = list(clusters) + [len(tris)]
+    result = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        limit = threshold * cache_misses(indices[start * 3:end * 3], cache_size).sum() / (end - start)
+        result.append(start)
+        # Cada divisão recomeça com o cache frio, como o começo de um cluster
+        fifo, cached = deque(), set()
+        sub_start, running = start, 0
+        for t in range(start, end):
+            for v in tris[t]:
+                if v in cached:
+                    continue
+                running += 1
+                fifo.append(v)
+                cached.add(v)
+                if len(fifo) > cache_size:
+                    cached.discard(fifo.popleft())
+            if t + 1 < end and running <= limit * (t - sub_start + 1):
+                result.append(t + 1)
+                fifo, cached = deque(), set()
+                sub_start, running = t + 1, 0
+    return result
+
+
+def optimize_overdraw(indices, positions, clusters, cache_size=None, threshold=None):
+    """
+    Ordena os clusters do optimize_vertex_cache pelo quanto apontam para fora do centro
+    da malha: os de fora tendem a tampar os de dentro, então o teste de profundidade
+    descarta mais fragmentos. `threshold` > 1 troca um pouco de ACMR por clusters menores.
+    """
+    cache_size = cache_size or settings.MESH_VERTEX_CACHE_SIZE
+    threshold = threshold or settings.MESH_OVERDRAW_THRESHOLD
+    tris = np.asarray(indices).reshape(-1, 3)
+    if len(tris) == 0:
+        return np.asarray(indices).copy()
+    starts = _soft_boundaries(np.asarray(indices), clusters, cache_size, threshold)
+
+    p = np.asarray(positions, dtype=np.float64)[tris]  # (T, 3 vértices, xyz)
+    face_normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])  # tamanho = 2 * área
+    areas = np.linalg.norm(face_normals, axis=1)
+    centroids = p.mean(axis=1)
+    mesh_center = (centroids * areas[:, None]).sum(axis=0) / max(areas.sum(), 1e-12)
+
+    cluster_of = np.repeat(np.arange(len(starts)), np.diff(starts + [len(tris)]))
+    weight = np.bincount(cluster_of, areas)
+    center = np.stack([np.bincount(cluster_of, centroids[:, k] * areas) for k in range(3)], axis=1)
+    center /= np.maximum(weight, 1e-12)[:, None]
+    normal = np.stack([np.bincount(cluster_of, face_normals[:, k]) for k in range(3)], axis=1)
+    normal /= np.maximum(np.linalg.norm(normal, axis=1), 1e-12)[:, None]
+    potential = ((center - mesh_center) * normal).sum(axis=1)
+
+    # Estável: clusters empatados mantêm a ordem boa para o cache
+    cluster_order = np.argsort(-potential, kind='stable')
+    tri_order = np.argsort(np.argsort(cluster_order)[cluster_of], kind='stable')
+    return tris[tri_order].reshape(-1)
+
+
+def optimize_vertex_fetch(vertices, indices):
+    """
+    Renumera os vértices na ordem em que os índices os usam (leituras sequenciais no VBO).
+    Vértices que nenhum triângulo usa são descartados. Retorna (vértices, índices uint32).
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    _, first = np.unique(indices, return_index=True)
+    used = indices[np.sort(first)]
+    remap = np.full(len(vertices), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    return np.ascontiguousarray(vertices[used]), remap[indices].astype(np.uint32)
+
+
+def optimize_mesh(vertices, indices=None, positions=None, cache_size=None):
+    """
+    Passa a malha pelas quatro etapas. `positions` (N, 3) alinhado com `vertices` liga o
+    passo de overdraw. Retorna (vértices, índices uint32, estatísticas).
+    """
+    start = time.perf_counter()
+    cache_size = cache_size or settings.MESH_VERTEX_CACHE_SIZE
+    source_indices = np.arange(len(vertices), dtype=np.uint32) if indices is None else np.asarray(indices)
+    stats = {'vertices_before': len(vertices), 'acmr_before': round(acmr(source_indices, cache_size), 4)}
+
+    vertices, indices, kept = deduplicate_vertices(vertices, source_indices)
+    indices, clusters = optimize_vertex_cache(indices, cache_size)
+    if positions is not None:
+        indices = optimize_overdraw(indices, np.asarray(positions)[kept], clusters, cache_size)
+    vertices, indices = optimize_vertex_fetch(vertices, indices)
+
+    stats.update({'vertices_after': len(vertices), 'acmr_after': round(acmr(indices, cache_size), 4),
+                  'clusters': len(clusters), 'ms': round((time.perf_counter() - start) * 1000.0, 1)})
+    return vertices, indices, stats
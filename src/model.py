@@ -1,311 +1,308 @@
 import struct
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
 import numpy as np
 from OpenGL.GL import *
 import ctypes
-from pygltflib import GLTF2
 import glm
-import io
-from PIL import Image # Biblioteca para ler a textura
+import settings
+from animation import prepare_channel, sample_channel
+from model_cache import load_model_data
+from texture_uploader import TextureUploader
+from skeleton import Skeleton
+from bone_palette import BONE_PALETTE_TEXTURE_UNIT, BonePalette
+from vertex_format import as_vertex_records
+from geometry_arena import GeometryArena
+from gl_state import gl_state
+
+# Quanto um passo de envio espera (s) por uma textura ainda decodificando antes de devolver o frame
+_DECODE_WAIT = 0.001
 
 # --- CLASSE AUXILIAR PARA ANIMAÇÃO ---
+# Só descreve o nó no carregamento; a pose de cada frame vive no Skeleton (arrays)
 class Node:
-    def __init__(self, index, name, local_matrix=glm.mat4(1.0)):
+    def __init__(self, index, name):
         self.index = index
         self.name = name
         self.children = []
         self.parent = None
         
-        # Transformações Locais (Animáveis)
+        # Transformações Locais de repouso
         self.translation = glm.vec3(0.0)
         self.rotation = glm.quat(1.0, 0.0, 0.0, 0.0)
         self.scale = glm.vec3(1.0)
         
-        self.local_transform = local_matrix
-        self.global_transform = glm.mat4(1.0)
-        self.inverse_bind_matrix = glm.mat4(1.0)
         self.is_joint = False
 
-    def update_local_transform(self):
-        t = glm.translate(glm.mat4(1.0), self.translation)
-        r = glm.mat4(self.rotation)
-        s = glm.scale(glm.mat4(1.0), self.scale)
-        self.local_transform = t * r * s
+def bind_material(shader, texture_id):
+    """Textura difusa na unidade 0 (ou u_has_texture = 0 sem textura)."""
+    if texture_id is not None:
+        gl_state.bind_texture(0, texture_id) # Unidade 0 para cor difusa
+        shader.set_uniform_int("u_texture_diffuse", 0)
+        shader.set_uniform_int("u_has_texture", 1)
+    else:
+        shader.set_uniform_int("u_has_texture", 0)
 
 class Mesh:
-    def __init__(self, vertices, indices, texture_id=None):
-        self.vertices = vertices
-        self.indices = indices
+    """Uma primitiva do glTF: uma faixa de vértices e índices dentro de uma GeometryArena."""
+    def __init__(self, arena, vertices, indices, texture_id=None):
+        self.arena = arena
+        self.vertices = as_vertex_records(vertices) # Cópia na CPU (mmap do cache), ex.: raio do Crowd
         self.texture_id = texture_id # ID da textura OpenGL
-        self.vao = glGenVertexArrays(1)
-        self.vbo = glGenBuffers(1)
-        self.ebo = glGenBuffers(1)
-        self.setup_mesh()
-
-    def setup_mesh(self):
-        if len(self.vertices) == 0: return
-
-        glBindVertexArray(self.vao)
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
-        
-        if len(self.indices) > 0:
-            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-            glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        self.base_vertex, self.first_index, self.index_count = arena.allocate(self.vertices, indices)
 
-        stride = 64
-        # 0:Pos, 1:Norm, 2:UV, 3:BoneIDs, 4:Weights
-        
-        # Atributos 0, 1, 2 (Padrão)
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(1)
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(2)
-        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(24))
-        
-        # --- CORREÇÃO CRÍTICA AQUI ---
-        # Mudamos de glVertexAttribIPointer (Int) para Pointer (Float)
-        # Isso resolve o "Cilindro"
-        glEnableVertexAttribArray(3)
-        glVertexAttribPointer(3, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(32)) 
-        
-        glEnableVertexAttribArray(4)
-        glVertexAttribPointer(4, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(48))
-        
-        glBindVertexArray(0)
-
-    def draw(self, shader):
-        # Ativar Textura se existir
-        if self.texture_id is not None:
-            glActiveTexture(GL_TEXTURE0) # Unidade 0 para cor difusa
-            glBindTexture(GL_TEXTURE_2D, self.texture_id)
-            shader.set_uniform_int("u_texture_diffuse", 0)
-            shader.set_uniform_int("u_has_texture", 1)
+    def draw_elements(self, instance_count=None):
+        """Só o draw (VAO e material já ligados por quem chama)."""
+        offset = ctypes.c_void_p(self.first_index * 4)
+        if instance_count is not None:
+            # Várias cópias num draw só (atributos por instância no VAO do Crowd)
+            glDrawElementsInstancedBaseVertex(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, offset,
+                                              instance_count, self.base_vertex)
         else:
-            shader.set_uniform_int("u_has_texture", 0)
+            glDrawElementsBaseVertex(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, offset, self.base_vertex)
 
-        glBindVertexArray(self.vao)
-        if len(self.indices) > 0:
-            glDrawElements(GL_TRIANGLES, len(self.indices), GL_UNSIGNED_INT, None)
-        else:
-            glDrawArrays(GL_TRIANGLES, 0, len(self.vertices) // 16)
-        glBindVertexArray(0)
+    def draw(self, shader):
+        bind_material(shader, self.texture_id)
+        gl_state.bind_vertex_array(self.arena.vao)
+        self.draw_elements()
 
 class Model:
-    def __init__(self, path, shader):
+    def __init__(self, path, shader, load=True, arena=None):
+        self.path = path
         self.shader = shader
+        # Vértices e índices de todas as malhas (a arena pode ser de vários modelos)
+        self.owns_arena = arena is None
+        self.arena = arena if arena is not None else GeometryArena()
         self.meshes = []
+        self.draw_batches = [] # (textura, contagens, offsets, base vertices): um multi-draw cada
         self.nodes = []
         self.root_nodes = []
         self.joints = []
-        self.animations = [] 
-        self.current_time = 0.0
+        self.skeleton = None # Pose em arrays (SoA), criada no carregamento
+        self.bone_palette = None # Texture buffer com a paleta (só modelos com esqueleto)
+        self.animations = [] # Dados dos clipes (compartilhados); o estado de reprodução fica no Animator
         self.textures = {} # Mapa de índice GLTF -> ID OpenGL
         
-        self.load_glb(path)
-
-    def update_animation(self, delta_time):
-        if not self.animations: return # Se não tiver animação, não faz nada
+        # Com load=False o modelo fica vazio até o AssetLoader rodar prepare() e upload_steps()
+        if load:
+            self.load_glb(path)
 
-        anim = self.animations[0]
-        self.current_time += delta_time
-        if self.current_time > anim['duration']: self.current_time = 0.0
-        
-        for channel in anim['channels']:
-            node = self.nodes[channel['node_idx']]
-            times = channel['times']
-            values = channel['values']
-            path = channel['path']
-            
-            # Busca binária ou linear simples
-            k = 0
-            for i in range(len(times) - 1):
-                if self.current_time >= times[i] and self.current_time <= times[i+1]:
-                    k = i
-                    break
-            
-            dt = times[k+1] - times[k]
-            factor = (self.current_time - times[k]) / dt if dt > 0 else 0.0
+    def pose_clip(self, clip_index, t):
+        """Aplica o clipe `clip_index` no instante t ao esqueleto e retorna a paleta de ossos."""
+        skeleton = self.skeleton
+        for channel in self.animations[clip_index]['channels']:
+            # Busca binária com cursor por canal (para frente é O(1))
+            value = sample_channel(channel, t)
+            row = channel['slot']
             
-            if path == 'translation':
-                idx = k * 3
-                v0 = glm.vec3(values[idx], values[idx+1], values[idx+2])
-                idx = (k+1) * 3
-                v1 = glm.vec3(values[idx], values[idx+1], values[idx+2])
-                node.translation = glm.mix(v0, v1, factor)
-            elif path == 'rotation':
-                idx = k * 4
-                q0 = glm.quat(values[idx+3], values[idx], values[idx+1], values[idx+2])
-                idx = (k+1) * 4
-                q1 = glm.quat(values[idx+3], values[idx], values[idx+1], values[idx+2])
-                node.rotation = glm.slerp(q0, q1, factor)
-            elif path == 'scale':
-                idx = k * 3
-                v0 = glm.vec3(values[idx], values[idx+1], values[idx+2])
-                idx = (k+1) * 3
-                v1 = glm.vec3(values[idx], values[idx+1], values[idx+2])
-                node.scale = glm.mix(v0, v1, factor)
+            if channel['path'] == 'translation':
+                skeleton.translations[row] = value
+            elif channel['path'] == 'rotation':
+                skeleton.rotations[row] = value # glm.quat vira (w, x, y, z)
+            elif channel['path'] == 'scale':
+                skeleton.scales[row] = value
 
-        self.update_hierarchy()
+        # Locais, globais e paleta em lote
+        return skeleton.update()
 
-    def update_hierarchy(self):
-        for node in self.nodes: node.update_local_transform()
-        for root in self.root_nodes: self.update_node_global(root, glm.mat4(1.0))
+    def draw(self, shader, palette=None, version=None):
+        """Desenha com a paleta dada (ex.: de uma instância do Animator) ou a do esqueleto."""
+        if self.bone_palette is not None:
+            if palette is None:
+                palette, version = self.skeleton.palette, self.skeleton.version
+            # Só reenvia a paleta se a pose mudou desde o último envio
+            self.bone_palette.upload(palette, version)
+            self.bone_palette.bind(shader)
+        else:
+            # Sem ossos: com u_bone_count = 0 o shader usa identidade (nada a enviar).
+            # O samplerBuffer ainda precisa de uma unidade só dele: na 0 (a da textura
+            # difusa, um sampler2D) o draw falha com GL_INVALID_OPERATION
+            shader.set_uniform_int("u_bone_palette", BONE_PALETTE_TEXTURE_UNIT)
+            shader.set_uniform_int("u_bone_count", 0)
 
-    def update_node_global(self, node, parent_transform):
-        node.global_transform = parent_transform * node.local_transform
-        for child_idx in node.children:
-            self.update_node_global(self.nodes[child_idx], node.global_transform)
+        # Um VAO para o modelo inteiro e um multi-draw por textura
+        gl_state.bind_vertex_array(self.arena.vao)
+        for texture_id, counts, offsets, base_vertices in self.draw_batches:
+            bind_material(shader, texture_id)
+            self.arena.draw_batch(counts, offsets, base_vertices)
 
-    def draw(self, shader):
-        bone_matrices = []
-        if self.joints:
-            for joint_idx in self.joints:
-                node = self.nodes[joint_idx]
-                bone_matrices.append(node.global_transform * node.inverse_bind_matrix)
-            if len(bone_matrices) > 100: bone_matrices = bone_matrices[:100]
-            shader.set_uniform_mat4_array("u_finalBones", bone_matrices)
-        else:
-            # Envia Identidade se não tiver ossos, para o shader não bugar
-            shader.set_uniform_mat4_array("u_finalBones", [glm.mat4(1.0)] * 100)
+    @property
+    def sort_texture(self):
+        """Textura do primeiro lote (chave de ordenação na RenderQueue)."""
+        return (self.draw_batches[0][0] or 0) if self.draw_batches else 0
 
+    def build_draw_batches(self):
+        """Agrupa as malhas por textura (na ordem em que aparecem) em listas para o multi-draw."""
+        groups = {}
         for mesh in self.meshes:
-            mesh.draw(shader)
+            if mesh.index_count:
+                groups.setdefault(mesh.texture_id, []).append(mesh)
+        self.draw_batches = [
+            (texture_id,
+             np.array([m.index_count for m in meshes], dtype=np.int32),
+             np.array([m.first_index * 4 for m in meshes], dtype=np.uintp), # offsets em bytes no EBO
+             np.array([m.base_vertex for m in meshes], dtype=np.int32))
+            for texture_id, meshes in groups.items()
+        ]
+
+    def release(self):
+        if self.bone_palette is not None:
+            self.bone_palette.release()
+        if self.owns_arena:
+            self.arena.release()
 
     def load_glb(self, path):
+        """Carregamento síncrono: a parte de CPU e todos os passos de GPU de uma vez."""
         print(f"Carregando: {path}...")
         try:
-            gltf = GLTF2().load(path)
-            
-            # 1. Carregar Texturas (NOVO)
-            if gltf.images:
-                print(f"Processando {len(gltf.images)} texturas...")
-                for i, img_entry in enumerate(gltf.images):
-                    tex_id = self.process_texture(gltf, img_entry)
-                    if tex_id: self.textures[i] = tex_id
+            for _ in self.upload_steps(self.prepare(path)):
+                pass
+        except Exception as e:
+            print(f"Erro GLB: {e}")
+            import traceback
+            traceback.print_exc()
 
-            # 2. Nós e Hierarquia
-            for i, g_node in enumerate(gltf.nodes):
-                node = Node(i, g_node.name or f"Node_{i}")
-                if g_node.translation: node.translation = glm.vec3(*g_node.translation)
-                if g_node.rotation: node.rotation = glm.quat(g_node.rotation[3], g_node.rotation[0], g_node.rotation[1], g_node.rotation[2])
-                if g_node.scale: node.scale = glm.vec3(*g_node.scale)
-                node.children = g_node.children or []
-                self.nodes.append(node)
-            
-            children_ids = set()
-            for node in self.nodes:
-                for c in node.children: 
-                    self.nodes[c].parent = node
-                    children_ids.add(c)
-            self.root_nodes = [n for i, n in enumerate(self.nodes) if i not in children_ids]
+    def prepare(self, path):
+        """
+        Parte de CPU do carregamento (pode rodar numa thread do AssetLoader): lê o modelo
+        compilado ou o GLB e monta nós, esqueleto e clipes. Não chama o OpenGL.
+        """
+        start = time.perf_counter()
+        # Modelo compilado (mmap) quando estiver em dia; senão lê o GLB e compila
+        cache_dir = settings.MODEL_CACHE_DIR if settings.MODEL_CACHE_ENABLED else None
+        # Fora do HIT as texturas continuam decodificando: upload_steps envia cada uma ao terminar
+        meta, arrays, cache_status, decoding = load_model_data(path, cache_dir)
 
-            # 3. Skins
-            if gltf.skins:
-                skin = gltf.skins[0]
-                self.joints = skin.joints
-                if skin.inverseBindMatrices is not None:
-                    data = self.get_data(gltf, skin.inverseBindMatrices, 16)
-                    for k, j_idx in enumerate(self.joints):
-                        raw_m = data[k]
-                        self.nodes[j_idx].inverse_bind_matrix = glm.make_mat4(raw_m.ctypes.data_as(ctypes.POINTER(ctypes.c_float)))
+        # 1. Nós e Hierarquia
+        translations = arrays['nodes.translations']
+        rotations = arrays['nodes.rotations'] # (w, x, y, z)
+        scales = arrays['nodes.scales']
+        nodes = []
+        for i, n in enumerate(meta['nodes']):
+            node = Node(i, n['name'])
+            node.translation = glm.vec3(*translations[i])
+            node.rotation = glm.quat(*rotations[i])
+            node.scale = glm.vec3(*scales[i])
+            node.children = n['children']
+            nodes.append(node)
 
-            # 4. Malhas e Materiais
-            for gltf_mesh in gltf.meshes:
-                for prim in gltf_mesh.primitives:
-                    # Geometria
-                    pos = self.get_data(gltf, prim.attributes.POSITION, 3)
-                    norm = self.get_data(gltf, prim.attributes.NORMAL, 3)
-                    uv = self.get_data(gltf, prim.attributes.TEXCOORD_0, 2)
-                    joints = self.get_data(gltf, prim.attributes.JOINTS_0, 4, np.uint32)
-                    weights = self.get_data(gltf, prim.attributes.WEIGHTS_0, 4)
-                    indices = self.get_data(gltf, prim.indices, 1, np.uint32).flatten() if prim.indices is not None else np.array([], dtype=np.uint32)
-                    
-                    # Padding
-                    nv = len(pos)
-                    if len(norm)==0: norm=np.zeros((nv,3), np.float32)
-                    if len(uv)==0: uv=np.zeros((nv,2), np.float32)
-                    if len(joints)==0: joints=np.zeros((nv,4), np.uint32)
-                    if len(weights)==0: weights=np.zeros((nv,4), np.float32)
+        children_ids = set()
+        for node in nodes:
+            for c in node.children: 
+                nodes[c].parent = node
+                children_ids.add(c)
 
-                    data = np.column_stack((pos, norm, uv, joints.astype(np.float32), weights))
-                    v_data = data.flatten().astype(np.float32)
-                    
-                    # Descobrir Textura do Material
-                    tex_id = None
-                    if prim.material is not None:
-                        mat = gltf.materials[prim.material]
-                        if mat.pbrMetallicRoughness and mat.pbrMetallicRoughness.baseColorTexture:
-                            tex_idx = mat.pbrMetallicRoughness.baseColorTexture.index
-                            # O índice da textura aponta para uma 'source' (imagem)
-                            source_img_idx = gltf.textures[tex_idx].source
-                            tex_id = self.textures.get(source_img_idx)
+        # 2. Skins
+        joints = meta['joints']
+        for j_idx in joints: nodes[j_idx].is_joint = True
+        inverse_bind = arrays[meta['inverse_bind']] if meta['inverse_bind'] else None
+        parents = [node.parent.index if node.parent is not None else -1 for node in nodes]
+        skeleton = Skeleton(parents, translations, rotations, scales, joints, inverse_bind)
 
-                    self.meshes.append(Mesh(v_data, indices, tex_id))
+        # 3. Animação
+        animations = []
+        for anim_meta in meta['animations']:
+            anim = {'channels': [], 'duration': anim_meta['duration']}
+            for ch in anim_meta['channels']:
+                channel = prepare_channel(ch['node'], ch['path'], arrays[ch['times']], arrays[ch['values']],
+                                          ch['interpolation'])
+                channel['slot'] = skeleton.slot[ch['node']]
+                anim['channels'].append(channel)
+            animations.append(anim)
 
-            # 5. Animação
-            if gltf.animations:
-                for g_anim in gltf.animations:
-                    anim = {'channels': [], 'duration': 0.0}
-                    for ch in g_anim.channels:
-                        sampler = g_anim.samplers[ch.sampler]
-                        times = self.get_data(gltf, sampler.input, 1).flatten()
-                        vals = self.get_data(gltf, sampler.output, 4 if ch.target.path=='rotation' else 3).flatten()
-                        anim['channels'].append({'node_idx': ch.target.node, 'path': ch.target.path, 'times': times, 'values': vals})
-                        if len(times)>0: anim['duration'] = max(anim['duration'], times[-1])
-                    self.animations.append(anim)
+        return {
+            'meta': meta, 'arrays': arrays, 'cache': cache_status, 'decoding': decoding,
+            'nodes': nodes, 'root_nodes': [n for i, n in enumerate(nodes) if i not in children_ids],
+            'joints': joints, 'skeleton': skeleton, 'animations': animations,
+            'prepare_ms': (time.perf_counter() - start) * 1000.0,
+        }
 
-            print("Modelo carregado com sucesso!")
-        except Exception as e:
-            print(f"Erro GLB: {e}")
-            import traceback
-            traceback.print_exc()
+    def upload_steps(self, data):
+        """
+        Parte de GPU (thread do OpenGL) em passos curtos: cada `yield` fecha um passo
+        (uma textura, uma malha), para o AssetLoader repartir o envio entre frames.
+        O modelo só fica completo quando o gerador termina.
+        """
+        meta, arrays = data['meta'], data['arrays']
+        upload_ms = 0.0
+        step_start = time.perf_counter()
 
-    def process_texture(self, gltf, img_entry):
-        try:
-            if img_entry.bufferView is None: return None
-            
-            bv = gltf.bufferViews[img_entry.bufferView]
-            offset = bv.byteOffset + (0)
-            blob = gltf.binary_blob()
-            img_data = blob[offset : offset + bv.byteLength]
-            
-            image = Image.open(io.BytesIO(img_data))
-            
-            # --- CORREÇÃO DE COR ---
-            # Removi o FLIP_TOP_BOTTOM. O GLB geralmente já vem correto.
-            # Se continuar errado, tente descomentar a linha abaixo:
-            # image = image.transpose(Image.FLIP_TOP_BOTTOM) 
-            
-            if image.mode != 'RGBA': image = image.convert('RGBA')
-            img_bytes = image.tobytes()
-            
-            tex_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, tex_id)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, image.width, image.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_bytes)
-            glGenerateMipmap(GL_TEXTURE_2D)
-            return tex_id
-        except Exception as e:
-            print(f"Erro textura: {e}")
-            return None
+        # 1. Texturas pelo anel de PBOs, uma por passo: as do modelo compilado (com mipmaps
+        # prontos) primeiro, depois as do GLB na ordem em que a decodificação termina
+        texture_stats = {} # índice -> (posição em uploader.stats, ms de decodificação ou None)
+        upload_stats = []
+        ready = [(i, [arrays[name] for name in tex['levels']], None)
+                 for i, tex in enumerate(meta['textures']) if tex is not None]
+        decoding = {future: i for i, future in data['decoding'].items()}
+        if ready or decoding:
+            print(f"Processando {len(meta['textures'])} texturas...")
+            uploader = TextureUploader()
+            while ready or decoding:
+                if not ready:
+                    done, _ = wait(decoding, timeout=_DECODE_WAIT, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        i = decoding.pop(future)
+                        try:
+                            levels, decode_ms = future.result()
+                        except Exception as e:
+                            print(f"Erro textura: {e}")
+                            continue
+                        ready.append((i, levels, decode_ms))
+                    if not ready:
+                        # Nada decodificado ainda: devolve o frame sem contar como envio
+                        yield
+                        step_start = time.perf_counter()
+                        continue
+                i, levels, decode_ms = ready.pop(0)
+                self.textures[i] = uploader.upload(levels)
+                texture_stats[i] = (len(uploader.stats) - 1, decode_ms)
+                upload_ms += (time.perf_counter() - step_start) * 1000.0
+                yield
+                step_start = time.perf_counter()
+            uploader.release()
+            upload_stats = uploader.stats
 
-    def get_data(self, gltf, acc_idx, comp, dtype=np.float32):
-        if acc_idx is None: return np.array([])
-        acc = gltf.accessors[acc_idx]
-        bv = gltf.bufferViews[acc.bufferView]
-        off = bv.byteOffset + (acc.byteOffset or 0)
-        blob = gltf.binary_blob()
-        raw = blob[off : off + bv.byteLength]
-        
-        if acc.componentType==5126: arr = np.frombuffer(raw, dtype=np.float32)
-        elif acc.componentType==5123: arr = np.frombuffer(raw, dtype=np.uint16).astype(dtype)
-        elif acc.componentType==5125: arr = np.frombuffer(raw, dtype=np.uint32).astype(dtype)
-        elif acc.componentType==5121: arr = np.frombuffer(raw, dtype=np.uint8).astype(dtype)
-        else: return np.zeros((acc.count, comp), dtype=dtype)
-        
-        if comp > 1: return arr.reshape((-1, comp))
-        return arr
\ No newline at end of file
+        # 2. Malhas e Materiais (vértices já no formato compacto), todas na mesma arena
+        meshes = []
+        # Espaço do modelo inteiro de uma vez: a arena não realoca no meio dos passos
+        vertex_counts = [len(as_vertex_records(arrays[m['vertices']])) for m in meta['meshes']]
+        index_counts = [len(arrays[m['indices']]) if m['indices'] else n
+                        for m, n in zip(meta['meshes'], vertex_counts)]
+        self.arena.reserve(sum(vertex_counts), sum(index_counts))
+        for mesh in meta['meshes']:
+            indices = arrays[mesh['indices']] if mesh['indices'] else None
+            tex_id = self.textures.get(mesh['texture']) if mesh['texture'] is not None else None
+            meshes.append(Mesh(self.arena, arrays[mesh['vertices']], indices, tex_id))
+            upload_ms += (time.perf_counter() - step_start) * 1000.0
+            yield
+            step_start = time.perf_counter()
+
+        # 3. Esqueleto e clipes entram juntos com as malhas: o modelo nunca fica pela metade
+        bone_palette = BonePalette(len(data['joints'])) if data['joints'] else None
+        self.nodes, self.root_nodes, self.joints = data['nodes'], data['root_nodes'], data['joints']
+        self.skeleton, self.bone_palette = data['skeleton'], bone_palette
+        self.animations = data['animations']
+        self.meshes = meshes
+        self.build_draw_batches()
+        upload_ms += (time.perf_counter() - step_start) * 1000.0
+
+        # Decodificação só aconteceu agora se o modelo não veio do cache compilado; o envio
+        # separa a CPU (cópia para o PBO e comandos) do fim da transferência na GPU
+        cache_status = data['cache']
+        for i, (stat, decode_ms) in texture_stats.items():
+            width, height, levels, submit_ms, gpu_ms = upload_stats[stat]
+            decode = f"{decode_ms:.1f} ms" if decode_ms is not None else "pronta no cache"
+            print(f"  Textura {i}: {width}x{height}, {levels} níveis, decodificação {decode}, "
+                  f"envio {submit_ms:.1f} ms de CPU, {gpu_ms:.1f} ms até a GPU terminar")
+        # ACMR medido na compilação (cache FIFO simulado), antes e depois do mesh_optimizer,
+        # somado em todas as malhas (pesado pelo número de triângulos)
+        optimized = [(m['optimize'], len(arrays[m['indices']]) // 3) for m in meta['meshes'] if m.get('optimize')]
+        if optimized:
+            triangles = max(sum(t for _, t in optimized), 1)
+            print(f"  {len(optimized)} malhas, {sum(o['vertices_before'] for o, _ in optimized)} -> "
+                  f"{sum(o['vertices_after'] for o, _ in optimized)} vértices, ACMR "
+                  f"{sum(o['acmr_before'] * t for o, t in optimized) / triangles:.3f} -> "
+                  f"{sum(o['acmr_after'] * t for o, t in optimized) / triangles:.3f}, "
+                  f"{len(self.draw_batches)} multi-draws por frame")
+        print(f"Modelo carregado com sucesso! (cache {cache_status}, preparo {data['prepare_ms']:.0f} ms, "
+              f"envio {upload_ms:.0f} ms)")
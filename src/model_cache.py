@@ -0,0 +1,348 @@
+import hashlib
+import io
+import json
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import settings
+from animation import PATH_COMPONENTS
+from glb_reader import GLBReader
+from mesh_optimizer import optimize_mesh, optimizer_settings_key
+from vertex_format import VERTEX_STRIDE, pack_vertices
+
+# Formato do modelo compilado (tudo little-endian):
+#   cabeçalho fixo de 128 bytes
+#   JSON com a descrição do modelo (nós, malhas, texturas, clipes) e a tabela de arrays
+#   arrays: vértices compactos (vertex_format), índices, mipmaps RGBA8, TRS dos nós, chaves dos clipes
+# Cada array começa alinhado em 64 bytes para poder ser mapeado direto (np.memmap).
+CACHE_MAGIC = b"A3MODEL\0"
+CACHE_VERSION = 3
+_HEADER = struct.Struct("<8sI32sQI")
+_HEADER_SIZE = 128
+_ALIGN = 64
+
+
+def _align(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def model_cache_key(source_path):
+    """
+    Chave do modelo compilado: tamanho + data de modificação do GLB + versão do formato
+    + configurações do otimizador de malhas. Não lê o arquivo inteiro (o ponto do cache
+    é não tocar no GLB). None se não existir.
+    """
+    try:
+        st = os.stat(source_path)
+    except OSError:
+        return None
+    h = hashlib.sha256()
+    h.update(struct.pack("<IQQ", CACHE_VERSION, st.st_size, st.st_mtime_ns))
+    h.update(optimizer_settings_key())
+    return h.digest()
+
+
+def model_cache_path(cache_dir, source_path):
+    """ Um arquivo por GLB de origem (recompilar sobrescreve a entrada antiga). """
+    name = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:16]
+    base = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f"model_{base}_{name}.bin")
+
+
+def build_mipmaps(pixels):
+    """ Cadeia de mipmaps completa (até 1x1) com filtro box, a partir de um RGBA8 (H, W, 4). """
+    levels = [pixels]
+    image = Image.fromarray(pixels)
+    while image.width > 1 or image.height > 1:
+        image = image.resize((max(1, image.width // 2), max(1, image.height // 2)), Image.BOX)
+        levels.append(np.asarray(image))
+    return levels
+
+
+def decode_image(data, mipmaps=False):
+    """ Decodifica uma imagem embutida para RGBA8 (mais os mipmaps). Retorna (níveis, ms). """
+    # Tempo de CPU da thread: com várias decodificações em paralelo o tempo de parede engana
+    start = time.thread_time()
+    image = Image.open(io.BytesIO(data))
+    if image.mode != 'RGBA': image = image.convert('RGBA')
+    pixels = np.asarray(image)
+    levels = build_mipmaps(pixels) if mipmaps else [pixels]
+    return levels, (time.thread_time() - start) * 1000.0
+
+
+def read_glb(path, pool, mipmaps=False):
+    """
+    Lê um GLB só na CPU (sem OpenGL): a descrição do modelo em tipos do JSON e os dados
+    prontos para enviar à GPU, no mesmo layout do Mesh. As imagens embutidas vão para
+    `pool` (com `mipmaps`, com a cadeia completa de níveis) enquanto esta thread lê nós,
+    malhas e clipes. Retorna (meta, arrays, decoding): as texturas de meta ainda são
+    None e `decoding` tem {índice: future de decode_image} (ver add_texture).
+    """
+    with GLBReader(path) as reader:
+        gltf = reader.gltf
+        meta = {'nodes': [], 'joints': [], 'meshes': [], 'textures': [], 'animations': [], 'inverse_bind': None}
+        arrays = {}
+
+        decoding = {}
+        for i, img_entry in enumerate(gltf.images or []):
+            meta['textures'].append(None)
+            if img_entry.bufferView is not None:
+                decoding[i] = pool.submit(decode_image, reader.buffer_view(img_entry.bufferView), mipmaps)
+
+        # Nós: hierarquia no JSON, TRS de repouso em arrays (rotação em w, x, y, z)
+        count = len(gltf.nodes)
+        translations = np.zeros((count, 3), dtype=np.float32)
+        rotations = np.tile(np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32), (count, 1))
+        scales = np.ones((count, 3), dtype=np.float32)
+        for i, g_node in enumerate(gltf.nodes):
+            meta['nodes'].append({'name': g_node.name or f"Node_{i}", 'children': list(g_node.children or [])})
+            if g_node.translation: translations[i] = g_node.translation
+            if g_node.rotation: rotations[i] = [g_node.rotation[3], *g_node.rotation[:3]]
+            if g_node.scale: scales[i] = g_node.scale
+        arrays['nodes.translations'] = translations
+        arrays['nodes.rotations'] = rotations
+        arrays['nodes.scales'] = scales
+
+        # Skin: inverse bind em column-major no arquivo, convenção matemática aqui
+        if gltf.skins:
+            skin = gltf.skins[0]
+            meta['joints'] = list(skin.joints)
+            if skin.inverseBindMatrices is not None:
+                data = reader.accessor(skin.inverseBindMatrices)
+                arrays['inverse_bind'] = np.ascontiguousarray(
+                    data[:len(skin.joints)].reshape(-1, 4, 4).transpose(0, 2, 1), dtype=np.float32)
+                meta['inverse_bind'] = 'inverse_bind'
+
+        # Malhas: vértices [pos, normal, uv, ossos, pesos] compactados e índices uint32
+        for gltf_mesh in gltf.meshes or []:
+            for prim in gltf_mesh.primitives:
+                attrs = prim.attributes
+                pos = reader.accessor(attrs.POSITION)
+                data = np.zeros((len(pos), 16), dtype=np.float32)
+                data[:, 0:3] = pos
+                # Atributos ausentes ficam zerados
+                for acc_idx, columns in ((attrs.NORMAL, slice(3, 6)), (attrs.TEXCOORD_0, slice(6, 8)),
+                                         (attrs.JOINTS_0, slice(8, 12)), (attrs.WEIGHTS_0, slice(12, 16))):
+                    if acc_idx is not None:
+                        data[:, columns] = reader.accessor(acc_idx)
+
+                n = len(meta['meshes'])
+                # Formato compacto do Mesh (28 bytes por vértice), gravado como bytes crus
+                vertices = pack_vertices(data)
+                indices = np.array(reader.accessor(prim.indices), dtype=np.uint32) if prim.indices is not None else None
+                mesh = {'vertices': f"mesh{n}.vertices", 'indices': None, 'texture': None, 'optimize': None}
+                if settings.MESH_OPTIMIZE and len(vertices):
+                    # Deduplica e reordena para o cache de vértices, overdraw e fetch (sempre indexada)
+                    vertices, indices, mesh['optimize'] = optimize_mesh(vertices, indices, vertices['position'])
+                arrays[f"mesh{n}.vertices"] = vertices.view(np.uint8).reshape(-1, VERTEX_STRIDE)
+                if indices is not None:
+                    arrays[f"mesh{n}.indices"] = indices
+                    mesh['indices'] = f"mesh{n}.indices"
+
+                # O índice da textura aponta para uma 'source' (imagem)
+                if prim.material is not None:
+                    mat = gltf.materials[prim.material]
+                    if mat.pbrMetallicRoughness and mat.pbrMetallicRoughness.baseColorTexture:
+                        mesh['texture'] = gltf.textures[mat.pbrMetallicRoughness.baseColorTexture.index].source
+                meta['meshes'].append(mesh)
+
+        # Clipes: tempos e valores crus de cada canal (a conversão fica no carregamento)
+        for a, g_anim in enumerate(gltf.animations or []):
+            anim = {'duration': 0.0, 'channels': []}
+            for ch in g_anim.channels:
+                # Morph targets ('weights') não são suportados
+                if ch.target.path not in PATH_COMPONENTS: continue
+                sampler = g_anim.samplers[ch.sampler]
+                times = np.array(reader.accessor(sampler.input), dtype=np.float32).reshape(-1)
+                if len(times) == 0: continue
+                c = len(anim['channels'])
+                arrays[f"anim{a}.ch{c}.times"] = times
+                arrays[f"anim{a}.ch{c}.values"] = np.array(reader.accessor(sampler.output), dtype=np.float32).reshape(
+                    -1, PATH_COMPONENTS[ch.target.path])
+                anim['channels'].append({'node': ch.target.node, 'path': ch.target.path,
+                                         'interpolation': sampler.interpolation or 'LINEAR',
+                                         'times': f"anim{a}.ch{c}.times", 'values': f"anim{a}.ch{c}.values"})
+                anim['duration'] = max(anim['duration'], float(times[-1]))
+            meta['animations'].append(anim)
+
+    return meta, arrays, decoding
+
+
+def add_texture(meta, arrays, index, levels, decode_ms):
+    """ Coloca os níveis de uma textura decodificada em meta/arrays. """
+    names = []
+    for level, data in enumerate(levels):
+        names.append(f"texture{index}.mip{level}")
+        arrays[names[-1]] = data
+    meta['textures'][index] = {'levels': names, 'decode_ms': round(decode_ms, 3)}
+
+
+def extract_glb(path, mipmaps=False):
+    """
+    Lê um GLB só na CPU (sem OpenGL) e devolve (meta, arrays), já com as texturas.
+    Com `mipmaps`, as texturas já saem com a cadeia completa de níveis.
+    """
+    # Texturas decodificadas em paralelo (o PIL solta o GIL ao decodificar e redimensionar)
+    with ThreadPoolExecutor(max_workers=max(1, settings.TEXTURE_DECODE_THREADS)) as pool:
+        meta, arrays, decoding = read_glb(path, pool, mipmaps)
+        for i, future in decoding.items():
+            try:
+                levels, decode_ms = future.result()
+            except Exception as e:
+                print(f"Erro textura: {e}")
+                continue
+            add_texture(meta, arrays, i, levels, decode_ms)
+    return meta, arrays
+
+
+def _save_when_decoded(path, key, meta, arrays, decoding):
+    """ Grava o modelo compilado quando as texturas terminarem (roda no pool delas). """
+    # Cópias: o modelo que está sendo enviado continua lendo os originais
+    meta = dict(meta, textures=list(meta['textures']))
+    arrays = dict(arrays)
+    for i, future in decoding.items():
+        # Falhas já são avisadas no envio; a textura fica de fora do arquivo também
+        if future.exception() is None:
+            add_texture(meta, arrays, i, *future.result())
+    try:
+        save_model_cache(path, key, meta, arrays)
+    except Exception as e:
+        print(f"Não foi possível gravar o modelo compilado: {e}")
+
+
+def load_model_cache(path, key):
+    """
+    Abre o modelo compilado mapeado em memória, sem copiar os arrays.
+    Retorna (meta, arrays) ou None se não existir, estiver velho ou corrompido.
+    """
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        mm = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(mm) < _HEADER_SIZE:
+            raise ValueError("arquivo truncado")
+
+        magic, version, file_key, json_len, crc = _HEADER.unpack_from(mm[:_HEADER.size].tobytes())
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise ValueError("formato desconhecido")
+        if file_key != key:
+            print(f"Modelo compilado desatualizado: {path}")
+            return None
+
+        meta = json.loads(mm[_HEADER_SIZE:_HEADER_SIZE + json_len].tobytes().decode('utf-8'))
+        payload_crc = zlib.crc32(mm[_HEADER_SIZE:])
+        if payload_crc != crc:
+            raise ValueError("checksum não confere")
+
+        arrays = {}
+        for name, (offset, dtype, shape) in meta.pop('arrays').items():
+            count = int(np.prod(shape))
+            if offset + count * np.dtype(dtype).itemsize > len(mm):
+                raise ValueError("tamanho inesperado")
+            arrays[name] = np.frombuffer(mm, dtype=dtype, count=count, offset=offset).reshape(shape)
+        return meta, arrays
+    except (ValueError, KeyError, OSError, struct.error) as e:
+        print(f"Modelo compilado inválido ({e}): {path}")
+        return None
+
+
+def model_cache_is_current(path, key):
+    """ Só confere o cabeçalho (usado pelo conversor para pular o que não mudou). """
+    try:
+        with open(path, 'rb') as f:
+            magic, version, file_key, _, _ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return False
+    return magic == CACHE_MAGIC and version == CACHE_VERSION and file_key == key
+
+
+def save_model_cache(path, key, meta, arrays):
+    """ Grava o modelo compilado de forma atômica. """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # Tabela de arrays: offsets dependem do tamanho do JSON, que depende dos offsets;
+    # reserva espaço com folga e ajusta até estabilizar
+    arrays = {name: np.ascontiguousarray(arr) for name, arr in arrays.items()}
+    json_len = 0
+    while True:
+        offset = _align(_HEADER_SIZE + json_len)
+        table = {}
+        for name, arr in arrays.items():
+            table[name] = [offset, arr.dtype.str, list(arr.shape)]
+            offset = _align(offset + arr.nbytes)
+        body = json.dumps({**meta, 'arrays': table}, separators=(',', ':')).encode('utf-8')
+        if len(body) <= json_len:
+            break
+        json_len = len(body) + 256
+    body = body.ljust(json_len, b" ")
+
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(b"\0" * _HEADER_SIZE)
+            f.write(body)
+            # CRC de tudo depois do cabeçalho (JSON + arrays com o padding)
+            crc = zlib.crc32(body)
+            for name, arr in arrays.items():
+                padding = b"\0" * (table[name][0] - f.tell())
+                data = memoryview(arr).cast('B')
+                crc = zlib.crc32(data, zlib.crc32(padding, crc))
+                f.write(padding)
+                f.write(data)
+            f.seek(0)
+            f.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, key, json_len, crc))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Não foi possível gravar o modelo compilado: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+def compile_model(source_path, cache_dir):
+    """ Converte um GLB para o formato compilado (com mipmaps). Retorna o caminho gravado. """
+    key = model_cache_key(source_path)
+    path = model_cache_path(cache_dir, source_path)
+    meta, arrays = extract_glb(source_path, mipmaps=True)
+    if not save_model_cache(path, key, meta, arrays):
+        raise OSError(f"não foi possível gravar {path}")
+    return path
+
+
+def load_model_data(source_path, cache_dir):
+    """
+    (meta, arrays, status, decoding) de um GLB: do modelo compilado se estiver em dia
+    ("HIT"), senão lido do GLB ("MISS"; "OFF" sem cache_dir). Fora do HIT as texturas
+    voltam ainda decodificando, em `decoding` ({índice: future de decode_image}), para o
+    envio começar pela primeira que terminar; o modelo compilado é gravado numa thread
+    depois da última.
+    """
+    if cache_dir:
+        key = model_cache_key(source_path)
+        if key is None:
+            raise FileNotFoundError(source_path)
+        path = model_cache_path(cache_dir, source_path)
+        cached = load_model_cache(path, key)
+        if cached is not None:
+            return cached[0], cached[1], "HIT", {}
+
+    # Pool só desta carga: o shutdown sem espera deixa as tarefas na fila terminarem
+    # e solta as threads depois da última
+    pool = ThreadPoolExecutor(max_workers=max(1, settings.TEXTURE_DECODE_THREADS), thread_name_prefix="decode")
+    try:
+        # Sem cache, os mipmaps saem do glGenerateMipmap
+        meta, arrays, decoding = read_glb(source_path, pool, mipmaps=bool(cache_dir))
+        if cache_dir:
+            # Entra na fila depois das decodificações: nunca espera uma que ainda não começou
+            pool.submit(_save_when_decoded, path, key, meta, arrays, decoding)
+    finally:
+        pool.shutdown(wait=False)
+    return meta, arrays, "MISS" if cache_dir else "OFF", decoding
@@ -0,0 +1,49 @@
+from OpenGL.GL import *
+import numpy as np
+
+
+class OffscreenTarget:
+    """ FBO com cor RGBA8 e profundidade, lido de volta como arrays NumPy. """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+        self.color_rbo = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color_rbo)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color_rbo)
+
+        self.depth_rbo = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth_rbo)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth_rbo)
+
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Erro: Framebuffer offscreen não está completo!")
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    def read_color(self):
+        """ Cor do frame como uint8 (altura, largura, 4), primeira linha = topo da imagem. """
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 4)
+        # O OpenGL lê de baixo para cima
+        return np.ascontiguousarray(pixels[::-1])
+
+    def read_depth(self):
+        """ Profundidade do frame como float32 (altura, largura) em [0, 1], topo primeiro. """
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_DEPTH_COMPONENT, GL_FLOAT)
+        depth = np.frombuffer(data, dtype=np.float32).reshape(self.height, self.width)
+        return np.ascontiguousarray(depth[::-1])
+
+    def release(self):
+        glDeleteFramebuffers(1, [self.fbo])
+        glDeleteRenderbuffers(2, [self.color_rbo, self.depth_rbo])
@@ -0,0 +1,216 @@
+import ctypes
+import json
+import time
+from collections import deque
+
+import numpy as np
+from OpenGL.GL import *
+
+import settings
+
+
+class _NullStage:
+    """ Estágio que não mede nada (profiler desligado): só o custo de um `with`. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._begin_stage(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._end_stage(self.name)
+        return False
+
+
+class FrameProfiler:
+    """
+    Mede o tempo de CPU e de GPU de cada estágio do frame.
+
+    O tempo de GPU vem de queries GL_TIME_ELAPSED; o resultado só é lido
+    alguns frames depois, quando já está disponível, então a CPU nunca espera
+    a GPU. Estágios aninhados medem só CPU (queries de tempo não podem se sobrepor).
+    """
+
+    def __init__(self, enabled=None, history=None, gpu=True, latency_frames=None, trace_frames=None):
+        self.enabled = settings.PROFILER_ENABLED if enabled is None else enabled
+        self.history = history or settings.PROFILER_HISTORY
+        self.latency_frames = latency_frames or settings.PROFILER_GPU_LATENCY
+        self.gpu = gpu
+        self.show_overlay = False
+
+        self.cpu_ms = {}  # estágio -> deque com os últimos tempos
+        self.gpu_ms = {}
+        self.stage_order = []
+
+        # Frames com queries ainda não lidas: (número do frame, [(estágio, query, início cpu)])
+        self._pending = deque()
+        self._free_queries = []
+        self._frame_queries = []
+        self._stack = []
+
+        self.frame_index = -1
+        self._frame_start = None
+        self._origin = time.perf_counter()
+
+        # Eventos no formato do Chrome trace (chrome://tracing, Perfetto), por frame
+        self._trace = deque(maxlen=trace_frames or settings.PROFILER_TRACE_FRAMES)
+        self._frame_events = None
+
+    def stage(self, name):
+        """ Context manager que mede um estágio: `with profiler.stage("terreno"): ...` """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._collect_gpu()
+        self.frame_index += 1
+        self._frame_start = time.perf_counter()
+        self._frame_queries = []
+        self._frame_events = []
+        self._trace.append(self._frame_events)
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        end = time.perf_counter()
+        self._record(self.cpu_ms, "frame", (end - self._frame_start) * 1000.0)
+        self._add_event("frame", "cpu", 0, self._frame_start, end - self._frame_start)
+        if self._frame_queries:
+            self._pending.append((self.frame_index, self._frame_queries))
+        self._frame_start = None
+
+    def _begin_stage(self, name):
+        start = time.perf_counter()
+        query = None
+        # Só o estágio de fora usa query (GL_TIME_ELAPSED não aninha); sem frame aberto não há onde guardá-la
+        if self.gpu and not self._stack and self._frame_start is not None \
+                and len(self._pending) < self.latency_frames:
+            query = self._free_queries.pop() if self._free_queries else int(glGenQueries(1)[0])
+            glBeginQuery(GL_TIME_ELAPSED, query)
+        self._stack.append((query, start))
+        if name not in self.stage_order:
+            self.stage_order.append(name)
+
+    def _end_stage(self, name):
+        query, start = self._stack.pop()
+        if query is not None:
+            glEndQuery(GL_TIME_ELAPSED)
+        elapsed = time.perf_counter() - start
+        self._record(self.cpu_ms, name, elapsed * 1000.0)
+        self._add_event(name, "cpu", 1 + len(self._stack), start, elapsed)
+        if query is not None:
+            self._frame_queries.append((name, query, start))
+
+    def _collect_gpu(self):
+        """ Lê as queries dos frames antigos que já terminaram na GPU (sem bloquear). """
+        result = ctypes.c_uint64(0)
+        now = time.perf_counter()
+        while self._pending:
+            frame, queries = self._pending[0]
+            # A última query do frame pronta implica as anteriores prontas
+            if not glGetQueryObjectiv(queries[-1][1], GL_QUERY_RESULT_AVAILABLE):
+                break
+            self._pending.popleft()
+            for name, query, start in queries:
+                glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(result))
+                elapsed = result.value / 1e9
+                self._free_queries.append(query)
+                # Mais longo que o tempo real desde o início do estágio é lixo do driver
+                # (o llvmpipe devolve isso na primeira query)
+                if elapsed > now - start:
+                    continue
+                self._record(self.gpu_ms, name, elapsed * 1000.0)
+                # Sem timestamp da GPU: o evento fica alinhado com o início do estágio na CPU
+                self._add_event(name, "gpu", 100, start, elapsed, frame)
+
+    def _record(self, table, name, value):
+        values = table.get(name)
+        if values is None:
+            values = table[name] = deque(maxlen=self.history)
+        values.append(value)
+
+    def _add_event(self, name, category, tid, start, duration, frame=None):
+        if self._frame_events is None:
+            return
+        self._frame_events.append({
+            "name": name, "cat": category, "ph": "X", "pid": 1, "tid": tid,
+            "ts": (start - self._origin) * 1e6, "dur": duration * 1e6,
+            "args": {"frame": self.frame_index if frame is None else frame},
+        })
+
+    def percentiles(self, name, qs=(50, 95, 99), gpu=False):
+        """ Percentis (ms) da janela recente de um estágio, ou None se ainda não houver amostras. """
+        values = (self.gpu_ms if gpu else self.cpu_ms).get(name)
+        if not values:
+            return None
+        return np.percentile(np.fromiter(values, dtype=np.float64), qs)
+
+    def summary(self):
+        """ Estatísticas por estágio: amostras, média e p50/p95/p99 de CPU e GPU (ms). """
+        result = {}
+        for name in ["frame"] + self.stage_order:
+            entry = {}
+            for kind, table in (("cpu", self.cpu_ms), ("gpu", self.gpu_ms)):
+                values = table.get(name)
+                if not values:
+                    continue
+                arr = np.fromiter(values, dtype=np.float64)
+                p50, p95, p99 = np.percentile(arr, (50, 95, 99))
+                entry[kind] = {"count": len(arr), "mean": float(arr.mean()),
+                               "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+            if entry:
+                result[name] = entry
+        return result
+
+    def export_chrome_trace(self, path):
+        """ Grava os últimos frames no formato de trace do Chrome (abrir em chrome://tracing ou no Perfetto). """
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": label}}
+                  for tid, label in ((0, "Frame"), (1, "CPU"), (2, "CPU (aninhado)"), (100, "GPU"))]
+        for frame_events in self._trace:
+            events.extend(frame_events)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_json(self, path):
+        """ Grava o resumo por estágio em JSON. """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"frames": self.frame_index + 1, "stages": self.summary()}, f, indent=2)
+
+    def draw_overlay(self, text_renderer, shader, x, y, scale=0.5, line_height=20):
+        """ Tabela de p50/p95 por estágio na tela (blend e projeção do HUD já configurados). """
+        if not self.enabled or not self.show_overlay:
+            return
+        lines = ["estagio        cpu p50/p95     gpu p50/p95 (ms)"]
+        for name in ["frame"] + self.stage_order:
+            cpu = self.percentiles(name, (50, 95))
+            if cpu is None:
+                continue
+            gpu = self.percentiles(name, (50, 95), gpu=True)
+            gpu_text = f"{gpu[0]:6.2f}/{gpu[1]:6.2f}" if gpu is not None else "     -/-     "
+            lines.append(f"{name:<14} {cpu[0]:6.2f}/{cpu[1]:6.2f}   {gpu_text}")
+        for i, line in enumerate(lines):
+            text_renderer.render_text(shader, line, x, y - i * line_height, scale, (1.0, 1.0, 0.6))
+
+    def release(self):
+        queries = self._free_queries + [q for _, queries in self._pending for _, q, _ in queries]
+        if queries:
+            glDeleteQueries(len(queries), queries)
+        self._free_queries = []
+        self._pending.clear()
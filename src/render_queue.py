@@ -0,0 +1,54 @@
+import itertools
+
+# Passadas, na ordem em que a fila as desenha
+PASS_SHADOW = 0  # mapa de sombra (FBO da luz)
+PASS_OPAQUE = 1  # geometria com teste de profundidade
+PASS_SKY = 2     # sol e o que mais for desenhado por cima do cenário
+
+
+class RenderQueue:
+    """
+    Draws do frame com chave de ordenação (passada, programa, textura, VAO): a fila
+    executa na ordem da chave, então draws com o mesmo programa e a mesma textura
+    saem juntos e o GLState filtra as ligações repetidas. Empates mantêm a ordem de
+    submissão. Cada draw é uma função que liga o próprio estado e define os próprios
+    uniforms (nada herdado de quem veio antes, já que a ordem muda).
+    """
+
+    def __init__(self):
+        self.items = []
+        self._sequence = itertools.count()
+
+    def submit(self, pass_index, program, texture, vao, draw, stage=None):
+        """ `stage` é o nome do estágio do profiler em que o draw é medido (opcional). """
+        key = (pass_index, program or 0, texture or 0, vao or 0, next(self._sequence))
+        self.items.append((key, draw, stage))
+
+    def flush(self, profiler=None, pass_index=None):
+        """
+        Executa os draws em ordem (só os da passada `pass_index`, se dada) e tira da fila.
+        Draws seguidos com o mesmo `stage` ficam num estágio só do profiler.
+        """
+        if pass_index is None:
+            batch, self.items = self.items, []
+        else:
+            batch = [item for item in self.items if item[0][0] == pass_index]
+            self.items = [item for item in self.items if item[0][0] != pass_index]
+        batch.sort(key=lambda item: item[0])
+
+        current, scope = None, None
+        try:
+            for _, draw, stage in batch:
+                if stage != current:
+                    if scope is not None:
+                        scope.__exit__(None, None, None)
+                        scope = None
+                    current = stage
+                    if stage is not None and profiler is not None:
+                        scope = profiler.stage(stage)
+                        scope.__enter__()
+                draw()
+        finally:
+            if scope is not None:
+                scope.__exit__(None, None, None)
+        return len(batch)
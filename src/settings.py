@@ -20,6 +20,17 @@ CAMERA_SENSITIVITY = 0.1
 
 # Configurações do Terreno
 TERRAIN_SIZE = 300.0 # O PDF pede >= 300m (Regra 1.a)
+TERRAIN_CACHE_DIR = "cache" # Buffers do terreno já gerados (apagar a pasta força regerar)
+TERRAIN_CHUNK_SIZE = 64 # Células por lado de cada chunk
+TERRAIN_LOD_DISTANCES = (40.0, 80.0, 140.0) # Distância (m) em que cada LOD seguinte começa (passo 1, 2, 4, 8)
+
+# Terreno grande em streaming (RAW 16 bits mapeado em memória). None = usa o heightmap.jpg
+TERRAIN_STREAMING_SOURCE = None # ex.: "assets/textures/mundo_16k.raw"
+TERRAIN_STREAMING_SPACING = 1.0 # Metros entre amostras
+TERRAIN_STREAMING_TILE_SIZE = 128 # Células por lado de cada tile
+TERRAIN_STREAMING_RADIUS = 600.0 # Raio (m) em volta da câmera com tiles carregados
+TERRAIN_STREAMING_BUDGET_MB = 256 # Máximo de memória de vértices dos tiles residentes
+TERRAIN_STREAMING_LOADS_PER_FRAME = 4 # Tiles novos por frame (evita travadas)
 
 # Paleta de cores para o céu
 COLOR_DAY = glm.vec3(0.5, 0.7, 1.0) # Azul claro
@@ -32,4 +43,45 @@ COLOR_AMBIENT = glm.vec3(0.1, 0.1, 0.2) # Luz ambiente (não fica preto total à
 
 # Configuraçõs de Sombra
 SHADOW_MAP_WIDTH = 2048
-SHADOW_MAP_HEIGHT = 2048
\ No newline at end of file
+SHADOW_MAP_HEIGHT = 2048
+
+# HUD: strings já tesseladas mantidas no VBO do TextRenderer (relógio, overlay do F3)
+TEXT_CACHE_STRINGS = 256
+
+# Modo headless (sem janela): "egl", "osmesa" ou "glfw" (janela oculta, precisa de display)
+HEADLESS_BACKEND = "egl"
+HEADLESS_OUTPUT = "frame_headless.png" # Frame salvo por `python src/main.py --headless`
+
+# Profiler por estágio do frame (também liga com `--profile`; F3 mostra a tabela na tela)
+PROFILER_ENABLED = False
+PROFILER_HISTORY = 240 # Frames usados nos percentis
+PROFILER_GPU_LATENCY = 4 # Frames com queries de GPU em voo antes de pular a medição
+PROFILER_TRACE_FRAMES = 600 # Frames guardados para o trace
+PROFILER_TRACE_PATH = "profile_trace.json" # Chrome trace (chrome://tracing / Perfetto)
+PROFILER_SUMMARY_PATH = "profile_summary.json"
+
+# Modelos compilados (vértices intercalados, mipmaps e clipes prontos, lidos por mmap)
+MODEL_CACHE_ENABLED = True
+MODEL_CACHE_DIR = "cache/models" # `python compile_assets.py` converte assets/ inteiro em paralelo
+TEXTURE_DECODE_THREADS = 4 # Threads decodificando as imagens de um GLB
+TEXTURE_PBO_RING = 3 # Pixel buffer objects no anel de envio de texturas
+MESH_OPTIMIZE = True # Reordena índices/vértices na compilação (cache pós-transformação, overdraw, fetch)
+MESH_VERTEX_CACHE_SIZE = 16 # Entradas do cache FIFO simulado (ACMR e Tipsify)
+MESH_OVERDRAW_THRESHOLD = 1.05 # ACMR aceito a mais para quebrar clusters menores no overdraw
+
+# Programas GLSL já linkados (glProgramBinary); o driver ou o fonte mudando invalida a entrada
+SHADER_CACHE_ENABLED = True
+SHADER_CACHE_DIR = "cache/shaders"
+
+# Carregamento assíncrono (CPU em threads, envio para a GPU repartido entre frames)
+ASSET_LOADER_THREADS = 2 # Threads lendo/decodificando modelos
+ASSET_UPLOAD_BUDGET_MS = 4.0 # Tempo máximo por frame gasto em envios para a GPU
+
+# Animações assadas em textura (personagens de fundo com skinning só na GPU)
+BAKE_FPS = 30.0 # Amostras por segundo de cada clipe
+
+# Multidão instanciada (cópias do mesmo GLB com clipes assados)
+CROWD_SIZE = 0 # Instâncias espalhadas pelo terreno (0 = desligado)
+CROWD_MODEL = "assets/models/idle.glb"
+CROWD_SCALE = 0.07 # Escala de cada instância
+CROWD_RADIUS_MARGIN = 1.5 # Folga no raio de culling para a pose animada
@@ -1,9 +1,17 @@
 from OpenGL.GL import *
 import ctypes
 import glm
+import numpy as np
+
+import settings
+from frame_constants import FRAME_CONSTANTS_BINDING, FRAME_CONSTANTS_BLOCK
+from gl_state import gl_state
+from shader_cache import load_program_binary, program_cache_key, program_cache_path, save_program_binary
 
 class Shader:
-    def __init__ (self, vertex_path, fragment_path):
+    def __init__ (self, vertex_path, fragment_path, defines=None):
+        # Defines viram `#define NOME VALOR` logo depois do #version (variantes do mesmo fonte)
+        self.defines = dict(defines or {})
 
         # Carregar o código fonte dos shaders
         try:
@@ -15,16 +23,98 @@ class Shader:
             print("Erro: Arquivo de shader não encontrado. {e}")
             raise
 
-        # Compilar os Shaders
-        vertex_shader = self._compile_shader(vertex_source, GL_VERTEX_SHADER)
-        fragment_shader = self._compile_shader(fragment_source, GL_FRAGMENT_SHADER)
-
-        # Linkar shaders em um programa
-        self.program_id = self._link_program(vertex_shader, fragment_shader)
+        vertex_source = self._apply_defines(vertex_source)
+        fragment_source = self._apply_defines(fragment_source)
+
+        # Programa já linkado deste fonte/driver no disco (pula compilação e link)
+        cache_path, cache_key = None, None
+        if settings.SHADER_CACHE_ENABLED and glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0:
+            driver = [glGetString(GL_VENDOR), glGetString(GL_RENDERER), glGetString(GL_VERSION)]
+            cache_key = program_cache_key([vertex_source, fragment_source], self.defines, driver)
+            cache_path = program_cache_path(settings.SHADER_CACHE_DIR, vertex_path, fragment_path, self.defines)
+        self.program_id = self._load_binary(cache_path, cache_key) if cache_path else None
+        self.from_cache = self.program_id is not None
+
+        if self.program_id is None:
+            # Compilar os Shaders
+            vertex_shader = self._compile_shader(vertex_source, GL_VERTEX_SHADER)
+            fragment_shader = self._compile_shader(fragment_source, GL_FRAGMENT_SHADER)
+
+            # Linkar shaders em um programa
+            self.program_id = self._link_program(vertex_shader, fragment_shader, retrievable=cache_path is not None)
+
+            # excluir os shaders individuais, pois já estão no programa
+            glDeleteShader(vertex_shader)
+            glDeleteShader(fragment_shader)
+
+            if cache_path:
+                self._save_binary(cache_path, cache_key)
+
+        # Programas que declaram o bloco de constantes do frame leem do UBO compartilhado
+        block = glGetUniformBlockIndex(self.program_id, FRAME_CONSTANTS_BLOCK)
+        if block != GL_INVALID_INDEX:
+            glUniformBlockBinding(self.program_id, block, FRAME_CONSTANTS_BINDING)
+
+        # Locations resolvidas uma vez aqui: o loop do frame não consulta o GL
+        self._uniform_cache = self._active_uniforms()
+
+        # Último valor enviado por location: uniforms são estado do programa, então
+        # um valor igual ao que já está lá não precisa ir ao GL de novo
+        self._uniform_values = {}
+
+    def _apply_defines(self, source):
+        if not self.defines:
+            return source
+        lines = source.split("\n")
+        # O #version tem que continuar sendo a primeira diretiva
+        at = 1 if lines and lines[0].lstrip().startswith("#version") else 0
+        defines = [f"#define {name} {value}" for name, value in self.defines.items()]
+        return "\n".join(lines[:at] + defines + lines[at:])
+
+    def _load_binary(self, path, key):
+        """Programa a partir do binário em cache, ou None (sem cache ou recusado pelo driver)."""
+        cached = load_program_binary(path, key)
+        if cached is None:
+            return None
+        binary_format, binary = cached
+        program = glCreateProgram()
+        try:
+            glProgramBinary(program, binary_format, np.frombuffer(binary, dtype=np.uint8), len(binary))
+        except GLError as e:
+            # Formato que o driver não aceita mais (GL_INVALID_ENUM)
+            print(f"Binário de shader recusado pelo driver ({e.err}), compilando do fonte: {path}")
+            glDeleteProgram(program)
+            return None
+        if not glGetProgramiv(program, GL_LINK_STATUS):
+            # Driver atualizado sem mudar a string de versão, binário de outra GPU...
+            print(f"Binário de shader recusado pelo driver, compilando do fonte: {path}")
+            glDeleteProgram(program)
+            return None
+        return program
 
-        # excluir os shaders individuais, pois já estão no programa
-        glDeleteShader(vertex_shader)
-        glDeleteShader(fragment_shader)
+    def _save_binary(self, path, key):
+        length = glGetProgramiv(self.program_id, GL_PROGRAM_BINARY_LENGTH)
+        if not length:
+            return
+        binary = np.empty(length, dtype=np.uint8)
+        written, binary_format = GLsizei(0), GLenum(0)
+        glGetProgramBinary(self.program_id, length, ctypes.byref(written), ctypes.byref(binary_format),
+                           binary.ctypes.data_as(ctypes.c_void_p))
+        save_program_binary(path, key, binary_format.value, binary[:written.value].tobytes())
+
+    def _active_uniforms(self):
+        """Nome -> location de todos os uniforms ativos (os de blocos ficam de fora)."""
+        locations = {}
+        for i in range(glGetProgramiv(self.program_id, GL_ACTIVE_UNIFORMS)):
+            name = glGetActiveUniform(self.program_id, i)[0].decode('utf-8')
+            location = glGetUniformLocation(self.program_id, name)
+            if location == -1:
+                continue
+            locations[name] = location
+            # Arrays aparecem como "nome[0]"; o código usa só "nome"
+            if name.endswith("[0]"):
+                locations[name[:-3]] = location
+        return locations
 
     def _compile_shader(self, source, shader_type):
         shader = glCreateShader(shader_type)
@@ -39,10 +129,13 @@ class Shader:
             raise RuntimeError("Falha na compilação do shader.")
         return shader
     
-    def _link_program(self, vertex_shader, fragment_shader):
+    def _link_program(self, vertex_shader, fragment_shader, retrievable=False):
         program = glCreateProgram()
         glAttachShader(program, vertex_shader)
         glAttachShader(program, fragment_shader)
+        if retrievable:
+            # Avisa o driver que o binário vai ser lido depois (glGetProgramBinary)
+            glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
         glLinkProgram(program)
 
         # Verificar erros de linkagem
@@ -54,64 +147,73 @@ class Shader:
         return program
     
     def use(self):
-        """Ativa o programa de shader."""
-        glUseProgram(self.program_id)
+        """Ativa o programa de shader (nada vai ao GL se ele já está em uso)."""
+        gl_state.use_program(self.program_id)
 
     # Funções auxiliares para definir uniformes
 
     def get_uniform_location(self, name):
-        # Cache de localizações (opcional, mas bom para performance)
-        if not hasattr(self, '_uniform_cache'):
-            self._uniform_cache = {}
-        if name not in self._uniform_cache:
-            self._uniform_cache[name] = glGetUniformLocation(self.program_id, name)
-        return self._uniform_cache[name]
+        # Resolvidas no link (_active_uniforms); -1 para nome inativo, como no GL
+        return self._uniform_cache.get(name, -1)
+
+    def _changed(self, location, value):
+        """ True se `value` difere do último enviado para `location` (e guarda o novo). """
+        same = location == -1 or self._uniform_values.get(location) == value
+        gl_state.count("uniform", same)
+        if not same:
+            self._uniform_values[location] = value
+        return not same
 
     def set_uniform_mat4(self, name, matrix):
         """Define um uniform do tipo mat4 (matriz 4x4)."""
         location = self.get_uniform_location(name)
+        if not self._changed(location, glm.mat4(matrix)):
+            return
         # O 'transpose' (GL_FALSE) indica que a matriz está no formato correto (column-major)
         glUniformMatrix4fv(location, 1, GL_FALSE, glm.value_ptr(matrix))
 
     def set_uniform_mat4_array(self, name, matrices):
+        """
+        Define um array de mat4. Aceita um array NumPy (N, 4, 4) já no layout
+        column-major do OpenGL ou uma lista de glm.mat4.
+        """
         # Verifica se a lista não está vazia
-        if not matrices or len(matrices) == 0:
+        if matrices is None or len(matrices) == 0:
             return
 
         # Localiza a variável no shader
-        location = glGetUniformLocation(self.program_id, name)
+        location = self.get_uniform_location(name)
         
         if location != -1:
-            # Prepara os dados para o OpenGL
-            # 1. Converte cada matriz GLM para uma lista plana de floats
-            # 2. Junta tudo num único array numpy gigante
-            import numpy as np # Garanta que numpy está importado no topo
-            
-            # Empilha todas as matrizes e achata para 1D
-            flat_data = np.array([np.array(m) for m in matrices], dtype=np.float32).flatten()
+            if isinstance(matrices, np.ndarray):
+                flat_data = np.ascontiguousarray(matrices, dtype=np.float32)
+            else:
+                # np.array(glm.mat4) sai na convenção matemática (linha-major):
+                # transpõe para o column-major que o OpenGL espera com GL_FALSE
+                flat_data = np.ascontiguousarray(
+                    np.array([np.array(m) for m in matrices], dtype=np.float32).transpose(0, 2, 1))
             
-            # Envia para a GPU
-            # location: onde escrever
-            # len(matrices): quantas matrizes são (count)
-            # GL_FALSE: não transpor (GLM já está correto)
-            # flat_data: os dados em si
+            # Arrays não entram no filtro (comparar custa quase o mesmo que enviar)
+            gl_state.count("uniform", False)
+            self._uniform_values.pop(location, None)
             glUniformMatrix4fv(location, len(matrices), GL_FALSE, flat_data)
 
     def set_uniform_vec3(self, name, vector):
         """Define um uniform do tipo vec3 (vetor 3D)."""
         location = self.get_uniform_location(name)
-        if isinstance(vector, glm.vec3):
-             glUniform3fv(location, 1, glm.value_ptr(vector))
-        else:
-             glUniform3fv(location, 1, vector)
+        vector = glm.vec3(*vector) if not isinstance(vector, glm.vec3) else glm.vec3(vector)
+        if self._changed(location, vector):
+            glUniform3fv(location, 1, glm.value_ptr(vector))
 
     def set_uniform_float(self, name, value):
         """Define um uniform do tipo float."""
         location = self.get_uniform_location(name)
-        glUniform1f(location, value)
+        if self._changed(location, float(value)):
+            glUniform1f(location, value)
 
     def set_uniform_int(self, name, value):
         """Define um uniform do tipo int."""
         location = self.get_uniform_location(name)
-        glUniform1i(location, value)
+        if self._changed(location, int(value)):
+            glUniform1i(location, value)
         
\ No newline at end of file
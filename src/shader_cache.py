@@ -0,0 +1,76 @@
+import hashlib
+import os
+import struct
+import zlib
+
+# Formato do programa em cache (little-endian):
+#   cabeçalho fixo de 64 bytes: magic, versão, chave, formato do binário (do driver), tamanho, crc32
+#   binário do glGetProgramBinary
+# O binário só vale para o mesmo driver: a chave inclui fabricante, renderer e versão do GL.
+CACHE_MAGIC = b"A3PROG\0\0"
+CACHE_VERSION = 1
+_HEADER = struct.Struct("<8sI32sIII")
+_HEADER_SIZE = 64
+
+
+def program_cache_key(sources, defines, driver):
+    """ Hash dos fontes já com os defines, dos próprios defines e da identificação do driver. """
+    h = hashlib.sha256()
+    h.update(struct.pack("<I", CACHE_VERSION))
+    for part in list(sources) + [repr(sorted(defines.items()))] + list(driver):
+        data = part.encode('utf-8') if isinstance(part, str) else bytes(part)
+        # Tamanho antes de cada parte: ("ab", "c") e ("a", "bc") não colidem
+        h.update(struct.pack("<Q", len(data)))
+        h.update(data)
+    return h.digest()
+
+
+def program_cache_path(cache_dir, vertex_path, fragment_path, defines):
+    """ Um arquivo por combinação de shaders e defines (mudar o fonte sobrescreve a entrada). """
+    label = f"{os.path.abspath(vertex_path)}|{os.path.abspath(fragment_path)}|{sorted(defines.items())}"
+    name = hashlib.sha1(label.encode('utf-8')).hexdigest()[:16]
+    base = os.path.splitext(os.path.basename(vertex_path))[0]
+    return os.path.join(cache_dir, f"program_{base}_{name}.bin")
+
+
+def load_program_binary(path, key):
+    """ Retorna (formato, binário) ou None se não existir, for de outro fonte/driver ou estiver corrompido. """
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER_SIZE:
+            raise ValueError("arquivo truncado")
+        magic, version, file_key, binary_format, length, crc = _HEADER.unpack_from(data)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise ValueError("formato desconhecido")
+        if file_key != key:
+            # Fonte, defines ou driver mudaram: recompila e sobrescreve
+            return None
+        binary = data[_HEADER_SIZE:]
+        if len(binary) != length:
+            raise ValueError("tamanho inesperado")
+        if zlib.crc32(binary) != crc:
+            raise ValueError("checksum não confere")
+        return binary_format, binary
+    except (ValueError, OSError, struct.error) as e:
+        print(f"Cache de shader inválido ({e}): {path}")
+        return None
+
+
+def save_program_binary(path, key, binary_format, binary):
+    """ Grava o binário de forma atômica (erros só avisam: o cache é opcional). """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    binary = bytes(binary)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, key, binary_format, len(binary), zlib.crc32(binary))
+            f.write(header.ljust(_HEADER_SIZE, b"\0"))
+            f.write(binary)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Não foi possível gravar o cache de shader: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
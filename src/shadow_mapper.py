@@ -47,7 +47,7 @@ class ShadowMapper:
         glBindFramebuffer(GL_FRAMEBUFFER, self.depth_map_fbo)
         glClear(GL_DEPTH_BUFFER_BIT)
 
-    def unbind(self, win_width, win_height):
-        """Volta para o modo de renderização normal."""
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    def unbind(self, win_width, win_height, target_fbo=0):
+        """Volta para o modo de renderização normal (janela ou FBO offscreen)."""
+        glBindFramebuffer(GL_FRAMEBUFFER, target_fbo)
         glViewport(0, 0, win_width, win_height)
\ No newline at end of file
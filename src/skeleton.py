@@ -0,0 +1,147 @@
+import numpy as np
+
+
+def trs_to_matrices(translations, rotations, scales):
+    """
+    Matrizes locais T * R * S de N nós de uma vez (N, 4, 4), na convenção matemática
+    (ponto como coluna, linha-major no NumPy). Rotações como quaternions (w, x, y, z).
+    """
+    # Componentes contíguos: operar em colunas com passo (m[:, i, j]) custa bem mais no NumPy
+    w, x, y, z = np.ascontiguousarray(np.asarray(rotations).T, dtype=np.float32)
+    sx, sy, sz = np.ascontiguousarray(np.asarray(scales).T, dtype=np.float32)
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+
+    # Monta (linha, coluna, N) e transpõe uma vez só; a escala multiplica as colunas (R * S)
+    m = np.empty((4, 4, len(w)), dtype=np.float32)
+    m[0, 0] = (1.0 - 2.0 * (yy + zz)) * sx
+    m[0, 1] = 2.0 * (xy - wz) * sy
+    m[0, 2] = 2.0 * (xz + wy) * sz
+    m[1, 0] = 2.0 * (xy + wz) * sx
+    m[1, 1] = (1.0 - 2.0 * (xx + zz)) * sy
+    m[1, 2] = 2.0 * (yz - wx) * sz
+    m[2, 0] = 2.0 * (xz - wy) * sx
+    m[2, 1] = 2.0 * (yz + wx) * sy
+    m[2, 2] = (1.0 - 2.0 * (xx + yy)) * sz
+    m[:3, 3] = np.asarray(translations, dtype=np.float32).T
+    m[3, :3] = 0.0
+    m[3, 3] = 1.0
+    return np.ascontiguousarray(m.transpose(2, 0, 1))
+
+
+class Skeleton:
+    """
+    Hierarquia de nós em arrays (structure of arrays), ordenada por profundidade:
+    os pais sempre vêm antes dos filhos e cada nível da árvore é uma fatia contígua,
+    então as matrizes globais saem com uma multiplicação em lote por nível.
+
+    `slot[node_idx]` dá a linha de um nó do glTF nos arrays.
+    """
+
+    def __init__(self, parents, translations, rotations, scales, joints=(), inverse_bind=None):
+        """
+        parents: índice do pai de cada nó do glTF (-1 na raiz), na ordem original.
+        translations/rotations/scales: TRS de repouso na ordem original; rotação em (w, x, y, z).
+        joints: nós do glTF que formam a paleta de ossos; inverse_bind: (J, 4, 4) convenção matemática.
+        """
+        parents = np.asarray(parents, dtype=np.intp)
+        count = len(parents)
+
+        # Profundidade de cada nó (pais já resolvidos antes dos filhos)
+        depth = np.full(count, -1, dtype=np.intp)
+        depth[parents < 0] = 0
+        while (depth < 0).any():
+            pending = np.nonzero(depth < 0)[0]
+            ready = pending[depth[parents[pending]] >= 0]
+            if len(ready) == 0:
+                raise ValueError("Hierarquia de nós com ciclo")
+            depth[ready] = depth[parents[ready]] + 1
+
+        # Ordem estável por profundidade: cada nível vira uma fatia [início, fim)
+        self.order = np.argsort(depth, kind='stable')
+        self.slot = np.empty(count, dtype=np.intp)
+        self.slot[self.order] = np.arange(count)
+        sorted_depth = depth[self.order]
+        self.level_bounds = np.searchsorted(sorted_depth, np.arange(sorted_depth.max() + 2 if count else 1))
+
+        sorted_parents = parents[self.order]
+        self.parents = np.where(sorted_parents >= 0, self.slot[np.maximum(sorted_parents, 0)], -1)
+
+        self.translations = np.ascontiguousarray(np.asarray(translations, dtype=np.float32)[self.order])
+        self.rotations = np.ascontiguousarray(np.asarray(rotations, dtype=np.float32)[self.order])
+        self.scales = np.ascontiguousarray(np.asarray(scales, dtype=np.float32)[self.order])
+
+        # Pose de repouso, para voltar a ela entre clipes que animam nós diferentes
+        self.rest_translations = self.translations.copy()
+        self.rest_rotations = self.rotations.copy()
+        self.rest_scales = self.scales.copy()
+        self.rest_local = trs_to_matrices(self.rest_translations, self.rest_rotations, self.rest_scales)
+
+        self.local = np.zeros((count, 4, 4), dtype=np.float32)
+        self.globals = np.zeros((count, 4, 4), dtype=np.float32)
+
+        self.joint_slots = self.slot[np.asarray(joints, dtype=np.intp)] if len(joints) else np.zeros(0, np.intp)
+        if inverse_bind is None:
+            inverse_bind = np.tile(np.eye(4, dtype=np.float32), (len(self.joint_slots), 1, 1))
+        self.inverse_bind = np.ascontiguousarray(inverse_bind, dtype=np.float32)
+
+        # Paleta final no layout mat3x4: só as 3 primeiras linhas de cada matriz (a última
+        # é sempre 0, 0, 0, 1), atualizada no lugar e enviada direto para o buffer da GPU
+        self.palette = np.zeros((len(self.joint_slots), 3, 4), dtype=np.float32)
+        self.version = 0  # muda a cada update (quem envia a paleta compara com a última enviada)
+        self.update()
+
+    def reset_pose(self):
+        """ Volta todos os nós para a pose de repouso do arquivo. """
+        self.translations[:] = self.rest_translations
+        self.rotations[:] = self.rest_rotations
+        self.scales[:] = self.rest_scales
+
+    def update(self):
+        """ Recalcula locais, globais (nível a nível) e a paleta de ossos. """
+        self.local[:] = trs_to_matrices(self.translations, self.rotations, self.scales)
+
+        bounds = self.level_bounds
+        self.globals[bounds[0]:bounds[1]] = self.local[bounds[0]:bounds[1]]
+        for start, end in zip(bounds[1:-1], bounds[2:]):
+            np.matmul(self.globals[self.parents[start:end]], self.local[start:end], out=self.globals[start:end])
+
+        if len(self.joint_slots):
+            np.matmul(self.globals[self.joint_slots, :3, :], self.inverse_bind, out=self.palette)
+        self.version += 1
+        return self.palette
+
+    def pose_batch(self, translations, rotations, scales, slots=None, out=None):
+        """
+        Paletas de N poses de uma vez (N, ossos, 3, 4): o mesmo cálculo do update, com o
+        eixo das instâncias na frente. Os TRS (N, len(slots), ...) cobrem só as linhas
+        `slots` (None = todos os nós); as demais ficam com a matriz local de repouso.
+        """
+        n = len(translations)
+        animated = trs_to_matrices(translations.reshape(-1, 3), rotations.reshape(-1, 4),
+                                   scales.reshape(-1, 3)).reshape(n, -1, 4, 4)
+
+        # Nós na frente (nós, N, 4, 4): cada nível vira um bloco contíguo de memória
+        if slots is None:
+            local = np.ascontiguousarray(animated.transpose(1, 0, 2, 3))
+        else:
+            local = np.repeat(self.rest_local[:, None], n, axis=1)
+            local[slots] = animated.transpose(1, 0, 2, 3)
+
+        bounds = self.level_bounds
+        globals_ = np.empty_like(local)
+        globals_[bounds[0]:bounds[1]] = local[bounds[0]:bounds[1]]
+        for start, end in zip(bounds[1:-1], bounds[2:]):
+            np.matmul(globals_[self.parents[start:end]], local[start:end], out=globals_[start:end])
+
+        if out is None:
+            out = np.zeros((n, len(self.joint_slots), 3, 4), dtype=np.float32)
+        if len(self.joint_slots):
+            skin = np.matmul(globals_[self.joint_slots, :, :3, :], self.inverse_bind[:, None])
+            out[:] = skin.transpose(1, 0, 2, 3)
+        return out
+
+    def global_matrix(self, node_idx):
+        """ Matriz global (convenção matemática) de um nó do glTF. """
+        return self.globals[self.slot[node_idx]]
@@ -2,7 +2,123 @@ import numpy as np
 from OpenGL.GL import *
 from PIL import Image
 import glm
+import time
 import settings
+from gl_state import gl_state
+from terrain_cache import terrain_cache_key, terrain_cache_path, load_terrain_cache, save_terrain_cache
+from terrain_chunks import TerrainChunks, build_terrain_index_sets, index_set_acmr
+from terrain_raycast import HeightPyramid
+
+
+def load_heightmap(heightmap_path):
+    """ Lê o heightmap em tons de cinza como array uint8 de formato (depth, width). """
+    try:
+        image = Image.open(heightmap_path).convert('L')
+    except Exception as e:
+        print(f"ERRO: Não encontrei {heightmap_path}. Usando plano chato.")
+        image = Image.new('L', (2, 2), color=0)
+    return np.asarray(image, dtype=np.uint8)
+
+
+def build_terrain_mesh(pixels, terrain_size, max_height):
+    """
+    Gera a malha do terreno a partir dos pixels do heightmap, tudo com operações
+    de array (sem laços em Python).
+
+    Retorna (heights, vertex_data, index_data):
+      - heights: alturas float32 (depth, width), linha = Z, coluna = X
+      - vertex_data: float32 intercalado [pos.xyz, normal.xyz] por vértice
+      - index_data: uint32, dois triângulos por célula da grade
+    """
+    heights, vertex_data = build_terrain_vertices(pixels, terrain_size, max_height)
+    depth, width = pixels.shape
+    return heights, vertex_data, build_grid_indices(width, depth)
+
+
+def build_terrain_vertices(pixels, terrain_size, max_height):
+    """ Alturas float32 (depth, width) e vértices intercalados [pos.xyz, normal.xyz]. """
+    depth, width = pixels.shape
+
+    start_x = -terrain_size / 2.0
+    start_z = -terrain_size / 2.0
+    step_x = terrain_size / float(width - 1)
+    step_z = terrain_size / float(depth - 1)
+
+    # Alturas em float64 para as normais saírem iguais às da versão antiga
+    heights = (pixels.astype(np.float64) / 255.0) * max_height
+
+    # Normais por diferença central (bordas repetem o vizinho mais próximo)
+    padded = np.pad(heights, 1, mode='edge')
+    normals = np.empty((depth, width, 3), dtype=np.float32)
+    normals[..., 0] = padded[1:-1, :-2] - padded[1:-1, 2:]  # esquerda - direita
+    normals[..., 1] = 2.0
+    normals[..., 2] = padded[:-2, 1:-1] - padded[2:, 1:-1]  # cima - baixo
+    # Normalização em float32, como o glm.normalize fazia
+    normals *= (np.float32(1.0) / np.sqrt(np.sum(normals * normals, axis=2, dtype=np.float32)))[..., None]
+
+    # Array intercalado [x, y, z, nx, ny, nz]
+    vertex_data = np.empty((depth, width, 6), dtype=np.float32)
+    vertex_data[..., 0] = (start_x + np.arange(width) * step_x)[None, :]
+    vertex_data[..., 1] = heights
+    vertex_data[..., 2] = (start_z + np.arange(depth) * step_z)[:, None]
+    vertex_data[..., 3:6] = normals
+
+    return heights.astype(np.float32), vertex_data.ravel()
+
+
+def build_grid_indices(width, depth):
+    """ Índices da grade inteira em resolução máxima, linha a linha. """
+    # Mesma ordem e mesmo sentido dos triângulos da versão com laços
+    top_left = (np.arange(depth - 1, dtype=np.uint32)[:, None] * width
+                + np.arange(width - 1, dtype=np.uint32)[None, :]).ravel()
+    top_right = top_left + 1
+    bottom_left = top_left + width
+    bottom_right = bottom_left + 1
+    index_data = np.stack([top_left, bottom_left, top_right,
+                           top_right, bottom_left, bottom_right], axis=1).ravel()
+    return index_data
+
+
+def sample_heightfield(grid, start_x, start_z, step_x, step_z, xs, zs, scale=1.0):
+    """
+    Interpolação bilinear vetorizada numa grade de alturas (depth, width).
+    `grid` pode ser qualquer array indexável (inclusive np.memmap de inteiros);
+    os valores são multiplicados por `scale` para virar metros.
+    Retorna (heights float32, normals float32 (..., 3), in_bounds bool).
+    """
+    depth, width = grid.shape
+    xs, zs = np.broadcast_arrays(np.asarray(xs, dtype=np.float64), np.asarray(zs, dtype=np.float64))
+
+    grid_x = (xs - start_x) / step_x
+    grid_z = (zs - start_z) / step_z
+    in_bounds = ((grid_x >= 0.0) & (grid_x <= width - 1) &
+                 (grid_z >= 0.0) & (grid_z <= depth - 1))
+
+    # NaN vira 0 no clip + astype; o ponto já está fora pelo in_bounds
+    grid_x = np.nan_to_num(np.clip(grid_x, 0.0, width - 1.0))
+    grid_z = np.nan_to_num(np.clip(grid_z, 0.0, depth - 1.0))
+    map_j = np.minimum(grid_x.astype(np.intp), width - 2)
+    map_i = np.minimum(grid_z.astype(np.intp), depth - 2)
+    fx = grid_x - map_j
+    fz = grid_z - map_i
+
+    h00 = grid[map_i, map_j].astype(np.float64) * scale
+    h10 = grid[map_i, map_j + 1].astype(np.float64) * scale
+    h01 = grid[map_i + 1, map_j].astype(np.float64) * scale
+    h11 = grid[map_i + 1, map_j + 1].astype(np.float64) * scale
+
+    top = h00 + (h10 - h00) * fx
+    bottom = h01 + (h11 - h01) * fx
+    heights = top + (bottom - top) * fz
+
+    # Gradiente da superfície bilinear -> normal (-dh/dx, 1, -dh/dz)
+    dh_dx = ((h10 - h00) * (1.0 - fz) + (h11 - h01) * fz) / step_x
+    dh_dz = ((h01 - h00) * (1.0 - fx) + (h11 - h10) * fx) / step_z
+    normals = np.stack([-dh_dx, np.ones_like(dh_dx), -dh_dz], axis=-1)
+    normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+
+    return heights.astype(np.float32), normals.astype(np.float32), in_bounds
+
 
 class Terrain:
     def __init__(self, shader):
@@ -10,7 +126,11 @@ class Terrain:
         self.vertex_count = 0
         self.width = 0
         self.depth = 0
-        self.heights = [] # Para física futura
+        self.heights = None # Alturas (depth, width) em float32, usadas pela física
+        self.chunks = None # Divisão em chunks com LOD e culling
+        self._pyramid = None # Pirâmide min/max para raycast (criada no primeiro uso)
+        self.frame_stats = {}
+        self.begin_frame()
         
         # VAO/VBO Handles
         self.vao = glGenVertexArrays(1)
@@ -21,87 +141,54 @@ class Terrain:
         self.generate_terrain("assets/textures/heightmap.jpg")
 
     def generate_terrain(self, heightmap_path):
-        # Carregar imagem
-        try:
-            image = Image.open(heightmap_path).convert('L')
-        except Exception as e:
-            print(f"ERRO: Não encontrei {heightmap_path}. Usando plano chato.")
-            image = Image.new('L', (2, 2), color=0)
-
-        self.width, self.depth = image.size
-        pixels = image.load()
-        
-        self.heights = [[0.0 for _ in range(self.depth)] for _ in range(self.width)]
-        
-        # Listas para armazenar dados ---
-        vertices_pos = [] # Armazena Posições (temporário)
-        normals = []      # Armazena Normais (temporário)
-        indices = []      # Armazena Índices
-        
-        # Array final que será enviado à GPU
-        interleaved_data = [] 
+        start = time.perf_counter()
 
-        start_x = -settings.TERRAIN_SIZE / 2.0
-        start_z = -settings.TERRAIN_SIZE / 2.0
-        step_x = settings.TERRAIN_SIZE / float(self.width - 1)
-        step_z = settings.TERRAIN_SIZE / float(self.depth - 1)
+        # Tentar o cache em disco (chave = conteúdo do heightmap + configurações)
+        lod_levels = len(settings.TERRAIN_LOD_DISTANCES) + 1
+        key = terrain_cache_key(heightmap_path, settings.TERRAIN_SIZE, settings.MAX_TERRAIN_HEIGHT,
+                                settings.TERRAIN_CHUNK_SIZE, lod_levels)
+        cache_path = terrain_cache_path(settings.TERRAIN_CACHE_DIR, key) if key else None
+        cached = load_terrain_cache(cache_path, key) if cache_path else None
 
-        print("Gerando terreno (Posições e Alturas)... aguarde.")
-        
-        # Gerar Posições de Vértices e armazenar alturas
-        for i in range(self.depth):     # Z
-            for j in range(self.width): # X
-                x = start_x + (j * step_x)
-                z = start_z + (i * step_z)
-                y = (pixels[j, i] / 255.0) * settings.MAX_TERRAIN_HEIGHT
-                
-                self.heights[j][i] = y
-                vertices_pos.append(glm.vec3(x, y, z)) # Adiciona Posição
-
-        print("Calculando Normais...")
-        
-        # Helper para pegar altura de forma segura
-        def get_height_safe(j, i):
-            j_safe = max(0, min(j, self.width - 1))
-            i_safe = max(0, min(i, self.depth - 1))
-            return self.heights[j_safe][i_safe]
-
-        for i in range(self.depth):
-            for j in range(self.width):
-                height_l = get_height_safe(j - 1, i)
-                height_r = get_height_safe(j + 1, i)
-                height_t = get_height_safe(j, i - 1)
-                height_b = get_height_safe(j, i + 1)
-                
-                normal = glm.vec3(height_l - height_r, 2.0, height_t - height_b)
-                normals.append(glm.normalize(normal)) # Adiciona Normal
-
-        # Gerar Índices
-        for i in range(self.depth - 1):
-            for j in range(self.width - 1):
-                top_left = (i * self.width) + j
-                top_right = top_left + 1
-                bottom_left = ((i + 1) * self.width) + j
-                bottom_right = bottom_left + 1
-                indices.extend([top_left, bottom_left, top_right])
-                indices.extend([top_right, bottom_left, bottom_right])
-
-        self.indices_count = len(indices)
-
-        # Combinar Posições e Normais no array final
-        # Verifique se os vértices foram realmente gerados
-        if not vertices_pos or not normals:
-             print("ERRO: Vértices ou normais não foram gerados.")
-             return # Impede de continuar com 0 vértices
-
-        for i in range(len(vertices_pos)):
-            interleaved_data.extend([vertices_pos[i].x, vertices_pos[i].y, vertices_pos[i].z])
-            interleaved_data.extend([normals[i].x, normals[i].y, normals[i].z])
-            
-        # Enviar para GPU
-        vertex_data_np = np.array(interleaved_data, dtype=np.float32)
-        index_data_np = np.array(indices, dtype=np.uint32)
+        if cached is not None:
+            # Arrays mapeados direto do arquivo, vão para o glBufferData sem cópia
+            self.heights, vertex_data_np, index_data_np, index_table = cached
+            cache_status = "HIT"
+        else:
+            # Carregar imagem
+            pixels = load_heightmap(heightmap_path)
+
+            print("Gerando terreno (Posições, Normais e Índices)...")
+            self.heights, vertex_data_np = build_terrain_vertices(
+                pixels, settings.TERRAIN_SIZE, settings.MAX_TERRAIN_HEIGHT)
+            depth, width = pixels.shape
+            cache_size = settings.MESH_VERTEX_CACHE_SIZE if settings.MESH_OPTIMIZE else None
+            index_data_np, index_table = build_terrain_index_sets(
+                width, depth, settings.TERRAIN_CHUNK_SIZE, lod_levels, cache_size)
+            if cache_size:
+                # Referência em ordem de linhas só para o relatório (o cache guarda a reordenada)
+                plain, _ = build_terrain_index_sets(width, depth, settings.TERRAIN_CHUNK_SIZE, lod_levels)
+                print(f"Índices do terreno: ACMR {index_set_acmr(plain, index_table, cache_size):.3f} -> "
+                      f"{index_set_acmr(index_data_np, index_table, cache_size):.3f}")
 
+            if cache_path:
+                save_terrain_cache(cache_path, key, self.heights, vertex_data_np, index_data_np, index_table)
+            cache_status = "MISS"
+
+        self.heights = np.ascontiguousarray(self.heights, dtype=np.float32)
+        self.depth, self.width = self.heights.shape
+
+        # Geometria da grade no mundo (usada pelas consultas de altura)
+        self.start_x = -settings.TERRAIN_SIZE / 2.0
+        self.start_z = -settings.TERRAIN_SIZE / 2.0
+        self.step_x = settings.TERRAIN_SIZE / float(self.width - 1)
+        self.step_z = settings.TERRAIN_SIZE / float(self.depth - 1)
+
+        self.chunks = TerrainChunks(self.heights, self.start_x, self.start_z,
+                                    self.step_x, self.step_z, settings.TERRAIN_CHUNK_SIZE,
+                                    settings.TERRAIN_LOD_DISTANCES, index_table)
+
+        # Enviar para GPU
         glBindVertexArray(self.vao)
 
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
@@ -122,10 +209,27 @@ class Terrain:
 
         glBindVertexArray(0)
         
-        print(f"Terreno gerado com {len(vertices_pos)} vértices.")
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        print(f"Terreno gerado com {self.width * self.depth} vértices em "
+              f"{self.chunks.rows * self.chunks.cols} chunks (cache {cache_status}, {elapsed_ms:.0f} ms).")
+
+    def begin_frame(self):
+        """ Zera as estatísticas do frame (chamar uma vez no início de cada frame). """
+        self.frame_stats = {'passes': 0, 'chunks_drawn': 0, 'chunks_culled': 0,
+                            'triangles': 0, 'triangles_full': 0}
+
+    def get_frame_stats(self):
+        """ Estatísticas acumuladas desde o último begin_frame (todas as passadas somadas). """
+        return dict(self.frame_stats)
 
     # Atualizado para suportar shader de sombra (Shadow Mapping)
-    def draw(self, camera, projection, sun_direction, override_shader=None):
+    def draw(self, camera, projection, override_shader=None, view_projection=None):
+        """
+        Desenha os chunks visíveis. O culling usa `view_projection` (na passada de
+        sombra, a matriz da luz); no render normal ela é montada da câmera se faltar.
+        O LOD é sempre escolhido pela distância até a câmera. Câmera, sol e luz vêm
+        do bloco FrameConstants (já enviado no frame).
+        """
         # Se passarmos um shader específico (sombra), usamos ele. Senão, usa o padrão.
         shader_to_use = override_shader if override_shader else self.shader
         shader_to_use.use()
@@ -133,34 +237,71 @@ class Terrain:
         # Configurar matrizes básicas (Model é sempre necessário)
         shader_to_use.set_uniform_mat4("model", glm.mat4(1.0))
         
-        # Se NÃO for o shader de sombra (é o render normal), mandamos os dados completos
-        if override_shader is None:
-            shader_to_use.set_uniform_mat4("view", camera.get_view_matrix())
-            shader_to_use.set_uniform_mat4("projection", projection)
-            shader_to_use.set_uniform_vec3("u_sun_direction", sun_direction)
-            shader_to_use.set_uniform_vec3("u_sun_color", settings.COLOR_SUN)
-            shader_to_use.set_uniform_vec3("u_ambient_color", settings.COLOR_AMBIENT)
-        
-        # Desenhar
-        glBindVertexArray(self.vao)
-        glDrawElements(GL_TRIANGLES, self.indices_count, GL_UNSIGNED_INT, None)
-        glBindVertexArray(0)
+        # No render normal o culling usa o frustum da câmera
+        if view_projection is None:
+            view_projection = projection * camera.get_view_matrix()
+
+        counts, offsets, base_vertices = self.chunks.select(camera.pos, view_projection)
+
+        stats = self.frame_stats
+        stats['passes'] += 1
+        stats['chunks_drawn'] += len(counts)
+        stats['chunks_culled'] += self.chunks.rows * self.chunks.cols - len(counts)
+        stats['triangles'] += int(counts.sum()) // 3
+        stats['triangles_full'] += self.chunks.full_triangles
+
+        # Desenhar todos os chunks numa chamada só
+        if len(counts) > 0:
+            gl_state.bind_vertex_array(self.vao)
+            glMultiDrawElementsBaseVertex(GL_TRIANGLES, counts, GL_UNSIGNED_INT, offsets,
+                                          len(counts), base_vertices)
 
     def get_height(self, world_x, world_z):
-        """ Converte coordenadas do mundo em altura do terreno. """
+        """ Converte coordenadas do mundo em altura do terreno (interpolação bilinear). """
+
+        # Converter coordenada do mundo (ex: -150 a +150) para posição contínua na grade
+        grid_x = (world_x - self.start_x) / self.step_x
+        grid_z = (world_z - self.start_z) / self.step_z
 
-        # Converter coordenada do mundo (ex: -150 a +150) para 0.0-1.0
-        percent_x = (world_x + (settings.TERRAIN_SIZE / 2.0)) / settings.TERRAIN_SIZE
-        percent_z = (world_z + (settings.TERRAIN_SIZE / 2.0)) / settings.TERRAIN_SIZE
+        # Verificar limites (fora do mapa vale a altura da borda)
+        grid_x = max(0.0, min(self.width - 1.0, grid_x))
+        grid_z = max(0.0, min(self.depth - 1.0, grid_z))
 
-        # Converter 0.0-1.0 para índice do array (ex: 0 a 1023)
-        map_j = int(percent_x * (self.width - 1)) # Coluna
-        map_i = int(percent_z * (self.depth - 1)) # Linha
+        map_j = min(int(grid_x), self.width - 2) # Coluna
+        map_i = min(int(grid_z), self.depth - 2) # Linha
+        fx = grid_x - map_j
+        fz = grid_z - map_i
 
-        # Verificar limites
-        map_j = max(0, min(self.width - 2, map_j))
-        map_i = max(0, min(self.depth - 2, map_i))
+        h = self.heights
+        top = float(h[map_i, map_j]) * (1.0 - fx) + float(h[map_i, map_j + 1]) * fx
+        bottom = float(h[map_i + 1, map_j]) * (1.0 - fx) + float(h[map_i + 1, map_j + 1]) * fx
 
-        # Retornar altura armazenada
+        # Retornar altura interpolada
         # (Adicionamos um 'buffer' de 0.2m para evitar que a câmera entre no chão)
-        return self.heights[map_j][map_i] + 0.2
\ No newline at end of file
+        return top * (1.0 - fz) + bottom * fz + 0.2
+
+    def get_heights(self, xs, zs):
+        """
+        Consulta em lote: recebe arrays de X e Z no mundo (mesmo formato ou
+        broadcast) e devolve (heights, normals, in_bounds):
+          - heights: altura bilinear da superfície (sem o buffer da câmera)
+          - normals: normal da superfície bilinear no ponto, formato (..., 3)
+          - in_bounds: False para pontos fora do terreno (valores da borda)
+        """
+        return sample_heightfield(self.heights, self.start_x, self.start_z,
+                                  self.step_x, self.step_z, xs, zs)
+
+    @property
+    def pyramid(self):
+        """ Pirâmide min/max das alturas, construída na primeira consulta de raio. """
+        if self._pyramid is None:
+            self._pyramid = HeightPyramid(self.heights, self.start_x, self.start_z, self.step_x, self.step_z)
+        return self._pyramid
+
+    def raycast(self, origin, direction, max_distance=np.inf):
+        """ Raio contra a malha do terreno. Retorna {'point', 'distance', 'cell'} ou None. """
+        return self.pyramid.raycast(origin, direction, max_distance)
+
+    def raycast_batch(self, origins, directions, max_distance=np.inf):
+        """ N raios de uma vez (arrays (N, 3)). Retorna (hit, points, distances, cells). """
+        return self.pyramid.raycast_batch(origins, directions, max_distance)
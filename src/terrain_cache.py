@@ -0,0 +1,148 @@
+import hashlib
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from mesh_optimizer import optimizer_settings_key
+
+# Formato do arquivo de cache (tudo little-endian):
+#   cabeçalho fixo de 128 bytes
+#   heights   float32 (depth, width)
+#   vertices  float32 intercalado [pos.xyz, normal.xyz]
+#   indices   uint32 (conjuntos de LOD de todos os chunks)
+#   tabela    int64 (K, 6) = formato, LOD, máscara de bordas, início e tamanho de cada conjunto
+# Cada seção começa alinhada em 64 bytes para poder ser mapeada direto (np.memmap).
+CACHE_MAGIC = b"A3TERR\0\0"
+CACHE_VERSION = 3
+_HEADER = struct.Struct("<8sI32sIIQQQI")
+_HEADER_SIZE = 128
+_ALIGN = 64
+
+
+def _align(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _layout(width, depth, vertex_floats, index_count, table_rows):
+    """ Calcula (offset, tamanho em bytes) de cada seção do arquivo. """
+    heights_off = _HEADER_SIZE
+    heights_len = width * depth * 4
+    vertices_off = _align(heights_off + heights_len)
+    vertices_len = vertex_floats * 4
+    indices_off = _align(vertices_off + vertices_len)
+    indices_len = index_count * 4
+    table_off = _align(indices_off + indices_len)
+    table_len = table_rows * 6 * 8
+    return [(heights_off, heights_len), (vertices_off, vertices_len),
+            (indices_off, indices_len), (table_off, table_len)]
+
+
+def terrain_cache_key(heightmap_path, terrain_size, max_height, chunk_size, lod_levels):
+    """
+    Hash do conteúdo do heightmap + parâmetros que mudam a malha (inclusive o
+    otimizador). None se o arquivo não existir.
+    """
+    try:
+        with open(heightmap_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    h = hashlib.sha256()
+    h.update(data)
+    h.update(struct.pack("<IddII", CACHE_VERSION, float(terrain_size), float(max_height),
+                         int(chunk_size), int(lod_levels)))
+    h.update(optimizer_settings_key())
+    return h.digest()
+
+
+def terrain_cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"terrain_{key.hex()[:16]}.bin")
+
+
+def load_terrain_cache(path, key):
+    """
+    Abre o cache mapeado em memória, sem copiar os dados.
+    Retorna (heights, vertex_data, index_data, index_table) ou None se não existir, estiver velho ou corrompido.
+    """
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        mm = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(mm) < _HEADER_SIZE:
+            raise ValueError("arquivo truncado")
+
+        magic, version, file_key, width, depth, vertex_floats, index_count, table_rows, crc = \
+            _HEADER.unpack_from(mm[:_HEADER.size].tobytes())
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise ValueError("formato desconhecido")
+        if file_key != key:
+            print(f"Cache de terreno desatualizado: {path}")
+            return None
+
+        sections = _layout(width, depth, vertex_floats, index_count, table_rows)
+        end = sections[-1][0] + sections[-1][1]
+        if len(mm) != end:
+            raise ValueError("tamanho inesperado")
+
+        payload_crc = 0
+        for off, length in sections:
+            payload_crc = zlib.crc32(mm[off:off + length], payload_crc)
+        if payload_crc != crc:
+            raise ValueError("checksum não confere")
+
+        (h_off, _), (v_off, _), (i_off, _), (t_off, _) = sections
+        heights = np.frombuffer(mm, dtype=np.float32, count=width * depth, offset=h_off).reshape(depth, width)
+        vertex_data = np.frombuffer(mm, dtype=np.float32, count=vertex_floats, offset=v_off)
+        index_data = np.frombuffer(mm, dtype=np.uint32, count=index_count, offset=i_off)
+        index_table = np.frombuffer(mm, dtype=np.int64, count=table_rows * 6, offset=t_off).reshape(-1, 6)
+        return heights, vertex_data, index_data, index_table
+    except (ValueError, OSError, struct.error) as e:
+        print(f"Cache de terreno inválido ({e}): {path}")
+        return None
+
+
+def save_terrain_cache(path, key, heights, vertex_data, index_data, index_table):
+    """ Grava o cache de forma atômica e apaga entradas antigas do mesmo diretório. """
+    cache_dir = os.path.dirname(path) or "."
+    os.makedirs(cache_dir, exist_ok=True)
+
+    heights = np.ascontiguousarray(heights, dtype=np.float32)
+    vertex_data = np.ascontiguousarray(vertex_data, dtype=np.float32)
+    index_data = np.ascontiguousarray(index_data, dtype=np.uint32)
+    index_table = np.ascontiguousarray(index_table, dtype=np.int64)
+    depth, width = heights.shape
+
+    sections = _layout(width, depth, len(vertex_data), len(index_data), len(index_table))
+    arrays = [heights, vertex_data, index_data, index_table]
+
+    crc = 0
+    for arr in arrays:
+        crc = zlib.crc32(arr, crc)
+
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, key, width, depth,
+                                  len(vertex_data), len(index_data), len(index_table), crc)
+            f.write(header.ljust(_HEADER_SIZE, b"\0"))
+            for (off, _), arr in zip(sections, arrays):
+                f.write(b"\0" * (off - f.tell()))
+                f.write(memoryview(arr))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Não foi possível gravar o cache de terreno: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+
+    # Entradas de heightmaps/configurações antigas nunca mais serão lidas
+    name = os.path.basename(path)
+    for other in os.listdir(cache_dir):
+        if other.startswith("terrain_") and other.endswith(".bin") and other != name:
+            try:
+                os.remove(os.path.join(cache_dir, other))
+            except OSError:
+                pass
@@ -0,0 +1,218 @@
+import numpy as np
+
+from mesh_optimizer import cache_misses, optimize_vertex_cache
+
+# Bits da máscara de bordas: o vizinho daquele lado usa um LOD mais grosso
+EDGE_NORTH = 1  # z = 0 do chunk
+EDGE_SOUTH = 2  # z = nz
+EDGE_WEST = 4   # x = 0
+EDGE_EAST = 8   # x = nx
+EDGE_MASKS = 16
+
+
+def chunk_spans(quads, chunk_size):
+    """ Divide um eixo de `quads` células em (início, tamanho). Sobra pequena vai para o último chunk. """
+    spans = [(s, min(chunk_size, quads - s)) for s in range(0, quads, chunk_size)]
+    if len(spans) > 1 and spans[-1][1] < chunk_size // 2:
+        last_start, last_len = spans.pop()
+        prev_start, prev_len = spans.pop()
+        spans.append((prev_start, prev_len + last_len))
+    return spans
+
+
+def lod_samples(n, step):
+    """ Posições amostradas em um eixo de n células com passo `step` (a borda n sempre entra). """
+    return np.append(np.arange(0, n, step), n)
+
+
+def build_chunk_indices(nx, nz, row_stride, level, mask):
+    """
+    Índices locais de um chunk (nx x nz células) no LOD `level` (passo 2^level).
+
+    Índice local = z * row_stride + x, para ser desenhado com base vertex apontando
+    para o canto do chunk no buffer de vértices da grade inteira.
+    Nas bordas marcadas em `mask` os vértices que não existem no LOD seguinte são
+    colapsados num vértice vizinho do LOD grosso, então a borda bate com a do chunk vizinho
+    (sem rachaduras). Os triângulos degenerados resultantes são descartados.
+    """
+    step = 1 << level
+    xs = lod_samples(nx, step)
+    zs = lod_samples(nz, step)
+
+    grid_x = np.tile(xs, (len(zs), 1))
+    grid_z = np.tile(zs[:, None], (1, len(xs)))
+
+    def snap_down(positions, n):
+        coarse = lod_samples(n, step * 2)
+        return coarse[np.searchsorted(coarse, positions, side='right') - 1]
+
+    def snap_up(positions, n):
+        coarse = lod_samples(n, step * 2)
+        return coarse[np.searchsorted(coarse, positions, side='left')]
+
+    # Norte/oeste colapsam para o início e sul/leste para o fim: assim, nos cantos
+    # cortados pela diagonal dos quads, os dois colapsos vão para o mesmo vértice
+    # e nunca sobram triângulos com os três vértices alinhados.
+    if mask & EDGE_NORTH: grid_x[0] = snap_down(xs, nx)
+    if mask & EDGE_SOUTH: grid_x[-1] = snap_up(xs, nx)
+    if mask & EDGE_WEST: grid_z[:, 0] = snap_down(zs, nz)
+    if mask & EDGE_EAST: grid_z[:, -1] = snap_up(zs, nz)
+
+    grid = grid_z * row_stride + grid_x
+    top_left = grid[:-1, :-1]
+    top_right = grid[:-1, 1:]
+    bottom_left = grid[1:, :-1]
+    bottom_right = grid[1:, 1:]
+    # Mesmo sentido dos triângulos da malha completa
+    tris = np.stack([top_left, bottom_left, top_right,
+                     top_right, bottom_left, bottom_right], axis=-1).reshape(-1, 3)
+
+    keep = (tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 0] != tris[:, 2])
+    return tris[keep].ravel().astype(np.uint32)
+
+
+def build_lod_index_sets(shapes, row_stride, lod_levels, cache_size=None):
+    """
+    Gera todos os conjuntos de índices (formato de chunk x LOD x máscara de bordas)
+    num único buffer. Retorna (index_data uint32, table int64 [K, 6]).
+    Com `cache_size` cada conjunto sai reordenado para o cache de vértices (a grade em
+    linhas inteiras não reaproveita quase nada quando o chunk é mais largo que o cache).
+    """
+    parts = []
+    rows = []
+    first = 0
+    for nx, nz in shapes:
+        for level in range(lod_levels):
+            # No LOD mais grosso nenhum vizinho pode ser ainda mais grosso
+            masks = range(EDGE_MASKS) if level < lod_levels - 1 else [0]
+            for mask in masks:
+                indices = build_chunk_indices(nx, nz, row_stride, level, mask)
+                if cache_size:
+                    indices, _ = optimize_vertex_cache(indices, cache_size)
+                parts.append(indices)
+                rows.append((nx, nz, level, mask, first, len(indices)))
+                first += len(indices)
+    index_data = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint32)
+    return index_data, np.array(rows, dtype=np.int64).reshape(-1, 6)
+
+
+def build_terrain_index_sets(width, depth, chunk_size, lod_levels, cache_size=None):
+    """ Conjuntos de índices de LOD para todos os formatos de chunk de uma grade width x depth. """
+    shapes = sorted({(nx, nz) for _, nx in chunk_spans(width - 1, chunk_size)
+                     for _, nz in chunk_spans(depth - 1, chunk_size)})
+    return build_lod_index_sets(shapes, width, lod_levels, cache_size)
+
+
+def index_set_acmr(index_data, table, cache_size=None):
+    """ ACMR médio dos conjuntos de índices (cada um começa com o cache frio, como num draw). """
+    misses = sum(int(cache_misses(index_data[first:first + count], cache_size).sum())
+                 for first, count in table[:, 4:6])
+    return misses / max(len(index_data) // 3, 1)
+
+
+def frustum_planes(view_projection):
+    """ Extrai os 6 planos (a, b, c, d) do frustum de uma matriz view-projection (Gribb/Hartmann). """
+    m = np.array(view_projection, dtype=np.float64)
+    planes = np.array([m[3] + m[0], m[3] - m[0],   # esquerda, direita
+                       m[3] + m[1], m[3] - m[1],   # baixo, cima
+                       m[3] + m[2], m[3] - m[2]])  # perto, longe
+    planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+    return planes
+
+
+def aabbs_in_frustum(planes, aabb_min, aabb_max):
+    """ Máscara das caixas que tocam o frustum (teste do vértice positivo, todas de uma vez). """
+    normals = planes[:, :3]
+    positive = np.where(normals[None, :, :] >= 0.0, aabb_max[:, None, :], aabb_min[:, None, :])
+    dist = np.einsum('cpk,pk->cp', positive, normals) + planes[:, 3]
+    return np.all(dist >= 0.0, axis=1)
+
+
+class TerrainChunks:
+    """
+    Divide a grade do terreno em chunks de tamanho fixo e escolhe, a cada passada,
+    quais desenhar (frustum culling) e em que LOD (pela distância da câmera).
+    """
+
+    def __init__(self, heights, start_x, start_z, step_x, step_z,
+                 chunk_size, lod_distances, index_table):
+        depth, width = heights.shape
+        self.lod_distances = np.asarray(lod_distances, dtype=np.float64)
+        self.lod_levels = len(self.lod_distances) + 1
+
+        spans_x = chunk_spans(width - 1, chunk_size)
+        spans_z = chunk_spans(depth - 1, chunk_size)
+        self.rows = len(spans_z)
+        self.cols = len(spans_x)
+
+        count = self.rows * self.cols
+        self.aabb_min = np.empty((count, 3), dtype=np.float64)
+        self.aabb_max = np.empty((count, 3), dtype=np.float64)
+        self.base_vertex = np.empty(count, dtype=np.int32)
+        self.shape_id = np.empty(count, dtype=np.int64)
+
+        shapes = {}
+        for r, (z0, nz) in enumerate(spans_z):
+            for c, (x0, nx) in enumerate(spans_x):
+                k = r * self.cols + c
+                block = heights[z0:z0 + nz + 1, x0:x0 + nx + 1]
+                self.aabb_min[k] = (start_x + x0 * step_x, float(block.min()), start_z + z0 * step_z)
+                self.aabb_max[k] = (start_x + (x0 + nx) * step_x, float(block.max()), start_z + (z0 + nz) * step_z)
+                self.base_vertex[k] = z0 * width + x0
+                self.shape_id[k] = shapes.setdefault((nx, nz), len(shapes))
+        self.shapes = list(shapes)
+
+        # Tabela (formato, LOD, máscara) -> (primeiro índice, quantidade)
+        self.lod_first = np.zeros((len(self.shapes), self.lod_levels, EDGE_MASKS), dtype=np.int64)
+        self.lod_count = np.zeros_like(self.lod_first)
+        for nx, nz, level, mask, first, n in index_table:
+            shape = shapes.get((int(nx), int(nz)))
+            if shape is None or level >= self.lod_levels:
+                continue
+            masks = [mask] if level < self.lod_levels - 1 else range(EDGE_MASKS)
+            for m in masks:
+                self.lod_first[shape, level, m] = first
+                self.lod_count[shape, level, m] = n
+
+        # Triângulos no LOD 0 sem culling (referência para as estatísticas)
+        self.full_triangles = int(self.lod_count[self.shape_id, 0, 0].sum() // 3)
+
+    def select_levels(self, camera_pos):
+        """ LOD de cada chunk pela distância até a caixa, com vizinhos diferindo no máximo 1 nível. """
+        p = np.asarray(camera_pos, dtype=np.float64)
+        closest = np.clip(p, self.aabb_min, self.aabb_max)
+        dist = np.linalg.norm(closest - p, axis=1)
+        levels = np.searchsorted(self.lod_distances, dist, side='right').reshape(self.rows, self.cols)
+
+        for _ in range(self.lod_levels):
+            relaxed = levels.copy()
+            np.minimum(relaxed[1:, :], levels[:-1, :] + 1, out=relaxed[1:, :])
+            np.minimum(relaxed[:-1, :], levels[1:, :] + 1, out=relaxed[:-1, :])
+            np.minimum(relaxed[:, 1:], levels[:, :-1] + 1, out=relaxed[:, 1:])
+            np.minimum(relaxed[:, :-1], levels[:, 1:] + 1, out=relaxed[:, :-1])
+            if np.array_equal(relaxed, levels):
+                break
+            levels = relaxed
+
+        mask = np.zeros_like(levels)
+        mask[1:, :] |= np.where(levels[:-1, :] > levels[1:, :], EDGE_NORTH, 0)
+        mask[:-1, :] |= np.where(levels[1:, :] > levels[:-1, :], EDGE_SOUTH, 0)
+        mask[:, 1:] |= np.where(levels[:, :-1] > levels[:, 1:], EDGE_WEST, 0)
+        mask[:, :-1] |= np.where(levels[:, 1:] > levels[:, :-1], EDGE_EAST, 0)
+        return levels.ravel(), mask.ravel()
+
+    def select(self, camera_pos, view_projection=None):
+        """
+        Retorna (counts, byte_offsets, base_vertices) dos chunks visíveis, prontos
+        para glMultiDrawElementsBaseVertex. Sem view_projection não há culling.
+        """
+        levels, masks = self.select_levels(camera_pos)
+        if view_projection is not None:
+            visible = aabbs_in_frustum(frustum_planes(view_projection), self.aabb_min, self.aabb_max)
+        else:
+            visible = np.ones(len(levels), dtype=bool)
+
+        shape = self.shape_id[visible]
+        counts = self.lod_count[shape, levels[visible], masks[visible]].astype(np.int32)
+        offsets = (self.lod_first[shape, levels[visible], masks[visible]] * 4).astype(np.uintp)
+        return counts, offsets, self.base_vertex[visible]
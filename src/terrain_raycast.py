@@ -0,0 +1,197 @@
+import numpy as np
+
+# Folga numérica (em unidades da grade) para não ficar preso exatamente numa borda de célula
+_EPS = 1e-6
+
+
+class HeightPyramid:
+    """
+    Pirâmide min/max das alturas do terreno para lançar raios contra o heightfield.
+
+    O nível 0 tem uma célula por quad da grade (mínimo e máximo dos 4 cantos);
+    cada nível seguinte junta blocos 2x2 do anterior. Um raio que passa acima do
+    máximo de uma célula grande pula a célula inteira; só nas células do nível 0
+    os dois triângulos da malha são testados de verdade.
+    """
+
+    def __init__(self, heights, start_x, start_z, step_x, step_z):
+        self.heights = np.ascontiguousarray(heights, dtype=np.float32)
+        self.depth, self.width = self.heights.shape
+        self.start_x = start_x
+        self.start_z = start_z
+        self.step_x = step_x
+        self.step_z = step_z
+
+        h = self.heights
+        corners = np.stack([h[:-1, :-1], h[:-1, 1:], h[1:, :-1], h[1:, 1:]])
+        max_levels = [corners.max(axis=0)]
+        min_levels = [corners.min(axis=0)]
+        while max(max_levels[-1].shape) > 1:
+            max_levels.append(self._reduce(max_levels[-1], np.maximum, -np.inf))
+            min_levels.append(self._reduce(min_levels[-1], np.minimum, np.inf))
+        self.max_levels = max_levels
+        self.min_levels = min_levels
+        self.top_level = len(max_levels) - 1
+
+        # Todos os níveis de máximos num array só, para buscar células de níveis diferentes de uma vez
+        self._level_rows = np.array([m.shape[0] for m in max_levels], dtype=np.intp)
+        self._level_cols = np.array([m.shape[1] for m in max_levels], dtype=np.intp)
+        self._level_offset = np.concatenate([[0], np.cumsum(self._level_rows * self._level_cols)[:-1]])
+        self._flat_max = np.concatenate([m.ravel() for m in max_levels])
+
+    @staticmethod
+    def _reduce(level, op, pad_value):
+        rows, cols = level.shape
+        padded = np.full((rows + rows % 2, cols + cols % 2), pad_value, dtype=level.dtype)
+        padded[:rows, :cols] = level
+        return op(op(padded[0::2, 0::2], padded[0::2, 1::2]), op(padded[1::2, 0::2], padded[1::2, 1::2]))
+
+    def raycast_batch(self, origins, directions, max_distance=np.inf):
+        """
+        Lança N raios (origens e direções no mundo, formato (N, 3)).
+        Retorna (hit, points, distances, cells):
+          - hit: bool (N,)
+          - points: ponto de impacto no mundo (N, 3), NaN quando não acerta
+          - distances: distância ao longo do raio (N,), inf quando não acerta
+          - cells: (linha, coluna) do quad atingido (N, 2), -1 quando não acerta
+        """
+        origins = np.atleast_2d(np.asarray(origins, dtype=np.float64))
+        directions = np.atleast_2d(np.asarray(directions, dtype=np.float64))
+        origins, directions = np.broadcast_arrays(origins, directions)
+        n = len(origins)
+
+        lengths = np.linalg.norm(directions, axis=1)
+        lengths[lengths == 0.0] = 1.0
+        d_world = directions / lengths[:, None]
+
+        # Tudo em coordenadas da grade (x = coluna, z = linha); o parâmetro t continua em metros
+        o = np.stack([(origins[:, 0] - self.start_x) / self.step_x, origins[:, 1],
+                      (origins[:, 2] - self.start_z) / self.step_z], axis=1)
+        d = np.stack([d_world[:, 0] / self.step_x, d_world[:, 1], d_world[:, 2] / self.step_z], axis=1)
+
+        t, t_end = self._clip_to_bounds(o, d, max_distance)
+
+        hit = np.zeros(n, dtype=bool)
+        distances = np.full(n, np.inf)
+        cells = np.full((n, 2), -1, dtype=np.intp)
+        level = np.full(n, self.top_level, dtype=np.intp)
+        active = t <= t_end
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Limite de segurança: cada iteração avança ou muda de nível
+            for _ in range(8 * (self.width + self.depth) + 64):
+                idx = np.nonzero(active)[0]
+                if len(idx) == 0:
+                    break
+                self._step(idx, o, d, t, t_end, level, hit, distances, cells, active)
+
+        points = np.full((n, 3), np.nan)
+        points[hit] = origins[hit] + d_world[hit] * distances[hit, None]
+        return hit, points, distances, cells
+
+    def raycast(self, origin, direction, max_distance=np.inf):
+        """ Um raio só. Retorna {'point', 'distance', 'cell'} ou None se não acertar. """
+        hit, points, distances, cells = self.raycast_batch([origin], [direction], max_distance)
+        if not hit[0]:
+            return None
+        return {'point': points[0], 'distance': float(distances[0]), 'cell': (int(cells[0, 0]), int(cells[0, 1]))}
+
+    def _clip_to_bounds(self, o, d, max_distance):
+        """ Intervalo [t, t_end] de cada raio dentro da caixa que envolve o terreno. """
+        box_min = np.array([0.0, float(self.min_levels[-1].min()), 0.0])
+        box_max = np.array([self.width - 1.0, float(self.max_levels[-1].max()), self.depth - 1.0])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv = 1.0 / d
+            t0 = (box_min - o) * inv
+            t1 = (box_max - o) * inv
+        # Direção nula num eixo: dentro da faixa vale sempre, fora nunca
+        parallel = d == 0.0
+        inside = (o >= box_min) & (o <= box_max)
+        t_near = np.where(parallel, np.where(inside, -np.inf, np.inf), np.minimum(t0, t1))
+        t_far = np.where(parallel, np.where(inside, np.inf, -np.inf), np.maximum(t0, t1))
+        t = np.maximum(t_near.max(axis=1), 0.0)
+        t_end = np.minimum(t_far.min(axis=1), max_distance)
+        return t, t_end
+
+    def _step(self, idx, o, d, t, t_end, level, hit, distances, cells, active):
+        """ Uma iteração da travessia para os raios ainda ativos `idx`. """
+        oi, di, ti, lv = o[idx], d[idx], t[idx], level[idx]
+        size = (1 << lv).astype(np.float64)
+
+        # Célula do nível atual onde o raio está (avaliada um pouco à frente para decidir bordas)
+        p = oi + di * (ti + _EPS * (1.0 + ti))[:, None]
+        cx = np.clip(np.floor(p[:, 0] / size).astype(np.intp), 0, self._level_cols[lv] - 1)
+        cz = np.clip(np.floor(p[:, 2] / size).astype(np.intp), 0, self._level_rows[lv] - 1)
+
+        # Saída da célula no plano xz
+        tx = np.where(di[:, 0] > 0, ((cx + 1) * size - oi[:, 0]) / di[:, 0],
+                      np.where(di[:, 0] < 0, (cx * size - oi[:, 0]) / di[:, 0], np.inf))
+        tz = np.where(di[:, 2] > 0, ((cz + 1) * size - oi[:, 2]) / di[:, 2],
+                      np.where(di[:, 2] < 0, (cz * size - oi[:, 2]) / di[:, 2], np.inf))
+        t_exit = np.minimum(np.minimum(tx, tz), t_end[idx])
+
+        # Menor altura do raio dentro da célula (é linear, então está numa das pontas)
+        y_min = oi[:, 1] + np.minimum(ti * di[:, 1], t_exit * di[:, 1])
+        cell_max = self._flat_max[self._level_offset[lv] + cz * self._level_cols[lv] + cx]
+        above = y_min > cell_max
+
+        # Acima de tudo na célula: pula a célula inteira e tenta subir um nível
+        skip = above
+        # Pode haver colisão e a célula é grande: desce um nível
+        descend = ~above & (lv > 0)
+        # Nível 0: testa os dois triângulos do quad
+        leaf = ~above & (lv == 0)
+
+        level[idx[descend]] -= 1
+
+        if leaf.any():
+            li = idx[leaf]
+            t_hit = self._intersect_quad(o[li], d[li], cz[leaf], cx[leaf])
+            ok = (t_hit >= t[li] - 1e-4) & (t_hit <= t_exit[leaf] + 1e-4)
+            got = li[ok]
+            hit[got] = True
+            distances[got] = t_hit[ok]
+            cells[got, 0] = cz[leaf][ok]
+            cells[got, 1] = cx[leaf][ok]
+            active[got] = False
+            # Sem colisão neste quad: segue para o próximo
+            skip = skip.copy()
+            skip[np.nonzero(leaf)[0][~ok]] = True
+
+        moved = idx[skip]
+        t_next = t_exit[skip]
+        # Garante progresso mesmo com a saída caindo em cima do t atual
+        t[moved] = np.maximum(t_next, t[moved] + _EPS * (1.0 + t[moved]))
+        level[moved] = np.minimum(level[moved] + 1, self.top_level)
+        active[moved[t[moved] > t_end[moved]]] = False
+
+    def _intersect_quad(self, o, d, rows, cols):
+        """ Möller-Trumbore contra os dois triângulos do quad (mesma divisão da malha). Retorna t ou inf. """
+        h = self.heights
+        x0 = cols.astype(np.float64)
+        z0 = rows.astype(np.float64)
+        top_left = np.stack([x0, h[rows, cols], z0], axis=1)
+        top_right = np.stack([x0 + 1.0, h[rows, cols + 1], z0], axis=1)
+        bottom_left = np.stack([x0, h[rows + 1, cols], z0 + 1.0], axis=1)
+        bottom_right = np.stack([x0 + 1.0, h[rows + 1, cols + 1], z0 + 1.0], axis=1)
+
+        t1 = ray_triangle(o, d, top_left, bottom_left, top_right)
+        t2 = ray_triangle(o, d, top_right, bottom_left, bottom_right)
+        return np.minimum(t1, t2)
+
+
+def ray_triangle(o, d, v0, v1, v2):
+    """ Interseção raio-triângulo vetorizada (dos dois lados). Retorna t ou inf. """
+    e1 = v1 - v0
+    e2 = v2 - v0
+    pvec = np.cross(d, e2)
+    det = np.einsum('ij,ij->i', e1, pvec)
+    valid = np.abs(det) > 1e-12
+    inv_det = np.where(valid, 1.0 / np.where(valid, det, 1.0), 0.0)
+    tvec = o - v0
+    u = np.einsum('ij,ij->i', tvec, pvec) * inv_det
+    qvec = np.cross(tvec, e1)
+    v = np.einsum('ij,ij->i', d, qvec) * inv_det
+    t = np.einsum('ij,ij->i', e2, qvec) * inv_det
+    inside = valid & (u >= -1e-9) & (v >= -1e-9) & (u + v <= 1.0 + 1e-9) & (t >= 0.0)
+    return np.where(inside, t, np.inf)
@@ -0,0 +1,276 @@
+import math
+import os
+
+import numpy as np
+from OpenGL.GL import *
+import glm
+import settings
+from gl_state import gl_state
+from terrain import build_grid_indices, sample_heightfield
+from terrain_chunks import aabbs_in_frustum, frustum_planes
+
+
+class RawHeightmapSource:
+    """
+    Heightmap RAW (amostras inteiras sem cabeçalho, linha a linha) mapeado em memória.
+    Só as páginas das regiões lidas entram na RAM, então o arquivo pode ser bem
+    maior que a memória (ex.: 16k x 16k em 16 bits).
+    """
+
+    def __init__(self, path, width=None, depth=None, dtype='<u2'):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        samples = os.path.getsize(path) // self.dtype.itemsize
+
+        # Sem dimensões explícitas o RAW é considerado quadrado (o formato mais comum)
+        if width is None and depth is None:
+            width = depth = math.isqrt(samples)
+        elif width is None:
+            width = samples // depth
+        elif depth is None:
+            depth = samples // width
+        if width * depth != samples or width < 2 or depth < 2:
+            raise ValueError(f"Tamanho de {path} não bate com {width}x{depth} amostras de {self.dtype}")
+
+        self.width = width
+        self.depth = depth
+        self.data = np.memmap(path, dtype=self.dtype, mode='r', shape=(depth, width))
+        self.max_value = float(np.iinfo(self.dtype).max) if self.dtype.kind in 'ui' else 1.0
+
+    def read_block(self, z0, z1, x0, x1):
+        """ Amostras [z0, z1) x [x0, x1) como float64, repetindo a borda fora do arquivo. """
+        rows = np.clip(np.arange(z0, z1), 0, self.depth - 1)
+        cols = np.clip(np.arange(x0, x1), 0, self.width - 1)
+        inner = self.data[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+        return np.asarray(inner, dtype=np.float64)[np.ix_(rows - rows[0], cols - cols[0])]
+
+
+class StreamingTerrain:
+    """
+    Terreno em tiles carregados sob demanda ao redor da câmera.
+
+    Cada tile tem seu próprio VBO; os índices são compartilhados por formato de tile.
+    Tiles fora do raio (ou os mais distantes, quando o orçamento de memória estoura)
+    têm os buffers da GPU liberados. Tem a mesma interface de desenho e de altura do
+    Terrain, então o Engine usa um ou outro sem diferença.
+    """
+
+    def __init__(self, shader, source, spacing=None, max_height=None, tile_size=None,
+                 view_radius=None, memory_budget_mb=None, loads_per_update=None):
+        self.shader = shader
+        self.source = source
+        self.spacing = spacing or settings.TERRAIN_STREAMING_SPACING
+        self.max_height = max_height or settings.MAX_TERRAIN_HEIGHT
+        self.tile_size = tile_size or settings.TERRAIN_STREAMING_TILE_SIZE
+        self.view_radius = view_radius or settings.TERRAIN_STREAMING_RADIUS
+        self.memory_budget = int((memory_budget_mb or settings.TERRAIN_STREAMING_BUDGET_MB) * 1024 * 1024)
+        self.loads_per_update = loads_per_update or settings.TERRAIN_STREAMING_LOADS_PER_FRAME
+
+        self.width = source.width
+        self.depth = source.depth
+        self.height_scale = self.max_height / source.max_value
+
+        # Mundo centrado na origem, como o Terrain
+        self.step_x = self.step_z = self.spacing
+        self.start_x = -(self.width - 1) * self.spacing / 2.0
+        self.start_z = -(self.depth - 1) * self.spacing / 2.0
+
+        self.tiles_x = math.ceil((self.width - 1) / self.tile_size)
+        self.tiles_z = math.ceil((self.depth - 1) / self.tile_size)
+
+        self.tiles = {}        # (tx, tz) -> dados do tile residente
+        self.index_buffers = {}  # (nx, nz) -> (ebo, quantidade de índices)
+        self.resident_bytes = 0
+        self.frame_stats = {}
+        self.begin_frame()
+
+        print(f"Terreno em streaming: {self.width}x{self.depth} amostras, "
+              f"{self.tiles_x}x{self.tiles_z} tiles de {self.tile_size}, "
+              f"orçamento {self.memory_budget / (1024 * 1024):.0f} MB")
+
+    # ---------- residência dos tiles ----------
+
+    def _tile_span(self, t, samples):
+        start = t * self.tile_size
+        return start, min(self.tile_size, samples - 1 - start)
+
+    def _tile_distance(self, key, px, pz):
+        """ Distância no plano xz da câmera até o retângulo do tile. """
+        x0, nx = self._tile_span(key[0], self.width)
+        z0, nz = self._tile_span(key[1], self.depth)
+        min_x = self.start_x + x0 * self.spacing
+        min_z = self.start_z + z0 * self.spacing
+        dx = max(min_x - px, 0.0, px - (min_x + nx * self.spacing))
+        dz = max(min_z - pz, 0.0, pz - (min_z + nz * self.spacing))
+        return math.hypot(dx, dz)
+
+    def update(self, camera_pos):
+        """
+        Carrega os tiles que entraram no raio e libera os que saíram (chamar uma vez por frame).
+        Retorna quantos tiles foram carregados nesta chamada.
+        """
+        px, pz = float(camera_pos[0]), float(camera_pos[2])
+
+        # Tile da câmera e vizinhança que cabe no raio
+        reach = int(math.ceil(self.view_radius / (self.tile_size * self.spacing))) + 1
+        ctx = int((px - self.start_x) / (self.tile_size * self.spacing))
+        ctz = int((pz - self.start_z) / (self.tile_size * self.spacing))
+
+        wanted = []
+        for tz in range(max(0, ctz - reach), min(self.tiles_z, ctz + reach + 1)):
+            for tx in range(max(0, ctx - reach), min(self.tiles_x, ctx + reach + 1)):
+                dist = self._tile_distance((tx, tz), px, pz)
+                if dist <= self.view_radius:
+                    wanted.append((dist, (tx, tz)))
+        wanted.sort()
+        wanted_keys = {key for _, key in wanted}
+
+        # Fora do raio: libera na hora
+        for key in [k for k in self.tiles if k not in wanted_keys]:
+            self._release_tile(key)
+
+        # Mais perto primeiro, respeitando o orçamento e o limite de cargas por frame
+        loads = 0
+        for dist, key in wanted:
+            if key in self.tiles:
+                continue
+            if loads >= self.loads_per_update:
+                break
+            tile_bytes = self._tile_bytes(key)
+            while self.resident_bytes + tile_bytes > self.memory_budget:
+                farthest = max(self.tiles, key=lambda k: self._tile_distance(k, px, pz), default=None)
+                if farthest is None or self._tile_distance(farthest, px, pz) <= dist:
+                    break
+                self._release_tile(farthest)
+            if self.resident_bytes + tile_bytes > self.memory_budget:
+                break
+            self._load_tile(key)
+            loads += 1
+        return loads
+
+    def _tile_bytes(self, key):
+        _, nx = self._tile_span(key[0], self.width)
+        _, nz = self._tile_span(key[1], self.depth)
+        return (nx + 1) * (nz + 1) * 6 * 4
+
+    def _index_buffer(self, nx, nz):
+        shape = (nx, nz)
+        if shape not in self.index_buffers:
+            indices = build_grid_indices(nx + 1, nz + 1)
+            ebo = glGenBuffers(1)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+            glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+            self.index_buffers[shape] = (ebo, len(indices))
+        return self.index_buffers[shape]
+
+    def _load_tile(self, key):
+        tx, tz = key
+        x0, nx = self._tile_span(tx, self.width)
+        z0, nz = self._tile_span(tz, self.depth)
+
+        # Uma amostra de margem para as normais baterem com as dos tiles vizinhos
+        block = self.source.read_block(z0 - 1, z0 + nz + 2, x0 - 1, x0 + nx + 2) * self.height_scale
+        heights = block[1:-1, 1:-1]
+
+        normals = np.empty((nz + 1, nx + 1, 3), dtype=np.float32)
+        normals[..., 0] = block[1:-1, :-2] - block[1:-1, 2:]
+        normals[..., 1] = 2.0 * self.spacing
+        normals[..., 2] = block[:-2, 1:-1] - block[2:, 1:-1]
+        normals /= np.linalg.norm(normals, axis=2, keepdims=True)
+
+        vertex_data = np.empty((nz + 1, nx + 1, 6), dtype=np.float32)
+        vertex_data[..., 0] = (self.start_x + (x0 + np.arange(nx + 1)) * self.spacing)[None, :]
+        vertex_data[..., 1] = heights
+        vertex_data[..., 2] = (self.start_z + (z0 + np.arange(nz + 1)) * self.spacing)[:, None]
+        vertex_data[..., 3:6] = normals
+
+        ebo, index_count = self._index_buffer(nx, nz)
+        vao = glGenVertexArrays(1)
+        vbo = glGenBuffers(1)
+        glBindVertexArray(vao)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertex_data.nbytes, vertex_data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+
+        stride = 6 * 4
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(3 * 4))
+        glEnableVertexAttribArray(1)
+        glBindVertexArray(0)
+
+        self.tiles[key] = {
+            'vao': vao,
+            'vbo': vbo,
+            'index_count': index_count,
+            'bytes': vertex_data.nbytes,
+            'aabb_min': (vertex_data[0, 0, 0], float(heights.min()), vertex_data[0, 0, 2]),
+            'aabb_max': (vertex_data[-1, -1, 0], float(heights.max()), vertex_data[-1, -1, 2]),
+        }
+        self.resident_bytes += vertex_data.nbytes
+
+    def _release_tile(self, key):
+        tile = self.tiles.pop(key)
+        glDeleteVertexArrays(1, [tile['vao']])
+        glDeleteBuffers(1, [tile['vbo']])
+        self.resident_bytes -= tile['bytes']
+
+    def release(self):
+        """ Libera todos os tiles e os buffers de índices. """
+        for key in list(self.tiles):
+            self._release_tile(key)
+        for ebo, _ in self.index_buffers.values():
+            glDeleteBuffers(1, [ebo])
+        self.index_buffers.clear()
+
+    # ---------- desenho ----------
+
+    def begin_frame(self):
+        """ Zera as estatísticas do frame (chamar uma vez no início de cada frame). """
+        self.frame_stats = {'passes': 0, 'chunks_drawn': 0, 'chunks_culled': 0, 'triangles': 0,
+                            'resident_tiles': len(self.tiles), 'resident_bytes': self.resident_bytes}
+
+    def get_frame_stats(self):
+        return dict(self.frame_stats)
+
+    def draw(self, camera, projection, override_shader=None, view_projection=None):
+        """ Desenha os tiles residentes que estão no frustum (mesma interface do Terrain.draw). """
+        shader_to_use = override_shader if override_shader else self.shader
+        shader_to_use.use()
+        shader_to_use.set_uniform_mat4("model", glm.mat4(1.0))
+
+        if view_projection is None and projection is not None:
+            view_projection = projection * camera.get_view_matrix()
+
+        tiles = list(self.tiles.values())
+        if not tiles:
+            return
+        if view_projection is not None:
+            visible = aabbs_in_frustum(frustum_planes(view_projection),
+                                       np.array([t['aabb_min'] for t in tiles], dtype=np.float64),
+                                       np.array([t['aabb_max'] for t in tiles], dtype=np.float64))
+        else:
+            visible = np.ones(len(tiles), dtype=bool)
+
+        stats = self.frame_stats
+        stats['passes'] += 1
+        for tile, show in zip(tiles, visible):
+            if not show:
+                stats['chunks_culled'] += 1
+                continue
+            gl_state.bind_vertex_array(tile['vao'])
+            glDrawElements(GL_TRIANGLES, tile['index_count'], GL_UNSIGNED_INT, None)
+            stats['chunks_drawn'] += 1
+            stats['triangles'] += tile['index_count'] // 3
+
+    # ---------- consultas de altura (direto do arquivo mapeado) ----------
+
+    def get_height(self, world_x, world_z):
+        """ Altura bilinear no ponto (+0.2m para a câmera não entrar no chão). """
+        heights, _, _ = self.get_heights(world_x, world_z)
+        return float(heights) + 0.2
+
+    def get_heights(self, xs, zs):
+        """ Mesmo contrato do Terrain.get_heights: (heights, normals, in_bounds). """
+        return sample_heightfield(self.source.data, self.start_x, self.start_z,
+                                  self.step_x, self.step_z, xs, zs, scale=self.height_scale)
@@ -1,10 +1,27 @@
 import os
+from collections import OrderedDict
+
 import freetype
 from OpenGL.GL import *
 import numpy as np
 
+import settings
+from gl_state import gl_state
+
+_ATLAS_WIDTH = 512 # Largura do atlas em texels (a altura sai do empacotamento)
+_ATLAS_PADDING = 1 # Texels vazios em volta de cada glifo (o filtro linear não puxa o vizinho)
+_VERTEX_FLOATS = 4 # x, y, u, v
+
+
 class TextRenderer:
-    def __init__(self, font_path, size):
+    """
+    Os 128 glifos ASCII num atlas só; cada string vira um bloco de quads num VBO
+    compartilhado e sai num glDrawArrays. As strings ficam em cache por
+    (texto, x, y, escala): uma string igual à de um frame anterior (o relógio do HUD)
+    só refaz o draw, sem montar nem enviar vértices.
+    """
+
+    def __init__(self, font_path, size, cache_strings=None):
         font_path = os.path.normpath(font_path)
         print("Carregando fonte:", font_path)
 
@@ -18,6 +35,13 @@ class TextRenderer:
         self.chars = {}
         self._load_characters()
 
+        # Strings já tesseladas, da menos para a mais recente:
+        # chave -> (primeiro vértice no VBO, vértices, cópia na CPU para compactar)
+        self.cache_strings = cache_strings or settings.TEXT_CACHE_STRINGS
+        self._strings = OrderedDict()
+        self._vertex_count = 0
+        self._capacity = 0
+
         # Prepara VAO/VBO
         self.vao = glGenVertexArrays(1)
         self.vbo = glGenBuffers(1)
@@ -26,85 +50,151 @@ class TextRenderer:
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
 
         # 4 floats por vértice (x, y, u, v)
-        glBufferData(GL_ARRAY_BUFFER, 6 * 4 * 4, None, GL_DYNAMIC_DRAW)
-
         glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 4 * 4, ctypes.c_void_p(0))
+        glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, _VERTEX_FLOATS * 4, ctypes.c_void_p(0))
 
         glBindBuffer(GL_ARRAY_BUFFER, 0)
         glBindVertexArray(0)
+        self._reserve(4096)
 
     def _load_characters(self):
-        for c in range(128):  
+        glyphs = []
+        for c in range(128):
             self.face.load_char(chr(c))
-            bitmap = self.face.glyph.bitmap
-
-            tex_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, tex_id)
-            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-
-            glTexImage2D(
-                GL_TEXTURE_2D,
-                0,
-                GL_RED,
-                bitmap.width,
-                bitmap.rows,
-                0,
-                GL_RED,
-                GL_UNSIGNED_BYTE,
-                bitmap.buffer
-            )
-
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-
+            glyph = self.face.glyph
+            bitmap = glyph.bitmap
+            pixels = np.array(bitmap.buffer, dtype=np.uint8).reshape(bitmap.rows, bitmap.width)
+            glyphs.append((pixels, (glyph.bitmap_left, glyph.bitmap_top), glyph.advance.x))
+
+        # Empacotamento em prateleiras: glifos lado a lado até acabar a largura
+        positions = []
+        x = y = shelf = _ATLAS_PADDING
+        for pixels, _, _ in glyphs:
+            rows, width = pixels.shape
+            if x + width + _ATLAS_PADDING > _ATLAS_WIDTH:
+                x, y = _ATLAS_PADDING, shelf + _ATLAS_PADDING
+            positions.append((x, y))
+            x += width + _ATLAS_PADDING
+            shelf = max(shelf, y + rows)
+        height = 1 << int(np.ceil(np.log2(shelf + _ATLAS_PADDING)))
+
+        atlas = np.zeros((height, _ATLAS_WIDTH), dtype=np.uint8)
+        # Métricas por código (para montar os quads de uma string inteira com numpy)
+        self.glyph_size = np.zeros((128, 2), dtype=np.float32)
+        self.glyph_bearing = np.zeros((128, 2), dtype=np.float32)
+        self.glyph_advance = np.zeros(128, dtype=np.float32)
+        self.glyph_uv = np.zeros((128, 4), dtype=np.float32)
+        for c, ((pixels, bearing, advance), (gx, gy)) in enumerate(zip(glyphs, positions)):
+            rows, width = pixels.shape
+            atlas[gy:gy + rows, gx:gx + width] = pixels
+            uv = (gx / _ATLAS_WIDTH, gy / height, (gx + width) / _ATLAS_WIDTH, (gy + rows) / height)
+            self.glyph_size[c] = (width, rows)
+            self.glyph_bearing[c] = bearing
+            self.glyph_advance[c] = advance >> 6 # 26.6 fixo -> pixels
+            self.glyph_uv[c] = uv
             self.chars[chr(c)] = {
-                "texture": tex_id,
-                "size": (bitmap.width, bitmap.rows),
-                "bearing": (self.face.glyph.bitmap_left, self.face.glyph.bitmap_top),
-                "advance": self.face.glyph.advance.x
+                "uv": uv,
+                "size": (width, rows),
+                "bearing": bearing,
+                "advance": advance
             }
 
-    def render_text(self, shader, text, x, y, scale=1.0, color=(1,1,1)):
-        shader.use()
-        shader.set_uniform_vec3("textColor", color)
-
-        glActiveTexture(GL_TEXTURE0)
-        glBindVertexArray(self.vao)
-
-        for char in text:
-            ch = self.chars.get(char)
-            if not ch:
-                continue
+        self.atlas = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.atlas)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_R8, _ATLAS_WIDTH, height, 0, GL_RED, GL_UNSIGNED_BYTE, atlas)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
 
-            w, h = ch["size"]
-            bx, by = ch["bearing"]
-
-            xpos = x + bx * scale
-            ypos = y - (h - by) * scale
-
-            w *= scale
-            h *= scale
-
-            vertices = np.array([
-                xpos,     ypos + h,   0.0, 0.0,
-                xpos,     ypos,       0.0, 1.0,
-                xpos + w, ypos,       1.0, 1.0,
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glBindTexture(GL_TEXTURE_2D, 0)
 
-                xpos,     ypos + h,   0.0, 0.0,
-                xpos + w, ypos,       1.0, 1.0,
-                xpos + w, ypos + h,   1.0, 0.0,
-            ], dtype=np.float32)
+    def build_vertices(self, text, x, y, scale=1.0):
+        """ Quads (6 vértices x, y, u, v por glifo visível) da string; fora do ASCII é ignorado. """
+        codes = np.fromiter(map(ord, text), dtype=np.int64, count=len(text))
+        codes = codes[codes < 128]
+        advance = self.glyph_advance[codes] * scale
+        pen = x + np.concatenate([[0.0], np.cumsum(advance[:-1])]) if len(codes) else advance
+
+        w, h = (self.glyph_size[codes] * scale).T
+        bx, by = (self.glyph_bearing[codes] * scale).T
+        # Espaços e afins não têm bitmap: nenhum vértice
+        visible = (w > 0) & (h > 0)
+        x0 = (pen + bx)[visible]
+        y0 = (y - (h - by))[visible]
+        x1, y1 = x0 + w[visible], y0 + h[visible]
+        u0, v0, u1, v1 = self.glyph_uv[codes[visible]].T
+
+        # Mesma ordem de sempre: topo-esquerda, base-esquerda, base-direita (x2 triângulos)
+        quads = np.empty((len(x0), 6, _VERTEX_FLOATS), dtype=np.float32)
+        quads[:, 0] = np.stack([x0, y1, u0, v0], axis=1)
+        quads[:, 1] = np.stack([x0, y0, u0, v1], axis=1)
+        quads[:, 2] = np.stack([x1, y0, u1, v1], axis=1)
+        quads[:, 3] = quads[:, 0]
+        quads[:, 4] = quads[:, 2]
+        quads[:, 5] = np.stack([x1, y1, u1, v0], axis=1)
+        return quads.reshape(-1, _VERTEX_FLOATS)
+
+    def _reserve(self, vertices):
+        """ Realoca o VBO para `vertices` (o conteúdo é perdido; quem chama reenvia). """
+        self._capacity = vertices
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices * _VERTEX_FLOATS * 4, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
-            glBindTexture(GL_TEXTURE_2D, ch["texture"])
+    def _compact(self, incoming):
+        """ Cache cheio: fica com a metade mais recente das strings e reenvia tudo de uma vez. """
+        keep = list(self._strings.items())[-(self.cache_strings // 2):] if self.cache_strings > 1 else []
+        kept = sum(count for _, (_, count, _) in keep)
+        self._reserve(max(self._capacity, 2 * (kept + incoming)))
+
+        self._strings = OrderedDict()
+        first = 0
+        for key, (_, count, data) in keep:
+            self._strings[key] = (first, count, data)
+            first += count
+        self._vertex_count = first
+        if first:
+            data = np.concatenate([data for _, (_, _, data) in keep])
             glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-            glBufferSubData(GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices)
+            glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _cached_string(self, text, x, y, scale):
+        """ (primeiro vértice, vértices) da string no VBO, tesselando só se ainda não estiver lá. """
+        key = (text, x, y, scale)
+        entry = self._strings.get(key)
+        if entry is not None:
+            self._strings.move_to_end(key)
+            return entry[0], entry[1]
+
+        data = self.build_vertices(text, x, y, scale)
+        if len(self._strings) >= self.cache_strings or self._vertex_count + len(data) > self._capacity:
+            self._compact(len(data))
+
+        first = self._vertex_count
+        if len(data):
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBufferSubData(GL_ARRAY_BUFFER, first * _VERTEX_FLOATS * 4, data.nbytes, data)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self._vertex_count += len(data)
+        self._strings[key] = (first, len(data), data)
+        return first, len(data)
 
-            glDrawArrays(GL_TRIANGLES, 0, 6)
+    def render_text(self, shader, text, x, y, scale=1.0, color=(1,1,1)):
+        first, count = self._cached_string(text, x, y, scale)
+        if count == 0:
+            return
+        shader.use()
+        shader.set_uniform_vec3("textColor", color)
 
-            x += (ch["advance"] >> 6) * scale
+        gl_state.bind_vertex_array(self.vao)
+        gl_state.bind_texture(0, self.atlas)
+        glDrawArrays(GL_TRIANGLES, first, count)
 
-        glBindVertexArray(0)
-        glBindTexture(GL_TEXTURE_2D, 0)
+    def release(self):
+        glDeleteTextures(1, [self.atlas])
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteBuffers(1, [self.vbo])
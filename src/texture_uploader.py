@@ -0,0 +1,109 @@
+import ctypes
+import time
+
+import numpy as np
+from OpenGL.GL import *
+
+import settings
+
+# Espera máxima por um PBO do anel antes de reaproveitá-lo (ns)
+_FENCE_TIMEOUT = 1_000_000_000
+
+
+class TextureUploader:
+    """
+    Envia texturas RGBA8 por um anel de pixel buffer objects (GL_PIXEL_UNPACK_BUFFER):
+    a cópia dos pixels para um PBO mapeado e o glTexImage2D a partir dele retornam sem
+    esperar a transferência, então a GPU lê um nível enquanto a CPU copia o próximo.
+    Cada PBO tem uma fence e só é reescrito depois que a GPU terminou de lê-lo.
+    `stats` guarda (largura, altura, níveis, ms de CPU para submeter, ms até a GPU
+    terminar) de cada textura; o último vem de um timestamp da GPU depois do último
+    comando da textura e só é preenchido em release().
+    """
+
+    def __init__(self, ring_size=None):
+        self.ring_size = max(1, ring_size or settings.TEXTURE_PBO_RING)
+        self.buffers = [int(b) for b in np.atleast_1d(glGenBuffers(self.ring_size))]
+        self.capacity = [0] * self.ring_size
+        self.fences = [None] * self.ring_size
+        self.next = 0
+        self.stats = []
+        self._timestamps = [] # (índice em stats, início no relógio da GPU em ns, query do fim)
+
+    def _acquire(self, nbytes):
+        """ Próximo PBO do anel, já ligado e com espaço para `nbytes`. """
+        slot = self.next
+        self.next = (slot + 1) % self.ring_size
+        if self.fences[slot] is not None:
+            glClientWaitSync(self.fences[slot], GL_SYNC_FLUSH_COMMANDS_BIT, _FENCE_TIMEOUT)
+            glDeleteSync(self.fences[slot])
+            self.fences[slot] = None
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, self.buffers[slot])
+        if nbytes > self.capacity[slot]:
+            glBufferData(GL_PIXEL_UNPACK_BUFFER, nbytes, None, GL_STREAM_DRAW)
+            self.capacity[slot] = nbytes
+        return slot
+
+    @staticmethod
+    def _gpu_time():
+        """ Relógio da GPU agora (ns), na mesma base do glQueryCounter. """
+        value = GLint64(0)
+        glGetInteger64v(GL_TIMESTAMP, ctypes.byref(value))
+        return value.value
+
+    def upload(self, levels):
+        """ Cria a textura com os níveis dados (um só = mipmaps gerados na GPU). Retorna o id. """
+        start = time.perf_counter()
+        gpu_start = self._gpu_time()
+        tex_id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, tex_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+
+        for level, pixels in enumerate(levels):
+            data = np.ascontiguousarray(pixels, dtype=np.uint8)
+            height, width = data.shape[:2]
+            slot = self._acquire(data.nbytes)
+            # Invalida o conteúdo antigo: o driver não precisa sincronizar o mapeamento
+            ptr = glMapBufferRange(GL_PIXEL_UNPACK_BUFFER, 0, data.nbytes,
+                                   GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT)
+            ctypes.memmove(ptr, data.ctypes.data, data.nbytes)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+            # Com um PBO ligado, o último argumento é o offset dentro dele
+            glTexImage2D(GL_TEXTURE_2D, level, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                         ctypes.c_void_p(0))
+            self.fences[slot] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+        # Sem PBO ligado, os outros glTexImage2D do jogo voltam a ler da memória do cliente
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        if len(levels) > 1:
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+        else:
+            glGenerateMipmap(GL_TEXTURE_2D)
+
+        # A query registra o relógio da GPU quando ela chegar aqui (níveis lidos e mipmaps prontos)
+        query = int(glGenQueries(1)[0])
+        glQueryCounter(query, GL_TIMESTAMP)
+        self._timestamps.append((len(self.stats), gpu_start, query))
+
+        height, width = levels[0].shape[:2]
+        self.stats.append((width, height, len(levels), (time.perf_counter() - start) * 1000.0, None))
+        return tex_id
+
+    def release(self):
+        """ Espera as transferências pendentes, completa `stats` e apaga os PBOs. """
+        result = ctypes.c_uint64(0)
+        for index, gpu_start, query in self._timestamps:
+            # Bloqueia até a GPU passar pela query
+            glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(result))
+            self.stats[index] = self.stats[index][:4] + ((result.value - gpu_start) / 1e6,)
+            glDeleteQueries(1, [query])
+        self._timestamps = []
+        for fence in self.fences:
+            if fence is not None:
+                glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, _FENCE_TIMEOUT)
+                glDeleteSync(fence)
+        self.fences = [None] * self.ring_size
+        glDeleteBuffers(self.ring_size, self.buffers)
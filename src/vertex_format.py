@@ -0,0 +1,100 @@
+import numpy as np
+
+# Vértice compacto das malhas animadas (28 bytes, antes eram 16 floats = 64):
+#   posição  3 x float32          (a sombra e o culling leem a posição crua)
+#   normal   2 x unorm16          (octaédrica: a esfera dobrada num quadrado [-1, 1]²)
+#   uv       2 x float16          (pode passar de [0, 1] com GL_REPEAT)
+#   ossos    4 x uint8            (inteiros no shader, glVertexAttribIPointer)
+#   pesos    4 x unorm8           (soma exatamente 255)
+VERTEX_DTYPE = np.dtype([
+    ('position', '<f4', 3),
+    ('normal', '<u2', 2),
+    ('uv', '<f2', 2),
+    ('joints', 'u1', 4),
+    ('weights', 'u1', 4),
+])
+VERTEX_STRIDE = VERTEX_DTYPE.itemsize
+MAX_JOINT_INDEX = np.iinfo(np.uint8).max
+
+
+def vertex_offset(field):
+    """ Offset em bytes de um campo dentro do vértice (para glVertexAttribPointer). """
+    return VERTEX_DTYPE.fields[field][1]
+
+
+def octahedral_encode(normals):
+    """ Normais (N, 3) -> (N, 2) em [-1, 1] pela projeção octaédrica. """
+    n = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+    length = np.abs(n).sum(axis=1, keepdims=True)
+    # Normal nula vira (0, 0, 1) em vez de NaN
+    n = np.where(length > 0.0, n / np.where(length > 0.0, length, 1.0), [0.0, 0.0, 1.0])
+    xy = n[:, :2].copy()
+    # Hemisfério de baixo: dobra os cantos do losango para fora
+    lower = n[:, 2] < 0.0
+    sign = np.where(n[lower, :2] >= 0.0, 1.0, -1.0)
+    xy[lower] = (1.0 - np.abs(n[lower][:, [1, 0]])) * sign
+    return xy
+
+
+def octahedral_decode(encoded):
+    """ Inverso de octahedral_encode: (N, 2) em [-1, 1] -> normais unitárias (N, 3). """
+    e = np.asarray(encoded, dtype=np.float64).reshape(-1, 2)
+    z = 1.0 - np.abs(e).sum(axis=1)
+    xy = e.copy()
+    lower = z < 0.0
+    sign = np.where(e[lower] >= 0.0, 1.0, -1.0)
+    xy[lower] = (1.0 - np.abs(e[lower][:, [1, 0]])) * sign
+    n = np.concatenate([xy, z[:, None]], axis=1)
+    return (n / np.linalg.norm(n, axis=1, keepdims=True)).astype(np.float32)
+
+
+def quantize_weights(weights):
+    """
+    Pesos (N, 4) -> unorm8 somando exatamente 255 (ou 0 se o vértice não tem peso):
+    o resto do arredondamento vai para o maior peso, então a soma no shader é 1.
+    """
+    w = np.clip(np.asarray(weights, dtype=np.float64).reshape(-1, 4), 0.0, None)
+    total = w.sum(axis=1, keepdims=True)
+    w = np.divide(w, total, out=np.zeros_like(w), where=total > 0.0)
+    q = np.rint(w * 255.0).astype(np.int32)
+    rows = np.flatnonzero(total[:, 0] > 0.0)
+    largest = np.argmax(w[rows], axis=1)
+    q[rows, largest] += 255 - q[rows].sum(axis=1)
+    return q.astype(np.uint8)
+
+
+def pack_vertices(vertices):
+    """ Vértices intercalados de 16 floats [pos, normal, uv, ossos, pesos] -> VERTEX_DTYPE. """
+    v = np.asarray(vertices, dtype=np.float32).reshape(-1, 16)
+    joints = np.rint(v[:, 8:12])
+    if len(v) and (joints.min() < 0 or joints.max() > MAX_JOINT_INDEX):
+        raise ValueError(f"Índice de osso fora de 0..{MAX_JOINT_INDEX} (formato compacto usa uint8)")
+
+    packed = np.zeros(len(v), dtype=VERTEX_DTYPE)
+    packed['position'] = v[:, 0:3]
+    packed['normal'] = np.rint((octahedral_encode(v[:, 3:6]) * 0.5 + 0.5) * 65535.0)
+    packed['uv'] = v[:, 6:8]
+    packed['joints'] = joints
+    packed['weights'] = quantize_weights(v[:, 12:16])
+    return packed
+
+
+def as_vertex_records(data):
+    """ Aceita os registros ou os bytes crus (ex.: (N, 28) uint8 do modelo compilado). """
+    data = np.ascontiguousarray(data)
+    if data.dtype == VERTEX_DTYPE:
+        return data.reshape(-1)
+    return data.reshape(-1).view(np.uint8).view(VERTEX_DTYPE)
+
+
+def unpack_vertices(packed):
+    """ VERTEX_DTYPE -> 16 floats por vértice, como o shader vê (para a CPU e testes). """
+    packed = as_vertex_records(packed)
+    v = np.empty((len(packed), 16), dtype=np.float32)
+    v[:, 0:3] = packed['position']
+    v[:, 3:6] = octahedral_decode(packed['normal'] / 65535.0 * 2.0 - 1.0)
+    v[:, 6:8] = packed['uv']
+    v[:, 8:12] = packed['joints']
+    v[:, 12:16] = packed['weights'] / 255.0
+    return v
+
@@ -0,0 +1,93 @@
+import os
+import sys
+
+import numpy as np
+import glm
+
+# Os módulos do jogo ficam em src/ (importados sem pacote, como no main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from terrain import build_terrain_mesh
+
+
+def gerar_terreno_com_lacos(pixels, terrain_size, max_height):
+    """ Versão antiga (laços em Python + glm) usada como referência. """
+    depth, width = pixels.shape
+    heights = [[0.0 for _ in range(depth)] for _ in range(width)]
+    vertices_pos = []
+    normals = []
+    indices = []
+    interleaved_data = []
+
+    start_x = -terrain_size / 2.0
+    start_z = -terrain_size / 2.0
+    step_x = terrain_size / float(width - 1)
+    step_z = terrain_size / float(depth - 1)
+
+    for i in range(depth):
+        for j in range(width):
+            x = start_x + (j * step_x)
+            z = start_z + (i * step_z)
+            y = (pixels[i, j] / 255.0) * max_height
+            heights[j][i] = y
+            vertices_pos.append(glm.vec3(x, y, z))
+
+    def get_height_safe(j, i):
+        j_safe = max(0, min(j, width - 1))
+        i_safe = max(0, min(i, depth - 1))
+        return heights[j_safe][i_safe]
+
+    for i in range(depth):
+        for j in range(width):
+            height_l = get_height_safe(j - 1, i)
+            height_r = get_height_safe(j + 1, i)
+            height_t = get_height_safe(j, i - 1)
+            height_b = get_height_safe(j, i + 1)
+            normal = glm.vec3(height_l - height_r, 2.0, height_t - height_b)
+            normals.append(glm.normalize(normal))
+
+    for i in range(depth - 1):
+        for j in range(width - 1):
+            top_left = (i * width) + j
+            top_right = top_left + 1
+            bottom_left = ((i + 1) * width) + j
+            bottom_right = bottom_left + 1
+            indices.extend([top_left, bottom_left, top_right])
+            indices.extend([top_right, bottom_left, bottom_right])
+
+    for i in range(len(vertices_pos)):
+        interleaved_data.extend([vertices_pos[i].x, vertices_pos[i].y, vertices_pos[i].z])
+        interleaved_data.extend([normals[i].x, normals[i].y, normals[i].z])
+
+    return (np.array(heights, dtype=np.float32).T,
+            np.array(interleaved_data, dtype=np.float32),
+            np.array(indices, dtype=np.uint32))
+
+
+def test_malha_vetorizada_igual_a_versao_com_lacos():
+    rng = np.random.default_rng(42)
+    # Retangular de propósito para pegar troca de largura/profundidade
+    pixels = rng.integers(0, 256, size=(9, 13), dtype=np.uint8)
+
+    ref_heights, ref_vertices, ref_indices = gerar_terreno_com_lacos(pixels, 300.0, 40.0)
+    heights, vertices, indices = build_terrain_mesh(pixels, 300.0, 40.0)
+
+    assert heights.dtype == np.float32 and heights.shape == (9, 13)
+    assert vertices.dtype == np.float32 and indices.dtype == np.uint32
+    np.testing.assert_array_equal(heights, ref_heights)
+    np.testing.assert_array_equal(indices, ref_indices)
+
+    ref_vertices = ref_vertices.reshape(-1, 6)
+    vertices = vertices.reshape(-1, 6)
+    # Posições são exatamente as mesmas; normais podem diferir só no último bit
+    np.testing.assert_array_equal(vertices[:, :3], ref_vertices[:, :3])
+    np.testing.assert_allclose(vertices[:, 3:], ref_vertices[:, 3:], rtol=0, atol=1e-6)
+
+
+def test_heightmap_minimo_2x2():
+    pixels = np.zeros((2, 2), dtype=np.uint8)
+    heights, vertices, indices = build_terrain_mesh(pixels, 300.0, 40.0)
+
+    assert len(vertices) == 4 * 6
+    np.testing.assert_array_equal(indices, [0, 2, 1, 1, 2, 3])
+    np.testing.assert_array_equal(vertices.reshape(-1, 6)[:, 3:], [[0.0, 1.0, 0.0]] * 4)
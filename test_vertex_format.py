@@ -0,0 +1,110 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Os módulos do jogo ficam em src/ (importados sem pacote, como no main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from vertex_format import (VERTEX_STRIDE, as_vertex_records, octahedral_decode, octahedral_encode,
+                           pack_vertices, quantize_weights, unpack_vertices)
+
+
+def vertices_aleatorios(count, seed=7):
+    """ Vértices de 16 floats como os do GLB: normais unitárias, até 4 ossos com pesos normalizados. """
+    rng = np.random.default_rng(seed)
+    v = np.zeros((count, 16), dtype=np.float32)
+    v[:, 0:3] = rng.uniform(-150.0, 150.0, (count, 3))
+    normals = rng.normal(size=(count, 3))
+    v[:, 3:6] = normals / np.linalg.norm(normals, axis=1, keepdims=True)
+    v[:, 6:8] = rng.uniform(-2.0, 3.0, (count, 2))
+    v[:, 8:12] = rng.integers(0, 65, (count, 4))
+    weights = rng.uniform(0.0, 1.0, (count, 4)) * (rng.uniform(size=(count, 4)) < 0.7)
+    weights[:, 0] += 0.05
+    v[:, 12:16] = weights / weights.sum(axis=1, keepdims=True)
+    return v
+
+
+def test_formato_tem_menos_da_metade_do_antigo():
+    assert VERTEX_STRIDE == 28
+    assert VERTEX_STRIDE * 2 < 16 * 4
+
+
+def test_normal_octaedrica_erro_angular():
+    normals = vertices_aleatorios(20000)[:, 3:6]
+    # Eixos e diagonais caem em cantos e dobras do octaedro
+    extremos = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1],
+                         [1, 1, -1], [-1, 1, -1], [1, -1, -1], [-1, -1, -1]], dtype=np.float32)
+    normals = np.concatenate([normals, extremos / np.linalg.norm(extremos, axis=1, keepdims=True)])
+
+    # Sem quantizar a ida e volta é exata (só arredondamento de float)
+    np.testing.assert_allclose(octahedral_decode(octahedral_encode(normals)), normals, atol=1e-6)
+
+    decoded = unpack_vertices(pack_vertices(np.pad(normals, ((0, 0), (3, 10)))))[:, 3:6].astype(np.float64)
+    normals = normals.astype(np.float64)
+    # atan2 em vez de arccos: perto de 1 o arccos em float32 só mede ruído
+    angle = np.arctan2(np.linalg.norm(np.cross(decoded, normals), axis=1), (decoded * normals).sum(axis=1))
+    # unorm16 nas duas coordenadas: bem abaixo de 0,01 grau
+    assert np.degrees(angle).max() < 0.01
+
+
+def test_pesos_somam_um_e_erro_limitado():
+    weights = vertices_aleatorios(20000)[:, 12:16]
+    q = quantize_weights(weights)
+
+    assert q.dtype == np.uint8
+    np.testing.assert_array_equal(q.astype(np.int32).sum(axis=1), 255)
+    # Um passo de unorm8 para cada peso (o maior absorve o resto do arredondamento)
+    assert np.abs(q / 255.0 - weights).max() <= 2.0 / 255.0
+    # Peso zero continua zero: o shader ignora o osso
+    np.testing.assert_array_equal(q[weights == 0.0], 0)
+
+
+def test_vertice_sem_pesos_continua_sem_pesos():
+    np.testing.assert_array_equal(quantize_weights(np.zeros((3, 4))), 0)
+
+
+def test_uv_ossos_e_posicao():
+    v = vertices_aleatorios(5000)
+    u = unpack_vertices(pack_vertices(v))
+
+    np.testing.assert_array_equal(u[:, 0:3], v[:, 0:3])
+    np.testing.assert_array_equal(u[:, 8:12], v[:, 8:12])
+    # float16: 11 bits de mantissa (erro relativo de 2^-11, mais a faixa subnormal)
+    np.testing.assert_allclose(u[:, 6:8], v[:, 6:8], rtol=2.0 ** -11, atol=1e-7)
+
+
+def test_erro_de_skinning_limitado():
+    v = vertices_aleatorios(5000)
+    rng = np.random.default_rng(3)
+    # Ossos com rotação qualquer e translação da ordem do modelo
+    q, _ = np.linalg.qr(rng.normal(size=(65, 3, 3)))
+    bones = np.concatenate([q, rng.uniform(-50.0, 50.0, (65, 3, 1))], axis=2)  # (ossos, 3, 4)
+
+    def skin(vertices):
+        pos = np.concatenate([vertices[:, 0:3], np.ones((len(vertices), 1))], axis=1)
+        joints = vertices[:, 8:12].astype(np.intp)
+        return np.einsum('vk,vkij,vj->vi', vertices[:, 12:16].astype(np.float64), bones[joints], pos)
+
+    reference = skin(v)
+    error = np.linalg.norm(skin(unpack_vertices(pack_vertices(v))) - reference, axis=1)
+    # Cada peso erra no máximo 2/255 e a soma continua 1: o desvio fica dentro do
+    # espalhamento das posições candidatas de cada vértice
+    pos = np.concatenate([v[:, 0:3], np.ones((len(v), 1))], axis=1)
+    candidates = np.einsum('vkij,vj->vki', bones[v[:, 8:12].astype(np.intp)], pos)
+    spread = np.linalg.norm(candidates - reference[:, None, :], axis=2).max(axis=1)
+    assert np.all(error <= spread * 4 * 2.0 / 255.0 + 1e-3)
+
+
+def test_bytes_crus_do_modelo_compilado():
+    packed = pack_vertices(vertices_aleatorios(10))
+    raw = packed.view(np.uint8).reshape(-1, VERTEX_STRIDE)
+    np.testing.assert_array_equal(as_vertex_records(raw), packed)
+
+
+def test_indice_de_osso_acima_de_255_falha():
+    v = vertices_aleatorios(4)
+    v[2, 9] = 300
+    with pytest.raises(ValueError):
+        pack_vertices(v)